@@ -1,48 +1,64 @@
-from fastapi import status, HTTPException, Depends, APIRouter
-from sqlalchemy.orm import Session
+from fastapi import status, HTTPException, Depends, APIRouter, Response
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from app.database import get_db
 from app.models import User
-from datetime import timedelta
-from app.auth.utils import verify_password
-from app.auth.oauth import create_access_token
+from app.auth.utils import password_hasher
+from app.auth.tokens import issue_tokens, rotate_refresh_token, revoke_refresh_token
 from fastapi.security import OAuth2PasswordRequestForm
-from app.schemas import UserOut
+from app.schemas import UserOut, RefreshTokenRequest
 from app.auth.oauth import admin_required
+from app.metrics import stage
 
 router = APIRouter(tags=["Login"])
 
 
+async def authenticate(db: AsyncSession, username: str, password: str):
+    with stage("login.lookup"):
+        result = await db.execute(select(User).filter(User.username == username))
+        user = result.scalars().first()
+    if not user or not user.password:
+        return None
+
+    with stage("login.verify"):
+        verified, new_hash = await password_hasher.verify_and_update(
+            password, user.password
+        )
+    if not verified:
+        return None
+    if new_hash:
+        user.password = new_hash
+        await db.commit()
+    return user
+
+
 @router.post("/login/", status_code=status.HTTP_200_OK)
-def login(
-    form_data: OAuth2PasswordRequestForm = Depends(), db: Session = Depends(get_db)
+async def login(
+    form_data: OAuth2PasswordRequestForm = Depends(),
+    db: AsyncSession = Depends(get_db),
 ):
-    user = db.query(User).filter(User.username == form_data.username).first()
+    user = await authenticate(db, form_data.username, form_data.password)
 
-    if not user or not verify_password(form_data.password, user.password):
+    if not user:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Invalid username or password",
         )
 
-    access_token_expires = timedelta(minutes=30)
-    access_token = create_access_token(
-        data={"user_id": user.id, "role": user.role}, expires_delta=access_token_expires
-    )
-
     return {
         "User": UserOut.model_validate(user),
-        "access_token": access_token,
-        "token_type": "bearer",
+        **await issue_tokens(db, user),
     }
 
 
 @router.post("/admin/login/", status_code=status.HTTP_200_OK)
-def admin_login(
-    form_data: OAuth2PasswordRequestForm = Depends(), db: Session = Depends(get_db)
+async def admin_login(
+    form_data: OAuth2PasswordRequestForm = Depends(),
+    db: AsyncSession = Depends(get_db),
 ):
-    user = db.query(User).filter(User.username == form_data.username).first()
+    user = await authenticate(db, form_data.username, form_data.password)
 
-    if not user or not verify_password(form_data.password, user.password):
+    if not user:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Invalid username or password",
@@ -53,13 +69,24 @@ def admin_login(
             detail="Only admins can log in here.",
         )
 
-    access_token_expires = timedelta(minutes=30)
-    access_token = create_access_token(
-        data={"user_id": user.id, "role": user.role}, expires_delta=access_token_expires
-    )
-
     return {
         "User": UserOut.model_validate(user),
-        "access_token": access_token,
-        "token_type": "bearer",
+        **await issue_tokens(db, user),
     }
+
+
+@router.post("/token/refresh", status_code=status.HTTP_200_OK)
+async def refresh_token(
+    request: RefreshTokenRequest,
+    db: AsyncSession = Depends(get_db),
+):
+    return await rotate_refresh_token(db, request.refresh_token)
+
+
+@router.post("/logout/", status_code=status.HTTP_204_NO_CONTENT)
+async def logout(
+    request: RefreshTokenRequest,
+    db: AsyncSession = Depends(get_db),
+):
+    await revoke_refresh_token(db, request.refresh_token)
+    return Response(status_code=status.HTTP_204_NO_CONTENT)
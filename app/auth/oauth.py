@@ -1,10 +1,14 @@
 import os
+import time
 from ..models import User
+from ..schemas import UserOut
 from typing import Optional
+from collections import OrderedDict
 from ..database import get_db
 from jose import JWTError, jwt
 from dotenv import load_dotenv
-from sqlalchemy.orm import Session
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from fastapi.security import OAuth2PasswordBearer
 from datetime import datetime, timedelta, timezone
 from fastapi import Depends, HTTPException, status
@@ -13,10 +17,45 @@ load_dotenv()
 # Secret key for JWT
 SECRET_KEY = os.getenv("SECRET_KEY")
 ALGORITHM = os.getenv("ALGORITHM")
-ACCESS_TOKEN_EXPIRE_MINUTES = os.getenv("ACCESS_TOKEN_EXPIRE_MINUTES")
+ACCESS_TOKEN_EXPIRE_MINUTES = int(os.getenv("ACCESS_TOKEN_EXPIRE_MINUTES", "30"))
+REFRESH_TOKEN_EXPIRE_DAYS = int(os.getenv("REFRESH_TOKEN_EXPIRE_DAYS", "14"))
+USER_CACHE_TTL_SECONDS = int(os.getenv("USER_CACHE_TTL_SECONDS", "60"))
+USER_CACHE_MAX_ENTRIES = int(os.getenv("USER_CACHE_MAX_ENTRIES", "10000"))
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="login")
 
 
+class UserCache:
+    def __init__(self, ttl_seconds: int, max_entries: int):
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self._entries: OrderedDict = OrderedDict()
+
+    def get(self, user_id: int) -> Optional[UserOut]:
+        entry = self._entries.get(user_id)
+        if entry is None:
+            return None
+        stored_at, user = entry
+        if time.monotonic() - stored_at > self.ttl_seconds:
+            del self._entries[user_id]
+            return None
+        self._entries.move_to_end(user_id)
+        return user
+
+    def set(self, user: UserOut):
+        self._entries[user.id] = (time.monotonic(), user)
+        self._entries.move_to_end(user.id)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def invalidate(self, user_id: int):
+        self._entries.pop(user_id, None)
+
+
+user_cache = UserCache(
+    ttl_seconds=USER_CACHE_TTL_SECONDS, max_entries=USER_CACHE_MAX_ENTRIES
+)
+
+
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None) -> str:
     to_encode = data.copy()
     if expires_delta:
@@ -29,6 +68,11 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None) -
     return jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
 
 
+def create_refresh_token(user_id: int, jti: str, expires_at: datetime) -> str:
+    to_encode = {"user_id": user_id, "jti": jti, "type": "refresh", "exp": expires_at}
+    return jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
+
+
 def decode_access_token(token: str) -> dict:
     try:
         payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
@@ -37,29 +81,41 @@ def decode_access_token(token: str) -> dict:
         raise ValueError("Invalid token")
 
 
-def get_current_user(
-    token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)
-):
+async def get_token_claims(token: str = Depends(oauth2_scheme)) -> dict:
     try:
         payload = decode_access_token(token)
-        user_id: int = payload.get("user_id")
-        if user_id is None:
-            raise ValueError
-    except JWTError:
+    except ValueError:
+        payload = {}
+    # Refresh tokens are only accepted by /token/refresh.
+    if payload.get("user_id") is None or payload.get("type") == "refresh":
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Invalid authentication credentials",
         )
-    user = db.query(User).filter(User.id == user_id).first()
-    if user is None:
+    return payload
+
+
+async def get_current_user(
+    claims: dict = Depends(get_token_claims), db: AsyncSession = Depends(get_db)
+) -> UserOut:
+    user_id: int = claims["user_id"]
+    user = user_cache.get(user_id)
+    if user is not None:
+        return user
+
+    result = await db.execute(select(User).filter(User.id == user_id))
+    db_user = result.scalars().first()
+    if db_user is None:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="User not found",
         )
+    user = UserOut.model_validate(db_user)
+    user_cache.set(user)
     return user
 
 
-def admin_required(current_user: User = Depends(get_current_user)):
+async def admin_required(current_user: UserOut = Depends(get_current_user)):
     if current_user.role != "admin":
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN,
@@ -0,0 +1,168 @@
+import os
+import time
+import uuid
+from collections import OrderedDict
+from datetime import datetime, timedelta, timezone
+from dotenv import load_dotenv
+from fastapi import HTTPException, status
+from sqlalchemy import select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.models import User, RefreshToken
+from app.metrics import stage
+from app.auth.oauth import (
+    REFRESH_TOKEN_EXPIRE_DAYS,
+    create_access_token,
+    create_refresh_token,
+    decode_access_token,
+)
+
+load_dotenv()
+REVOKED_TOKEN_CACHE_MAX_ENTRIES = int(
+    os.getenv("REVOKED_TOKEN_CACHE_MAX_ENTRIES", "100000")
+)
+
+
+class RevokedTokenCache:
+    # Remembers revoked refresh token ids until they expire so replays are
+    # rejected without a database round trip. The table stays authoritative.
+
+    def __init__(self, max_entries: int):
+        self.max_entries = max_entries
+        self._entries: OrderedDict = OrderedDict()
+
+    def __contains__(self, jti: str) -> bool:
+        expires_at = self._entries.get(jti)
+        if expires_at is None:
+            return False
+        if expires_at <= time.time():
+            del self._entries[jti]
+            return False
+        return True
+
+    def add(self, jti: str, expires_at: float):
+        self._entries[jti] = expires_at
+        self._entries.move_to_end(jti)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+
+revoked_tokens = RevokedTokenCache(max_entries=REVOKED_TOKEN_CACHE_MAX_ENTRIES)
+
+
+def _invalid_refresh_token():
+    return HTTPException(
+        status_code=status.HTTP_401_UNAUTHORIZED,
+        detail="Invalid refresh token",
+    )
+
+
+def _refresh_claims(token: str) -> dict:
+    try:
+        claims = decode_access_token(token)
+    except ValueError:
+        raise _invalid_refresh_token()
+    if claims.get("type") != "refresh" or not claims.get("jti"):
+        raise _invalid_refresh_token()
+    return claims
+
+
+def _add_refresh_token(db: AsyncSession, user_id: int) -> tuple:
+    jti = uuid.uuid4().hex
+    expires_at = datetime.now(timezone.utc) + timedelta(days=REFRESH_TOKEN_EXPIRE_DAYS)
+    db.add(RefreshToken(jti=jti, user_id=user_id, expires_at=expires_at))
+    return jti, create_refresh_token(user_id, jti, expires_at)
+
+
+def _token_response(user, refresh_token: str) -> dict:
+    return {
+        "access_token": create_access_token(
+            data={"user_id": user.id, "role": user.role}
+        ),
+        "refresh_token": refresh_token,
+        "token_type": "bearer",
+    }
+
+
+async def issue_tokens(db: AsyncSession, user) -> dict:
+    with stage("login.tokens"):
+        _, refresh_token = _add_refresh_token(db, user.id)
+        await db.commit()
+    return _token_response(user, refresh_token)
+
+
+async def revoke_user_tokens(db: AsyncSession, *user_ids: int):
+    # Ends every session of the users; the caller commits.
+    if not user_ids:
+        return
+    result = await db.execute(
+        update(RefreshToken)
+        .where(RefreshToken.user_id.in_(user_ids), RefreshToken.revoked_at.is_(None))
+        .values(revoked_at=datetime.now(timezone.utc))
+        .returning(RefreshToken.jti, RefreshToken.expires_at)
+    )
+    for jti, expires_at in result.all():
+        revoked_tokens.add(jti, expires_at.timestamp())
+
+
+async def _reject_reused_token(db: AsyncSession, user_id: int):
+    # A revoked token being replayed means it leaked; end every session of
+    # that user.
+    await revoke_user_tokens(db, user_id)
+    await db.commit()
+    raise _invalid_refresh_token()
+
+
+async def rotate_refresh_token(db: AsyncSession, token: str) -> dict:
+    claims = _refresh_claims(token)
+    if claims["jti"] in revoked_tokens:
+        await _reject_reused_token(db, claims["user_id"])
+    now = datetime.now(timezone.utc)
+    new_jti, refresh_token = _add_refresh_token(db, claims["user_id"])
+
+    # Revoking the presented token and checking that it was still live is a
+    # single statement, so two concurrent refreshes cannot both succeed.
+    result = await db.execute(
+        update(RefreshToken)
+        .where(
+            RefreshToken.jti == claims["jti"],
+            RefreshToken.revoked_at.is_(None),
+            RefreshToken.expires_at > now,
+        )
+        .values(revoked_at=now, replaced_by=new_jti)
+        .returning(RefreshToken.user_id)
+    )
+    row = result.first()
+    if row is None:
+        await db.rollback()
+        await _reject_reused_token(db, claims["user_id"])
+
+    user_result = await db.execute(
+        select(User.id, User.role).filter(User.id == row.user_id)
+    )
+    user = user_result.first()
+    if user is None:
+        await db.rollback()
+        raise _invalid_refresh_token()
+    await db.commit()
+    revoked_tokens.add(claims["jti"], claims["exp"])
+    return _token_response(user, refresh_token)
+
+
+async def revoke_refresh_token(db: AsyncSession, token: str):
+    claims = _refresh_claims(token)
+    if claims["jti"] in revoked_tokens:
+        return
+    result = await db.execute(
+        update(RefreshToken)
+        .where(
+            RefreshToken.jti == claims["jti"],
+            RefreshToken.user_id == claims["user_id"],
+            RefreshToken.revoked_at.is_(None),
+        )
+        .values(revoked_at=datetime.now(timezone.utc))
+        .returning(RefreshToken.jti)
+    )
+    revoked = result.scalar()
+    await db.commit()
+    if revoked is not None:
+        revoked_tokens.add(claims["jti"], claims["exp"])
@@ -1,10 +1,147 @@
+import os
+import time
+import asyncio
+import multiprocessing
+from typing import List, Optional, Tuple
+from concurrent.futures import ProcessPoolExecutor
+from dotenv import load_dotenv
+from fastapi import HTTPException, status
 from passlib.context import CryptContext
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+from app.metrics import password_hash_seconds, registry
+
+load_dotenv()
+BCRYPT_ROUNDS = int(os.getenv("BCRYPT_ROUNDS", "12"))
+PASSWORD_HASH_WORKERS = int(os.getenv("PASSWORD_HASH_WORKERS", "2"))
+PASSWORD_HASH_MAX_PENDING = int(os.getenv("PASSWORD_HASH_MAX_PENDING", "32"))
+# Bulk provisioning hashes on its own pool so it cannot starve logins. A
+# lower cost factor is upgraded to BCRYPT_ROUNDS on the user's first login.
+BULK_PASSWORD_HASH_WORKERS = int(
+    os.getenv("BULK_PASSWORD_HASH_WORKERS", str(os.cpu_count() or 2))
+)
+BULK_BCRYPT_ROUNDS = int(os.getenv("BULK_BCRYPT_ROUNDS", str(BCRYPT_ROUNDS)))
+
+# Hashes made with a different cost factor are flagged by needs_update and
+# transparently re-hashed on the next successful login.
+pwd_context = CryptContext(
+    schemes=["bcrypt"], deprecated="auto", bcrypt__rounds=BCRYPT_ROUNDS
+)
+
 
 def hash_password(password: str) -> str:
     return pwd_context.hash(password)
 
+
+def hash_passwords(passwords: List[str], rounds: int) -> List[str]:
+    context = pwd_context.copy(bcrypt__rounds=rounds)
+    return [context.hash(password) for password in passwords]
+
+
 def verify_password(plain_password: str, hashed_password: str) -> bool:
     return pwd_context.verify(plain_password, hashed_password)
 
 
+def verify_and_update(
+    plain_password: str, hashed_password: str
+) -> Tuple[bool, Optional[str]]:
+    return pwd_context.verify_and_update(plain_password, hashed_password)
+
+
+class PasswordHasher:
+    # Past max_pending operations, requests are turned away with a 503, or
+    # with wait=True queue for a free slot.
+
+    def __init__(self, workers: int, max_pending: int, wait: bool = False):
+        self.workers = workers
+        self.max_pending = max_pending
+        self.wait = wait
+        self.pending = 0
+        self.waiting = 0
+        self._slots = asyncio.Semaphore(max_pending)
+        self._executor: Optional[ProcessPoolExecutor] = None
+
+    async def hash(self, password: str) -> str:
+        return await self._run(hash_password, password)
+
+    async def hash_many(
+        self, passwords: List[str], rounds: int = BCRYPT_ROUNDS
+    ) -> List[str]:
+        # One chunk per worker, so a batch costs a single round trip to each
+        # process instead of one per password.
+        size = max(1, -(-len(passwords) // self.workers))
+        chunks = await asyncio.gather(
+            *(
+                self._run(hash_passwords, passwords[i : i + size], rounds)
+                for i in range(0, len(passwords), size)
+            )
+        )
+        return [hashed for chunk in chunks for hashed in chunk]
+
+    async def verify(self, plain_password: str, hashed_password: str) -> bool:
+        return await self._run(verify_password, plain_password, hashed_password)
+
+    async def verify_and_update(
+        self, plain_password: str, hashed_password: str
+    ) -> Tuple[bool, Optional[str]]:
+        return await self._run(verify_and_update, plain_password, hashed_password)
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(cancel_futures=True)
+            self._executor = None
+
+    async def _run(self, fn, *args):
+        if self.pending >= self.max_pending and not self.wait:
+            raise HTTPException(
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                detail="Too many password operations in progress, please retry",
+                headers={"Retry-After": "1"},
+            )
+        self.waiting += 1
+        try:
+            await self._slots.acquire()
+        finally:
+            self.waiting -= 1
+        if self._executor is None:
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.workers,
+                mp_context=multiprocessing.get_context("spawn"),
+            )
+        self.pending += 1
+        started = time.perf_counter()
+        try:
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(self._executor, fn, *args)
+        finally:
+            self.pending -= 1
+            self._slots.release()
+            password_hash_seconds.observe(time.perf_counter() - started, fn.__name__)
+
+
+password_hasher = PasswordHasher(
+    workers=PASSWORD_HASH_WORKERS, max_pending=PASSWORD_HASH_MAX_PENDING
+)
+# Bulk requests have already started streaming their response when they
+# hash, so they wait for the pool rather than fail with a 503.
+bulk_password_hasher = PasswordHasher(
+    workers=BULK_PASSWORD_HASH_WORKERS,
+    max_pending=BULK_PASSWORD_HASH_WORKERS,
+    wait=True,
+)
+registry.collect_stats(
+    "password_hasher",
+    lambda: {
+        "pending": password_hasher.pending,
+        "waiting": password_hasher.waiting,
+        "workers": password_hasher.workers,
+    },
+    help="Password hashing pool",
+)
+registry.collect_stats(
+    "bulk_password_hasher",
+    lambda: {
+        "pending": bulk_password_hasher.pending,
+        "waiting": bulk_password_hasher.waiting,
+        "workers": bulk_password_hasher.workers,
+    },
+    help="Bulk password hashing pool",
+)
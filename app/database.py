@@ -1,31 +1,221 @@
 import os
-from dotenv import load_dotenv
 import time
-from sqlalchemy import create_engine
+import asyncio
+import logging
+import contextvars
+from contextlib import contextmanager
+from dotenv import load_dotenv
+from sqlalchemy import event, text
+from sqlalchemy.engine import make_url
+from sqlalchemy.pool import AsyncAdaptedQueuePool
 from sqlalchemy.orm import sessionmaker, declarative_base
-from sqlalchemy.exc import OperationalError
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+from sqlalchemy.exc import DBAPIError, TimeoutError as PoolTimeoutError
+from app.metrics import db_statement_seconds, registry
 
 load_dotenv()
+logger = logging.getLogger(__name__)
+
 DATABASE_URL = os.getenv("DATABASE_URL")
-for _ in range(10):
-    try:
-        engine = create_engine(DATABASE_URL, echo=True)
-        engine.connect()
-        print("Database connected successfully")
-        break
-    except OperationalError:
-        print("Database connection failed. Retrying...")
-        time.sleep(5)
-else:
-    raise RuntimeError("Could not connect to the database after 10 retries.")
-
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+DB_ECHO = os.getenv("DB_ECHO", "false").lower() == "true"
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "10"))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "10"))
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "30"))
+DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", "1800"))
+DB_POOL_PRE_PING = os.getenv("DB_POOL_PRE_PING", "true").lower() == "true"
+DB_STATEMENT_TIMEOUT_MS = int(os.getenv("DB_STATEMENT_TIMEOUT_MS", "30000"))
+DB_CONNECT_RETRIES = int(os.getenv("DB_CONNECT_RETRIES", "10"))
+DB_CONNECT_BACKOFF = float(os.getenv("DB_CONNECT_BACKOFF", "0.5"))
+DB_CONNECT_BACKOFF_MAX = float(os.getenv("DB_CONNECT_BACKOFF_MAX", "10"))
+
+
+ASYNC_DRIVERS = {"postgresql": "asyncpg"}
+
+# Changes to tables that already exist, which create_all does not apply.
+SCHEMA_UPGRADES = {
+    "postgresql": [
+        "ALTER TABLE user_generated_plans ADD COLUMN IF NOT EXISTS plan JSONB",
+        "ALTER TABLE user_generated_plans ALTER COLUMN generated_plan DROP NOT NULL",
+        "ALTER TABLE user_generated_plans ADD COLUMN IF NOT EXISTS request JSONB",
+        "ALTER TABLE user_generated_plans ADD COLUMN IF NOT EXISTS parent_id INTEGER "
+        "REFERENCES user_generated_plans(id) ON DELETE SET NULL",
+        "ALTER TABLE user_generated_plans "
+        "ADD COLUMN IF NOT EXISTS version INTEGER NOT NULL DEFAULT 1",
+    ]
+}
+
+
+class InstrumentedQueuePool(AsyncAdaptedQueuePool):
+    # Records how long callers wait for a pooled connection so the pool can
+    # be sized against the number of workers.
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.checkouts = 0
+        self.checkout_timeouts = 0
+        self.wait_seconds_total = 0.0
+        self.wait_seconds_max = 0.0
+
+    def _do_get(self):
+        started = time.perf_counter()
+        try:
+            return super()._do_get()
+        except PoolTimeoutError:
+            self.checkout_timeouts += 1
+            raise
+        finally:
+            waited = time.perf_counter() - started
+            self.checkouts += 1
+            self.wait_seconds_total += waited
+            self.wait_seconds_max = max(self.wait_seconds_max, waited)
+
+
+def async_database_url(url: str):
+    url = make_url(url)
+    driver = ASYNC_DRIVERS.get(url.get_backend_name())
+    if driver is None:
+        return url
+    return url.set(drivername=f"{url.get_backend_name()}+{driver}")
+
+
+def build_engine(url: str = DATABASE_URL):
+    url = async_database_url(url)
+    connect_args = {}
+    if url.get_backend_name() == "postgresql":
+        connect_args["server_settings"] = {
+            "statement_timeout": str(DB_STATEMENT_TIMEOUT_MS)
+        }
+    return create_async_engine(
+        url,
+        echo=DB_ECHO,
+        poolclass=InstrumentedQueuePool,
+        pool_size=DB_POOL_SIZE,
+        max_overflow=DB_MAX_OVERFLOW,
+        pool_timeout=DB_POOL_TIMEOUT,
+        pool_recycle=DB_POOL_RECYCLE,
+        pool_pre_ping=DB_POOL_PRE_PING,
+        connect_args=connect_args,
+    )
+
+
+engine = build_engine()
+SessionLocal = sessionmaker(
+    engine, class_=AsyncSession, autoflush=False, expire_on_commit=False
+)
 Base = declarative_base()
+_statement_counters = contextvars.ContextVar("statement_counters", default=())
+
+
+@event.listens_for(engine.sync_engine, "before_cursor_execute")
+def _statement_started(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("statement_started", []).append(time.perf_counter())
+
 
+@event.listens_for(engine.sync_engine, "after_cursor_execute")
+def _statement_finished(conn, cursor, statement, parameters, context, executemany):
+    started = conn.info.get("statement_started")
+    if not started:
+        return
+    elapsed = time.perf_counter() - started.pop()
+    db_statement_seconds.observe(elapsed)
+    for counter in _statement_counters.get():
+        counter[0] += 1
+        counter[1] += elapsed
 
-def get_db():
-    db = SessionLocal()
+
+@event.listens_for(engine.sync_engine, "handle_error")
+def _statement_failed(context):
+    started = (
+        context.connection.info.get("statement_started") if context.connection else None
+    )
+    if started:
+        started.pop()
+    for counter in _statement_counters.get():
+        counter[0] += 1
+
+
+@contextmanager
+def count_statements():
+    # Counts the statements the current task sends inside the block, and the
+    # seconds they took ([count, seconds]); blocks may be nested.
+    counter = [0, 0.0]
+    token = _statement_counters.set(_statement_counters.get() + (counter,))
     try:
-        yield db
+        yield counter
     finally:
-        db.close()
+        _statement_counters.reset(token)
+
+
+async def _probe():
+    async with engine.connect() as connection:
+        await connection.execute(text("SELECT 1"))
+
+
+def _create_tables(connection):
+    Base.metadata.create_all(connection)
+    for statement in SCHEMA_UPGRADES.get(connection.dialect.name, []):
+        connection.execute(text(statement))
+    # create_all only adds indexes along with new tables, so backfill any
+    # index added to an existing table.
+    for table in Base.metadata.sorted_tables:
+        for index in table.indexes:
+            index.create(connection, checkfirst=True)
+
+
+async def init_db():
+    async with engine.begin() as connection:
+        await connection.run_sync(_create_tables)
+
+
+async def wait_for_database():
+    delay = DB_CONNECT_BACKOFF
+    for attempt in range(1, DB_CONNECT_RETRIES + 1):
+        try:
+            await _probe()
+            logger.info("Database connected successfully")
+            return
+        except (DBAPIError, OSError):
+            logger.warning(
+                "Database connection failed (attempt %s/%s), retrying in %.1fs",
+                attempt,
+                DB_CONNECT_RETRIES,
+                delay,
+            )
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, DB_CONNECT_BACKOFF_MAX)
+    raise RuntimeError(
+        f"Could not connect to the database after {DB_CONNECT_RETRIES} retries."
+    )
+
+
+def pool_stats() -> dict:
+    pool = engine.sync_engine.pool
+    return {
+        "size": pool.size(),
+        "checked_in": pool.checkedin(),
+        "checked_out": pool.checkedout(),
+        "overflow": pool.overflow(),
+        "max_overflow": DB_MAX_OVERFLOW,
+        "checkouts": pool.checkouts,
+        "checkout_timeouts": pool.checkout_timeouts,
+        "wait_seconds_total": round(pool.wait_seconds_total, 6),
+        "wait_seconds_max": round(pool.wait_seconds_max, 6),
+        "wait_seconds_avg": (
+            round(pool.wait_seconds_total / pool.checkouts, 6)
+            if pool.checkouts
+            else 0.0
+        ),
+    }
+
+
+registry.collect_stats(
+    "db_pool",
+    pool_stats,
+    counters=("checkouts", "checkout_timeouts", "wait_seconds_total"),
+    help="Database connection pool",
+)
+
+
+async def get_db():
+    async with SessionLocal() as db:
+        yield db
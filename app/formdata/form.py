@@ -1,82 +1,84 @@
 from fastapi import APIRouter, Depends, HTTPException, status
 from fastapi.responses import JSONResponse
-from sqlalchemy.orm import Session
+from sqlalchemy import select, update
+from sqlalchemy.ext.asyncio import AsyncSession
 from app.database import get_db
-from app.models import User, UserPlan, PlanType, Activity, Meal, UserActivity
-from app.schemas import FormRequest
+from app.models import User, UserPlan, Activity, Meal, UserActivity
+from app.schemas import FormRequest, UserOut
 from app.auth.oauth import get_current_user
+from app.formdata.plan_types import plan_types
+from app.metrics import stage
 
 router = APIRouter(tags=["Onboarding"])
 
 
 @router.post("/onboarding", status_code=status.HTTP_201_CREATED)
-def onboarding(
+async def onboarding(
     form_data: FormRequest,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db),
+    current_user: UserOut = Depends(get_current_user),
 ):
     try:
-        # Fetch the current user
-        user = db.query(User).filter(User.id == current_user.id).first()
-        if not user:
+        # Update the profile in place; get_current_user already loaded it.
+        with stage("onboarding.profile"):
+            result = await db.execute(
+                update(User)
+                .where(User.id == current_user.id)
+                .values(
+                    gender=form_data.gender,
+                    age_group=form_data.ageGroup,
+                    weight=form_data.currentWeight,
+                    weight_unit=form_data.weightUnit,
+                    target_weight=form_data.targetWeight,
+                    target_weight_unit=form_data.targetWeightUnit,
+                    height=form_data.height,
+                    target_height_unit=form_data.heightUnit,
+                )
+                .execution_options(synchronize_session=False)
+            )
+        if result.rowcount == 0:
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND, detail="User not found"
             )
 
-        user.gender = form_data.gender
-        user.age_group = form_data.ageGroup
-        user.weight = form_data.currentWeight
-        user.weight_unit = form_data.weightUnit
-        user.target_weight = form_data.targetWeight
-        user.target_weight_unit = form_data.targetWeightUnit
-        user.height = form_data.height
-        user.target_height_unit = form_data.heightUnit
-        db.add(user)
-
-        plan_type = (
-            db.query(PlanType).filter(PlanType.plan_name == form_data.planType).first()
-        )
-        if not plan_type:
-            plan_type = PlanType(plan_name=form_data.planType)
-            db.add(plan_type)
-            db.commit()
-            db.refresh(plan_type)
+        with stage("onboarding.plan_type"):
+            plan_type_id = await plan_types.get_or_create(form_data.planType)
 
         user_plan = UserPlan(
             user_id=current_user.id,
-            plan_type_id=plan_type.id,
+            plan_type_id=plan_type_id,
             goal_time=form_data.timeGoal,
         )
-        db.add(user_plan)
-        db.commit()
-
         activity = Activity(
-            plan_id=plan_type.id,
+            plan_id=plan_type_id,
             yoga_experience=form_data.yogaExperience,
             yoga_type=form_data.yogaType,
             workout_preference=form_data.workoutPreference,
             workout_days=form_data.workoutDays,
             activity_level=form_data.activityLevel,
         )
-        db.add(activity)
-        db.commit()
-        db.refresh(activity)
-
-        user_activity = UserActivity(user_id=current_user.id, activity_id=activity.id)
-        db.add(user_activity)
+        user_activity = UserActivity(user_id=current_user.id, activity=activity)
+        db.add_all([user_plan, activity, user_activity])
 
-        meal = db.query(Meal).filter(Meal.user_id == current_user.id).first()
+        with stage("onboarding.meal_lookup"):
+            result = await db.execute(
+                select(Meal).filter(Meal.user_id == current_user.id)
+            )
+            meal = result.scalars().first()
         if not meal:
-            meal = Meal(user_id=current_user.id, plan_id=user_plan.plan_type_id)
+            meal = Meal(user_id=current_user.id, plan_id=plan_type_id)
+            db.add(meal)
 
         meal.diet_type = form_data.dietType
         meal.diet_restrictions = form_data.dietRestrictions
         meal.meal_preference = form_data.mealPreference
         meal.key_goals = form_data.dietGoals
         meal.medical_restrictions = form_data.medicalConditions
-        db.add(meal)
 
-        db.commit()
+        # One flush and commit writes everything, so a failure leaves no
+        # partial onboarding behind.
+        with stage("onboarding.commit"):
+            await db.commit()
 
         return JSONResponse(
             content={
@@ -86,7 +88,11 @@ def onboarding(
             status_code=status.HTTP_201_CREATED,
         )
 
+    except HTTPException:
+        await db.rollback()
+        raise
     except Exception as e:
+        await db.rollback()
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail=f"An error occurred: {str(e)}",
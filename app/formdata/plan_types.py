@@ -0,0 +1,50 @@
+from typing import Dict
+from sqlalchemy import select
+from sqlalchemy.dialects.postgresql import insert
+from app.database import SessionLocal
+from app.models import PlanType
+
+DEFAULT_PLAN_TYPES = ("diet", "dietYoga", "dietWorkout", "dietYogaWorkout")
+
+
+class PlanTypeRegistry:
+    def __init__(self, defaults=DEFAULT_PLAN_TYPES):
+        self.defaults = tuple(defaults)
+        self._ids: Dict[str, int] = {}
+
+    def all(self) -> Dict[str, int]:
+        return dict(self._ids)
+
+    async def load(self):
+        async with SessionLocal() as db:
+            if self.defaults:
+                await db.execute(
+                    insert(PlanType)
+                    .values([{"plan_name": name} for name in self.defaults])
+                    .on_conflict_do_nothing(index_elements=[PlanType.plan_name])
+                )
+                await db.commit()
+            result = await db.execute(select(PlanType.plan_name, PlanType.id))
+            self._ids = dict(result.all())
+
+    async def get_or_create(self, plan_name: str) -> int:
+        plan_type_id = self._ids.get(plan_name)
+        if plan_type_id is not None:
+            return plan_type_id
+
+        # Created in its own transaction so the cached id stays valid even if
+        # the caller's transaction rolls back. DO UPDATE makes RETURNING yield
+        # the id when a concurrent request inserted the row first.
+        stmt = insert(PlanType).values(plan_name=plan_name)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[PlanType.plan_name],
+            set_={"plan_name": stmt.excluded.plan_name},
+        ).returning(PlanType.id)
+        async with SessionLocal() as db:
+            plan_type_id = (await db.execute(stmt)).scalar_one()
+            await db.commit()
+        self._ids[plan_name] = plan_type_id
+        return plan_type_id
+
+
+plan_types = PlanTypeRegistry()
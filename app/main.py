@@ -1,20 +1,35 @@
+import os
+from contextlib import asynccontextmanager
 from dotenv import load_dotenv
-from fastapi import FastAPI
-from .database import engine, Base
+from typing import Optional
+from fastapi import FastAPI, Depends, Header, HTTPException, Response, status
+from .database import wait_for_database, init_db, pool_stats, count_statements
+from .metrics import (
+    registry,
+    MetricsMiddleware,
+    METRICS_ENABLED,
+    METRICS_TOKEN,
+    CONTENT_TYPE,
+)
 from .models import User
 from passlib.hash import bcrypt
 from sqlalchemy import event
-from app.user import user
+from app.user import user, bulk, profile
 from app.auth import login
 from app.plan_generation import langchain_utils
 from app.formdata import form
+from app.formdata.plan_types import plan_types
+from app.auth.oauth import admin_required
+from app.auth.utils import password_hasher, bulk_password_hasher
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.middleware.gzip import GZipMiddleware
 from starlette.middleware.trustedhost import TrustedHostMiddleware
 from starlette.middleware.base import BaseHTTPMiddleware
 from starlette.responses import RedirectResponse
 from rich import traceback
 
 load_dotenv()
+GZIP_MINIMUM_SIZE = int(os.getenv("GZIP_MINIMUM_SIZE", "1000"))
 
 INITIAL_DATA = {
     "users": [
@@ -38,7 +53,20 @@ def initialize_table(target, connection, **kw):
 
 event.listen(User.__table__, "after_create", initialize_table)
 
-app = FastAPI()
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    await wait_for_database()
+    await init_db()
+    await plan_types.load()
+    await langchain_utils.plan_jobs.start()
+    yield
+    await langchain_utils.plan_jobs.stop()
+    password_hasher.shutdown()
+    bulk_password_hasher.shutdown()
+
+
+app = FastAPI(lifespan=lifespan)
 
 origin = [
     "https://nutritionai.crunchyapps.com",
@@ -55,6 +83,7 @@ app.add_middleware(
 )
 
 app.add_middleware(TrustedHostMiddleware, allowed_hosts=["*"])
+app.add_middleware(GZipMiddleware, minimum_size=GZIP_MINIMUM_SIZE)
 
 
 @app.middleware("http")
@@ -64,9 +93,16 @@ async def enforce_https(request, call_next):
         return RedirectResponse(url, status_code=301)
     return await call_next(request)
 
+
+# Added last so it wraps every other middleware and times the whole request.
+if METRICS_ENABLED:
+    app.add_middleware(MetricsMiddleware, count_statements=count_statements)
+
 # import user router
 app.include_router(login.router)
 app.include_router(user.router)
+app.include_router(bulk.router)
+app.include_router(profile.router)
 app.include_router(langchain_utils.router)
 app.include_router(form.router)
 
@@ -79,3 +115,28 @@ async def health():
     return {"status": "ok"}
 
 
+@app.post("/admin/plan-types/refresh")
+async def refresh_plan_types(admin=Depends(admin_required)):
+    await plan_types.load()
+    return plan_types.all()
+
+
+# The stats endpoints read counters the event loop keeps updating, so they
+# run on the loop rather than in the threadpool.
+@app.get("/admin/db-pool/stats")
+async def get_db_pool_stats(admin=Depends(admin_required)):
+    return pool_stats()
+
+
+@app.get("/metrics", include_in_schema=False)
+async def metrics(authorization: Optional[str] = Header(None)):
+    if not METRICS_ENABLED:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Not Found")
+    if METRICS_TOKEN and authorization != f"Bearer {METRICS_TOKEN}":
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Invalid metrics token",
+        )
+    return Response(registry.render(), media_type=CONTENT_TYPE)
+
+
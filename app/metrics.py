@@ -0,0 +1,285 @@
+import os
+import time
+import bisect
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterable, Tuple
+from dotenv import load_dotenv
+
+load_dotenv()
+METRICS_ENABLED = os.getenv("METRICS_ENABLED", "true").lower() == "true"
+# When set, /metrics requires "Authorization: Bearer <token>".
+METRICS_TOKEN = os.getenv("METRICS_TOKEN")
+
+LATENCY_BUCKETS = (
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1,
+    2.5,
+    5,
+    10,
+    30,
+    60,
+    120,
+    300,
+)
+COUNT_BUCKETS = (0, 1, 2, 3, 5, 8, 13, 21, 34, 55, 89)
+TOKEN_BUCKETS = (64, 256, 1024, 2048, 4096, 8192, 16384, 32768)
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+# Metrics are plain dicts updated from the event loop thread, so recording
+# one is a dict lookup and an addition; rendering happens at scrape time.
+
+
+def _format_labels(names: Tuple[str, ...], values: Tuple, extra: str = "") -> str:
+    pairs = [
+        f'{name}="{str(value)}"'.replace("\n", " ")
+        for name, value in zip(names, values)
+    ]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if not float(value).is_integer() else str(int(value))
+
+
+class Counter:
+    kind = "counter"
+
+    def __init__(self, name: str, help: str, labels: Tuple[str, ...] = ()):
+        self.name = name
+        self.help = help
+        self.labels = labels
+        self._values: Dict[Tuple, float] = {}
+
+    def inc(self, *label_values, amount: float = 1):
+        self._values[label_values] = self._values.get(label_values, 0) + amount
+
+    def lines(self) -> Iterable[str]:
+        for label_values, value in self._values.items():
+            labels = _format_labels(self.labels, label_values)
+            yield f"{self.name}{labels} {_format_value(value)}"
+
+
+class Histogram:
+    kind = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        help: str,
+        labels: Tuple[str, ...] = (),
+        buckets: Tuple[float, ...] = LATENCY_BUCKETS,
+    ):
+        self.name = name
+        self.help = help
+        self.labels = labels
+        self.buckets = tuple(buckets)
+        # label values -> [per-bucket counts..., +Inf count, sum]
+        self._values: Dict[Tuple, list] = {}
+
+    def observe(self, value: float, *label_values):
+        entry = self._values.get(label_values)
+        if entry is None:
+            entry = self._values[label_values] = [0] * (len(self.buckets) + 2)
+        entry[bisect.bisect_left(self.buckets, value)] += 1
+        entry[-1] += value
+
+    @contextmanager
+    def time(self, *label_values):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started, *label_values)
+
+    def lines(self) -> Iterable[str]:
+        for label_values, entry in self._values.items():
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), entry):
+                cumulative += count
+                labels = _format_labels(
+                    self.labels, label_values, f'le="{_format_value(bound)}"'
+                )
+                yield f"{self.name}_bucket{labels} {cumulative}"
+            labels = _format_labels(self.labels, label_values)
+            yield f"{self.name}_sum{labels} {_format_value(entry[-1])}"
+            yield f"{self.name}_count{labels} {cumulative}"
+
+
+class StatsCollector:
+    # Exposes the numeric fields of an existing stats() dict at scrape time,
+    # so components keep their own counters and pay nothing per event.
+
+    def __init__(
+        self,
+        prefix: str,
+        stats: Callable[[], dict],
+        counters: Tuple[str, ...] = (),
+        help: str = "",
+    ):
+        self.prefix = prefix
+        self.stats = stats
+        self.counters = counters
+        self.help = help
+
+    def families(self) -> Iterable[Tuple[str, str, str, list]]:
+        for key, value in self.stats().items():
+            if isinstance(value, bool) or not isinstance(value, (int, float)):
+                continue
+            if key in self.counters:
+                name = f"{self.prefix}_{key}"
+                if not name.endswith("_total"):
+                    name += "_total"
+                kind = "counter"
+            else:
+                name, kind = f"{self.prefix}_{key}", "gauge"
+            help = f"{self.help or self.prefix} {key.replace('_', ' ')}"
+            yield name, kind, help, [f"{name} {_format_value(value)}"]
+
+
+class Registry:
+    def __init__(self):
+        self._metrics = {}
+        self._collectors = []
+
+    def register(self, metric):
+        self._metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name: str, help: str, labels: Tuple[str, ...] = ()) -> Counter:
+        return self.register(Counter(name, help, labels))
+
+    def histogram(
+        self,
+        name: str,
+        help: str,
+        labels: Tuple[str, ...] = (),
+        buckets: Tuple[float, ...] = LATENCY_BUCKETS,
+    ) -> Histogram:
+        return self.register(Histogram(name, help, labels, buckets))
+
+    def collect_stats(
+        self,
+        prefix: str,
+        stats: Callable[[], dict],
+        counters: Tuple[str, ...] = (),
+        help: str = "",
+    ):
+        self._collectors.append(StatsCollector(prefix, stats, counters, help))
+
+    def render(self) -> str:
+        out = []
+        for metric in self._metrics.values():
+            out.append(f"# HELP {metric.name} {metric.help}")
+            out.append(f"# TYPE {metric.name} {metric.kind}")
+            out.extend(metric.lines())
+        for collector in self._collectors:
+            for name, kind, help, lines in collector.families():
+                out.append(f"# HELP {name} {help}")
+                out.append(f"# TYPE {name} {kind}")
+                out.extend(lines)
+        return "\n".join(out) + "\n"
+
+
+registry = Registry()
+
+http_requests = registry.counter(
+    "http_requests_total", "HTTP requests served", ("method", "route", "status")
+)
+http_request_seconds = registry.histogram(
+    "http_request_duration_seconds",
+    "Time from receiving a request to sending the last byte of its response",
+    ("method", "route"),
+)
+http_request_db_statements = registry.histogram(
+    "http_request_db_statements",
+    "Database statements issued while serving a request",
+    ("method", "route"),
+    COUNT_BUCKETS,
+)
+http_request_db_seconds = registry.histogram(
+    "http_request_db_seconds",
+    "Time spent executing database statements while serving a request",
+    ("method", "route"),
+)
+db_statement_seconds = registry.histogram(
+    "db_statement_duration_seconds", "Execution time of single database statements"
+)
+stage_seconds = registry.histogram(
+    "stage_duration_seconds",
+    "Time spent in a named stage of a request (e.g. plan.llm, login.verify)",
+    ("stage",),
+)
+password_hash_seconds = registry.histogram(
+    "password_hash_duration_seconds",
+    "Time password hashing spends in the worker pool, after a slot is free",
+    ("operation",),
+)
+llm_call_seconds = registry.histogram(
+    "llm_call_duration_seconds", "Latency of LLM calls", ("plan_type",)
+)
+llm_completion_tokens = registry.histogram(
+    "llm_completion_tokens",
+    "Completion tokens per LLM call",
+    ("plan_type",),
+    TOKEN_BUCKETS,
+)
+llm_tokens = registry.counter(
+    "llm_tokens_total",
+    "LLM tokens by direction (prompt, cached_prompt, completion)",
+    ("plan_type", "direction"),
+)
+llm_call_errors = registry.counter(
+    "llm_call_errors_total", "LLM calls that raised", ("plan_type",)
+)
+
+
+def stage(name: str):
+    return stage_seconds.time(name)
+
+
+def route_of(scope: dict) -> str:
+    # The route template keeps label cardinality bounded.
+    route = scope.get("route")
+    return getattr(route, "path", None) or "unmatched"
+
+
+class MetricsMiddleware:
+    # count_statements comes from app.database, which itself records into
+    # this module, so it is passed in rather than imported.
+
+    def __init__(self, app, count_statements: Callable):
+        self.app = app
+        self.count_statements = count_statements
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+        started = time.perf_counter()
+        response_status = [500]
+
+        async def send_with_status(message):
+            if message["type"] == "http.response.start":
+                response_status[0] = message["status"]
+            await send(message)
+
+        with self.count_statements() as statements:
+            try:
+                await self.app(scope, receive, send_with_status)
+            finally:
+                method, route = scope["method"], route_of(scope)
+                http_request_seconds.observe(
+                    time.perf_counter() - started, method, route
+                )
+                http_requests.inc(method, route, response_status[0])
+                http_request_db_statements.observe(statements[0], method, route)
+                http_request_db_seconds.observe(statements[1], method, route)
@@ -1,8 +1,9 @@
-from sqlalchemy import Column, Integer, String, ForeignKey, Float, Text
+from sqlalchemy import Column, Integer, String, ForeignKey, Float, Text, Index
 from .database import Base
 from sqlalchemy.sql.sqltypes import TIMESTAMP
 from sqlalchemy.sql.expression import text
 from sqlalchemy.orm import relationship
+from sqlalchemy.dialects.postgresql import JSONB
 
 
 class User(Base):
@@ -29,10 +30,16 @@ class User(Base):
         TIMESTAMP(timezone=True), nullable=False, server_default=text("now()")
     )
 
-    plan = relationship("UserPlan", back_populates="user")
-    activity = relationship("UserActivity", back_populates="user")
-    meal = relationship("Meal", back_populates="user")
-    generated_plans = relationship("UserGeneratedPlan", back_populates="user")
+    # Never lazy-loaded: pick a strategy from app.user.loading instead, so
+    # every view issues a fixed number of statements.
+    plan = relationship("UserPlan", back_populates="user", lazy="raise_on_sql")
+    activity = relationship("UserActivity", back_populates="user", lazy="raise_on_sql")
+    meal = relationship("Meal", back_populates="user", lazy="raise_on_sql")
+    generated_plans = relationship(
+        "UserGeneratedPlan", back_populates="user", lazy="raise_on_sql"
+    )
+
+    __table_args__ = (Index("ix_users_created_at_id", "created_at", "id"),)
 
 
 class PlanType(Base):
@@ -68,7 +75,9 @@ class UserPlan(Base):
     )
 
     user = relationship("User", back_populates="plan")
-    plan_type = relationship("PlanType", back_populates="user_plan")
+    plan_type = relationship(
+        "PlanType", back_populates="user_plan", lazy="raise_on_sql"
+    )
 
 
 class Activity(Base):
@@ -88,7 +97,7 @@ class Activity(Base):
         TIMESTAMP(timezone=True), nullable=False, server_default=text("now()")
     )
 
-    plan_type = relationship("PlanType", back_populates="activity")
+    plan_type = relationship("PlanType", back_populates="activity", lazy="raise_on_sql")
     user_activity = relationship("UserActivity", back_populates="activity")
 
 
@@ -107,7 +116,9 @@ class UserActivity(Base):
     )
 
     user = relationship("User", back_populates="activity")
-    activity = relationship("Activity", back_populates="user_activity")
+    activity = relationship(
+        "Activity", back_populates="user_activity", lazy="raise_on_sql"
+    )
 
 
 class Meal(Base):
@@ -130,7 +141,7 @@ class Meal(Base):
     )
 
     user = relationship("User", back_populates="meal")
-    plan_type = relationship("PlanType", back_populates="meal")
+    plan_type = relationship("PlanType", back_populates="meal", lazy="raise_on_sql")
 
 
 class UserGeneratedPlan(Base):
@@ -141,9 +152,108 @@ class UserGeneratedPlan(Base):
         Integer, ForeignKey("users.id", ondelete="CASCADE"), nullable=False
     )
     plan_type = Column(String, nullable=False)
-    generated_plan = Column(Text, nullable=False)
+    generated_plan = Column(Text, nullable=True)
+    plan = Column(JSONB, nullable=True)
+    request = Column(JSONB, nullable=True)
+    parent_id = Column(
+        Integer,
+        ForeignKey("user_generated_plans.id", ondelete="SET NULL"),
+        nullable=True,
+    )
+    version = Column(Integer, nullable=False, default=1, server_default=text("1"))
     goal_time = Column(String, nullable=True)
     created_at = Column(
         TIMESTAMP(timezone=True), nullable=False, server_default=text("now()")
     )
     user = relationship("User", back_populates="generated_plans")
+
+    __table_args__ = (
+        Index(
+            "ix_user_generated_plans_user_id_created_at_id",
+            "user_id",
+            "created_at",
+            "id",
+        ),
+    )
+
+
+class PlanJob(Base):
+    __tablename__ = "plan_jobs"
+
+    id = Column(String, primary_key=True, index=True)
+    user_id = Column(
+        Integer, ForeignKey("users.id", ondelete="CASCADE"), nullable=False, index=True
+    )
+    status = Column(String, nullable=False, server_default=text("'queued'"))
+    request = Column(Text, nullable=False)
+    generated_plan_id = Column(
+        Integer,
+        ForeignKey("user_generated_plans.id", ondelete="SET NULL"),
+        nullable=True,
+    )
+    error = Column(Text, nullable=True)
+    created_at = Column(
+        TIMESTAMP(timezone=True), nullable=False, server_default=text("now()")
+    )
+    updated_at = Column(
+        TIMESTAMP(timezone=True), nullable=False, server_default=text("now()")
+    )
+
+    generated_plan = relationship("UserGeneratedPlan")
+
+
+class PlanFlight(Base):
+    # One row per in-flight (or just finished) generation of a user's request,
+    # so identical requests on any worker share a single model call.
+    __tablename__ = "plan_flights"
+
+    key = Column(String, primary_key=True)
+    user_id = Column(
+        Integer, ForeignKey("users.id", ondelete="CASCADE"), nullable=False
+    )
+    status = Column(String, nullable=False, server_default=text("'running'"))
+    plan_id = Column(
+        Integer,
+        ForeignKey("user_generated_plans.id", ondelete="SET NULL"),
+        nullable=True,
+    )
+    updated_at = Column(
+        TIMESTAMP(timezone=True),
+        nullable=False,
+        server_default=text("now()"),
+        index=True,
+    )
+
+
+class PlanCacheEntry(Base):
+    __tablename__ = "plan_cache"
+
+    key = Column(String, primary_key=True)
+    plan_type = Column(String, nullable=False)
+    content = Column(Text, nullable=False)
+    size_bytes = Column(Integer, nullable=False)
+    hits = Column(Integer, nullable=False, server_default=text("0"))
+    created_at = Column(
+        TIMESTAMP(timezone=True), nullable=False, server_default=text("now()")
+    )
+    last_used_at = Column(
+        TIMESTAMP(timezone=True),
+        nullable=False,
+        server_default=text("now()"),
+        index=True,
+    )
+
+
+class RefreshToken(Base):
+    __tablename__ = "refresh_tokens"
+
+    jti = Column(String, primary_key=True)
+    user_id = Column(
+        Integer, ForeignKey("users.id", ondelete="CASCADE"), nullable=False, index=True
+    )
+    expires_at = Column(TIMESTAMP(timezone=True), nullable=False, index=True)
+    revoked_at = Column(TIMESTAMP(timezone=True), nullable=True)
+    replaced_by = Column(String, nullable=True)
+    created_at = Column(
+        TIMESTAMP(timezone=True), nullable=False, server_default=text("now()")
+    )
@@ -0,0 +1,62 @@
+import base64
+from datetime import datetime
+from typing import Optional
+from fastapi import HTTPException, Query, status
+from sqlalchemy import tuple_
+
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 200
+
+
+class PageParams:
+    def __init__(
+        self,
+        limit: Optional[int] = Query(None, ge=1, le=MAX_PAGE_SIZE),
+        cursor: Optional[str] = Query(None),
+    ):
+        # Without limit or cursor a listing keeps its original response, a
+        # bare array of every row; either one switches to {items, next_cursor}.
+        self.paged = limit is not None or cursor is not None
+        self.limit = limit or DEFAULT_PAGE_SIZE
+        self.cursor = cursor
+
+
+def encode_cursor(created_at: datetime, id: int) -> str:
+    raw = f"{created_at.isoformat()}|{id}"
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> tuple:
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        created_at, id = base64.urlsafe_b64decode(padded).decode().split("|")
+        return datetime.fromisoformat(created_at), int(id)
+    except ValueError:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid cursor"
+        )
+
+
+def paginate(stmt, created_at_column, id_column, page: PageParams, descending=False):
+    # Seek past the cursor on (created_at, id) instead of using OFFSET, so each
+    # page is an index range scan no matter how deep it is.
+    key = tuple_(created_at_column, id_column)
+    if page.cursor is not None:
+        position = tuple_(*decode_cursor(page.cursor))
+        stmt = stmt.where(key < position if descending else key > position)
+    if descending:
+        stmt = stmt.order_by(created_at_column.desc(), id_column.desc())
+    else:
+        stmt = stmt.order_by(created_at_column, id_column)
+    return stmt.limit(page.limit + 1) if page.paged else stmt
+
+
+def page_of(rows, page: PageParams):
+    if not page.paged:
+        return rows
+    items = rows[: page.limit]
+    next_cursor = None
+    if len(rows) > page.limit:
+        last = items[-1]
+        next_cursor = encode_cursor(last.created_at, last.id)
+    return {"items": items, "next_cursor": next_cursor}
@@ -0,0 +1,245 @@
+import os
+import json
+import time
+import hashlib
+from collections import OrderedDict
+from datetime import datetime, timedelta, timezone
+from typing import Iterable, Optional
+from dotenv import load_dotenv
+from sqlalchemy import select, update, delete
+from sqlalchemy.sql import func
+from sqlalchemy.dialects.postgresql import insert
+from app import schemas
+from app.database import SessionLocal
+from app.metrics import registry
+from app.models import PlanCacheEntry
+from app.plan_generation.nutrition import KG_PER_UNIT, CM_PER_UNIT
+
+load_dotenv()
+PLAN_CACHE_ENABLED = os.getenv("PLAN_CACHE_ENABLED", "true").lower() == "true"
+PLAN_CACHE_MEMORY_ENTRIES = int(os.getenv("PLAN_CACHE_MEMORY_ENTRIES", "256"))
+PLAN_CACHE_TTL_SECONDS = int(os.getenv("PLAN_CACHE_TTL_SECONDS", "604800"))
+PLAN_CACHE_MAX_BYTES = int(os.getenv("PLAN_CACHE_MAX_BYTES", str(512 * 1024 * 1024)))
+PLAN_CACHE_EVICT_INTERVAL_SECONDS = float(
+    os.getenv("PLAN_CACHE_EVICT_INTERVAL_SECONDS", "60")
+)
+PLAN_CACHE_WEIGHT_BUCKET_KG = float(os.getenv("PLAN_CACHE_WEIGHT_BUCKET_KG", "5"))
+PLAN_CACHE_HEIGHT_BUCKET_CM = float(os.getenv("PLAN_CACHE_HEIGHT_BUCKET_CM", "5"))
+
+WEIGHT_FIELDS = {
+    "currentWeight": "weightUnit",
+    "targetWeight": "targetWeightUnit",
+}
+HEIGHT_FIELDS = {"height": "heightUnit"}
+UNIT_FIELDS = {"weightUnit", "targetWeightUnit", "heightUnit"}
+
+
+def _bucket(value: float, size: float) -> float:
+    return round(round(value / size) * size, 2)
+
+
+def _normalize_text(value) -> str:
+    if value is None:
+        return ""
+    return " ".join(str(value).lower().split())
+
+
+def normalize_plan_request(request: schemas.PlanRequest, fields: Iterable[str]) -> dict:
+    data = request.model_dump()
+    normalized = {}
+    for field in sorted(fields):
+        if field in UNIT_FIELDS:
+            continue
+        value = data.get(field)
+        if field in WEIGHT_FIELDS:
+            unit = _normalize_text(data[WEIGHT_FIELDS[field]])
+            kg = value * KG_PER_UNIT.get(unit, 1.0)
+            normalized[field] = _bucket(kg, PLAN_CACHE_WEIGHT_BUCKET_KG)
+        elif field in HEIGHT_FIELDS:
+            unit = _normalize_text(data[HEIGHT_FIELDS[field]])
+            cm = value * CM_PER_UNIT.get(unit, 1.0)
+            normalized[field] = _bucket(cm, PLAN_CACHE_HEIGHT_BUCKET_CM)
+        else:
+            normalized[field] = _normalize_text(value)
+    return normalized
+
+
+def plan_cache_key(
+    request: schemas.PlanRequest,
+    template_text: str,
+    fields: Iterable[str],
+    model: str,
+    temperature: float,
+) -> str:
+    payload = {
+        "template": hashlib.sha256(template_text.encode()).hexdigest(),
+        "model": model,
+        "temperature": temperature,
+        "request": normalize_plan_request(request, fields),
+    }
+    canonical = json.dumps(payload, sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(canonical.encode()).hexdigest()
+
+
+class PlanCache:
+    def __init__(
+        self,
+        memory_entries: int,
+        ttl_seconds: int,
+        max_bytes: int,
+        evict_interval_seconds: float,
+    ):
+        self.memory_entries = memory_entries
+        self.ttl_seconds = ttl_seconds
+        self.max_bytes = max_bytes
+        self.evict_interval_seconds = evict_interval_seconds
+        self._memory: OrderedDict = OrderedDict()
+        self._evicted_at: Optional[float] = None
+        self.counters = {
+            "memory_hits": 0,
+            "db_hits": 0,
+            "misses": 0,
+            "stores": 0,
+            "evictions": 0,
+        }
+
+    async def get(self, key: str) -> Optional[str]:
+        content = self._memory_get(key)
+        if content is not None:
+            self.counters["memory_hits"] += 1
+            return content
+
+        content = await self._db_get(key)
+        if content is not None:
+            self.counters["db_hits"] += 1
+            self._memory_put(key, content)
+            return content
+
+        self.counters["misses"] += 1
+        return None
+
+    async def put(self, key: str, plan_type: str, content: str):
+        self._memory_put(key, content)
+        evicted = await self._db_put(key, plan_type, content)
+        self.counters["stores"] += 1
+        self.counters["evictions"] += evicted
+
+    def stats(self) -> dict:
+        hits = self.counters["memory_hits"] + self.counters["db_hits"]
+        lookups = hits + self.counters["misses"]
+        return {
+            **self.counters,
+            "memory_entries": len(self._memory),
+            "hit_ratio": round(hits / lookups, 4) if lookups else 0.0,
+        }
+
+    def clear_memory(self):
+        self._memory.clear()
+
+    def _memory_get(self, key: str) -> Optional[str]:
+        entry = self._memory.get(key)
+        if entry is None:
+            return None
+        stored_at, content = entry
+        if time.monotonic() - stored_at > self.ttl_seconds:
+            del self._memory[key]
+            return None
+        self._memory.move_to_end(key)
+        return content
+
+    def _memory_put(self, key: str, content: str):
+        self._memory[key] = (time.monotonic(), content)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.memory_entries:
+            self._memory.popitem(last=False)
+
+    def _expires_before(self):
+        return datetime.now(timezone.utc) - timedelta(seconds=self.ttl_seconds)
+
+    async def _db_get(self, key: str) -> Optional[str]:
+        async with SessionLocal() as db:
+            result = await db.execute(
+                update(PlanCacheEntry)
+                .where(
+                    PlanCacheEntry.key == key,
+                    PlanCacheEntry.created_at > self._expires_before(),
+                )
+                .values(hits=PlanCacheEntry.hits + 1, last_used_at=func.now())
+                .returning(PlanCacheEntry.content)
+            )
+            content = result.scalar()
+            await db.commit()
+            return content
+
+    async def _db_put(self, key: str, plan_type: str, content: str) -> int:
+        size_bytes = len(content.encode())
+        stmt = insert(PlanCacheEntry).values(
+            key=key, plan_type=plan_type, content=content, size_bytes=size_bytes
+        )
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[PlanCacheEntry.key],
+            set_={
+                "content": stmt.excluded.content,
+                "size_bytes": stmt.excluded.size_bytes,
+                "created_at": func.now(),
+                "last_used_at": func.now(),
+            },
+        )
+        async with SessionLocal() as db:
+            await db.execute(stmt)
+            evicted = await self._evict(db) if self._eviction_due() else 0
+            await db.commit()
+            return evicted
+
+    def _eviction_due(self) -> bool:
+        # Eviction scans the table, so a process runs it at most once per
+        # interval rather than on every write.
+        now = time.monotonic()
+        if (
+            self._evicted_at is not None
+            and now - self._evicted_at < self.evict_interval_seconds
+        ):
+            return False
+        self._evicted_at = now
+        return True
+
+    async def _evict(self, db) -> int:
+        expired = await db.execute(
+            delete(PlanCacheEntry)
+            .where(PlanCacheEntry.created_at <= self._expires_before())
+            .execution_options(synchronize_session=False)
+        )
+        total = await db.execute(select(func.sum(PlanCacheEntry.size_bytes)))
+        if (total.scalar() or 0) <= self.max_bytes:
+            return expired.rowcount
+        # Keep the most recently used entries whose combined size fits.
+        running_size = (
+            func.sum(PlanCacheEntry.size_bytes)
+            .over(order_by=[PlanCacheEntry.last_used_at.desc(), PlanCacheEntry.key])
+            .label("running_size")
+        )
+        ranked = select(PlanCacheEntry.key, running_size).subquery()
+        oversized = await db.execute(
+            delete(PlanCacheEntry)
+            .where(
+                PlanCacheEntry.key.in_(
+                    select(ranked.c.key).where(ranked.c.running_size > self.max_bytes)
+                )
+            )
+            .execution_options(synchronize_session=False)
+        )
+        return expired.rowcount + oversized.rowcount
+
+
+plan_cache = PlanCache(
+    memory_entries=PLAN_CACHE_MEMORY_ENTRIES,
+    ttl_seconds=PLAN_CACHE_TTL_SECONDS,
+    max_bytes=PLAN_CACHE_MAX_BYTES,
+    evict_interval_seconds=PLAN_CACHE_EVICT_INTERVAL_SECONDS,
+)
+registry.collect_stats(
+    "plan_cache",
+    plan_cache.stats,
+    counters=("memory_hits", "db_hits", "misses", "stores", "evictions"),
+    help="Plan cache",
+)
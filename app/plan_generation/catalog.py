@@ -0,0 +1,494 @@
+# Bundled catalog for the rule-based plan engine.
+#
+# Meals: "diet" is the most restrictive diet the dish satisfies (see
+# DIET_LEVELS in rules.py), "contains" lists allergens and "tags" marks dishes
+# suited to common medical conditions. Calories and macros are per serving.
+
+MEALS = [
+    # Breakfast
+    {
+        "name": "Oatmeal with berries and chia seeds",
+        "slot": "breakfast",
+        "diet": "vegan",
+        "calories": 350,
+        "protein": 11,
+        "carbs": 58,
+        "fat": 9,
+        "contains": ["gluten"],
+        "tags": ["low_gi", "heart_healthy", "low_sodium"],
+    },
+    {
+        "name": "Tofu scramble with spinach and whole-grain toast",
+        "slot": "breakfast",
+        "diet": "vegan",
+        "calories": 380,
+        "protein": 24,
+        "carbs": 34,
+        "fat": 16,
+        "contains": ["soy", "gluten"],
+        "tags": ["low_gi", "heart_healthy"],
+    },
+    {
+        "name": "Greek yogurt parfait with walnuts",
+        "slot": "breakfast",
+        "diet": "vegetarian",
+        "calories": 340,
+        "protein": 22,
+        "carbs": 32,
+        "fat": 14,
+        "contains": ["dairy", "nuts"],
+        "tags": ["low_gi"],
+    },
+    {
+        "name": "Vegetable omelette with avocado",
+        "slot": "breakfast",
+        "diet": "vegetarian",
+        "calories": 390,
+        "protein": 22,
+        "carbs": 10,
+        "fat": 28,
+        "contains": ["egg"],
+        "tags": ["low_carb", "low_gi"],
+    },
+    {
+        "name": "Besan chilla with mint chutney",
+        "slot": "breakfast",
+        "diet": "vegan",
+        "calories": 320,
+        "protein": 16,
+        "carbs": 42,
+        "fat": 9,
+        "contains": [],
+        "tags": ["low_gi", "low_sodium"],
+    },
+    {
+        "name": "Smoked salmon on rye with cream cheese",
+        "slot": "breakfast",
+        "diet": "pescatarian",
+        "calories": 360,
+        "protein": 24,
+        "carbs": 30,
+        "fat": 15,
+        "contains": ["fish", "gluten", "dairy"],
+        "tags": [],
+    },
+    {
+        "name": "Turkey and egg breakfast wrap",
+        "slot": "breakfast",
+        "diet": "omnivore",
+        "calories": 410,
+        "protein": 30,
+        "carbs": 32,
+        "fat": 17,
+        "contains": ["egg", "gluten"],
+        "tags": [],
+    },
+    {
+        "name": "Quinoa porridge with almond milk and banana",
+        "slot": "breakfast",
+        "diet": "vegan",
+        "calories": 360,
+        "protein": 10,
+        "carbs": 62,
+        "fat": 8,
+        "contains": ["nuts"],
+        "tags": ["heart_healthy", "low_sodium"],
+    },
+    {
+        "name": "Cottage cheese with cucumber and flaxseed",
+        "slot": "breakfast",
+        "diet": "vegetarian",
+        "calories": 280,
+        "protein": 26,
+        "carbs": 12,
+        "fat": 13,
+        "contains": ["dairy"],
+        "tags": ["low_carb", "low_gi"],
+    },
+    # Lunch
+    {
+        "name": "Chickpea and quinoa salad with lemon dressing",
+        "slot": "lunch",
+        "diet": "vegan",
+        "calories": 480,
+        "protein": 18,
+        "carbs": 64,
+        "fat": 16,
+        "contains": [],
+        "tags": ["low_gi", "heart_healthy", "low_sodium"],
+    },
+    {
+        "name": "Lentil dal with brown rice",
+        "slot": "lunch",
+        "diet": "vegan",
+        "calories": 520,
+        "protein": 22,
+        "carbs": 84,
+        "fat": 9,
+        "contains": [],
+        "tags": ["low_gi", "heart_healthy", "low_sodium"],
+    },
+    {
+        "name": "Paneer tikka with mixed greens",
+        "slot": "lunch",
+        "diet": "vegetarian",
+        "calories": 460,
+        "protein": 26,
+        "carbs": 14,
+        "fat": 32,
+        "contains": ["dairy"],
+        "tags": ["low_carb"],
+    },
+    {
+        "name": "Grilled chicken salad with olive oil",
+        "slot": "lunch",
+        "diet": "omnivore",
+        "calories": 450,
+        "protein": 40,
+        "carbs": 14,
+        "fat": 24,
+        "contains": [],
+        "tags": ["low_carb", "low_gi", "heart_healthy"],
+    },
+    {
+        "name": "Tuna and bean wholewheat wrap",
+        "slot": "lunch",
+        "diet": "pescatarian",
+        "calories": 490,
+        "protein": 34,
+        "carbs": 50,
+        "fat": 14,
+        "contains": ["fish", "gluten"],
+        "tags": ["low_gi"],
+    },
+    {
+        "name": "Rajma with jeera rice",
+        "slot": "lunch",
+        "diet": "vegan",
+        "calories": 540,
+        "protein": 20,
+        "carbs": 90,
+        "fat": 10,
+        "contains": [],
+        "tags": ["low_sodium"],
+    },
+    {
+        "name": "Turkey and hummus whole-grain sandwich",
+        "slot": "lunch",
+        "diet": "omnivore",
+        "calories": 500,
+        "protein": 34,
+        "carbs": 52,
+        "fat": 16,
+        "contains": ["gluten"],
+        "tags": [],
+    },
+    {
+        "name": "Tofu and vegetable stir-fry with soba",
+        "slot": "lunch",
+        "diet": "vegan",
+        "calories": 510,
+        "protein": 26,
+        "carbs": 62,
+        "fat": 17,
+        "contains": ["soy", "gluten"],
+        "tags": ["heart_healthy"],
+    },
+    {
+        "name": "Egg fried cauliflower rice",
+        "slot": "lunch",
+        "diet": "vegetarian",
+        "calories": 380,
+        "protein": 18,
+        "carbs": 18,
+        "fat": 26,
+        "contains": ["egg", "soy"],
+        "tags": ["low_carb", "low_gi"],
+    },
+    {
+        "name": "Mediterranean couscous with feta",
+        "slot": "lunch",
+        "diet": "vegetarian",
+        "calories": 500,
+        "protein": 17,
+        "carbs": 66,
+        "fat": 18,
+        "contains": ["gluten", "dairy"],
+        "tags": [],
+    },
+    # Dinner
+    {
+        "name": "Baked salmon with roasted vegetables",
+        "slot": "dinner",
+        "diet": "pescatarian",
+        "calories": 520,
+        "protein": 38,
+        "carbs": 22,
+        "fat": 30,
+        "contains": ["fish"],
+        "tags": ["low_carb", "low_gi", "heart_healthy", "low_sodium"],
+    },
+    {
+        "name": "Lentil soup with vegetables",
+        "slot": "dinner",
+        "diet": "vegan",
+        "calories": 420,
+        "protein": 22,
+        "carbs": 60,
+        "fat": 8,
+        "contains": [],
+        "tags": ["low_gi", "heart_healthy", "low_sodium"],
+    },
+    {
+        "name": "Chicken curry with cauliflower rice",
+        "slot": "dinner",
+        "diet": "omnivore",
+        "calories": 490,
+        "protein": 42,
+        "carbs": 16,
+        "fat": 28,
+        "contains": ["dairy"],
+        "tags": ["low_carb", "low_gi"],
+    },
+    {
+        "name": "Palak tofu with whole-wheat roti",
+        "slot": "dinner",
+        "diet": "vegan",
+        "calories": 470,
+        "protein": 24,
+        "carbs": 48,
+        "fat": 19,
+        "contains": ["soy", "gluten"],
+        "tags": ["low_gi", "heart_healthy"],
+    },
+    {
+        "name": "Vegetable and black bean chili",
+        "slot": "dinner",
+        "diet": "vegan",
+        "calories": 450,
+        "protein": 20,
+        "carbs": 66,
+        "fat": 10,
+        "contains": [],
+        "tags": ["low_gi", "heart_healthy", "low_sodium"],
+    },
+    {
+        "name": "Grilled shrimp with zucchini noodles",
+        "slot": "dinner",
+        "diet": "pescatarian",
+        "calories": 380,
+        "protein": 34,
+        "carbs": 14,
+        "fat": 20,
+        "contains": ["shellfish"],
+        "tags": ["low_carb", "low_gi"],
+    },
+    {
+        "name": "Lean beef stir-fry with brown rice",
+        "slot": "dinner",
+        "diet": "omnivore",
+        "calories": 560,
+        "protein": 40,
+        "carbs": 58,
+        "fat": 18,
+        "contains": ["soy"],
+        "tags": [],
+    },
+    {
+        "name": "Stuffed bell peppers with quinoa and cheese",
+        "slot": "dinner",
+        "diet": "vegetarian",
+        "calories": 460,
+        "protein": 20,
+        "carbs": 52,
+        "fat": 19,
+        "contains": ["dairy"],
+        "tags": ["low_gi"],
+    },
+    {
+        "name": "Herb-roasted chicken with sweet potato",
+        "slot": "dinner",
+        "diet": "omnivore",
+        "calories": 530,
+        "protein": 44,
+        "carbs": 44,
+        "fat": 18,
+        "contains": [],
+        "tags": ["heart_healthy", "low_sodium"],
+    },
+    {
+        "name": "Mushroom and spinach risotto",
+        "slot": "dinner",
+        "diet": "vegetarian",
+        "calories": 500,
+        "protein": 15,
+        "carbs": 72,
+        "fat": 16,
+        "contains": ["dairy"],
+        "tags": [],
+    },
+    # Snacks
+    {
+        "name": "Apple slices with peanut butter",
+        "slot": "snack",
+        "diet": "vegan",
+        "calories": 200,
+        "protein": 6,
+        "carbs": 24,
+        "fat": 10,
+        "contains": ["nuts"],
+        "tags": ["low_gi"],
+    },
+    {
+        "name": "Roasted chickpeas",
+        "slot": "snack",
+        "diet": "vegan",
+        "calories": 180,
+        "protein": 9,
+        "carbs": 26,
+        "fat": 5,
+        "contains": [],
+        "tags": ["low_gi", "heart_healthy", "low_sodium"],
+    },
+    {
+        "name": "Carrot and cucumber sticks with hummus",
+        "slot": "snack",
+        "diet": "vegan",
+        "calories": 160,
+        "protein": 5,
+        "carbs": 18,
+        "fat": 8,
+        "contains": [],
+        "tags": ["low_gi", "heart_healthy", "low_sodium"],
+    },
+    {
+        "name": "Mixed nuts",
+        "slot": "snack",
+        "diet": "vegan",
+        "calories": 210,
+        "protein": 6,
+        "carbs": 8,
+        "fat": 18,
+        "contains": ["nuts"],
+        "tags": ["low_carb", "low_gi", "heart_healthy", "low_sodium"],
+    },
+    {
+        "name": "Greek yogurt with honey",
+        "slot": "snack",
+        "diet": "vegetarian",
+        "calories": 170,
+        "protein": 14,
+        "carbs": 20,
+        "fat": 4,
+        "contains": ["dairy"],
+        "tags": [],
+    },
+    {
+        "name": "Boiled eggs with black pepper",
+        "slot": "snack",
+        "diet": "vegetarian",
+        "calories": 150,
+        "protein": 12,
+        "carbs": 1,
+        "fat": 10,
+        "contains": ["egg"],
+        "tags": ["low_carb", "low_gi", "low_sodium"],
+    },
+    {
+        "name": "Roasted makhana",
+        "slot": "snack",
+        "diet": "vegan",
+        "calories": 140,
+        "protein": 5,
+        "carbs": 22,
+        "fat": 4,
+        "contains": [],
+        "tags": ["low_gi", "low_sodium"],
+    },
+    {
+        "name": "Edamame with sea salt",
+        "slot": "snack",
+        "diet": "vegan",
+        "calories": 170,
+        "protein": 15,
+        "carbs": 12,
+        "fat": 7,
+        "contains": ["soy"],
+        "tags": ["low_carb", "low_gi"],
+    },
+]
+
+EXERCISES = [
+    {"name": "Bodyweight squats", "category": "strength", "equipment": "none"},
+    {"name": "Push-ups", "category": "strength", "equipment": "none"},
+    {"name": "Glute bridges", "category": "strength", "equipment": "none"},
+    {"name": "Reverse lunges", "category": "strength", "equipment": "none"},
+    {"name": "Plank", "category": "strength", "equipment": "none"},
+    {"name": "Superman holds", "category": "strength", "equipment": "none"},
+    {"name": "Goblet squats", "category": "strength", "equipment": "gym"},
+    {"name": "Dumbbell bench press", "category": "strength", "equipment": "gym"},
+    {"name": "Bent-over dumbbell rows", "category": "strength", "equipment": "gym"},
+    {"name": "Romanian deadlifts", "category": "strength", "equipment": "gym"},
+    {"name": "Lat pulldowns", "category": "strength", "equipment": "gym"},
+    {"name": "Overhead dumbbell press", "category": "strength", "equipment": "gym"},
+    {"name": "Brisk walking", "category": "cardio", "equipment": "none"},
+    {"name": "Jogging", "category": "cardio", "equipment": "none"},
+    {"name": "Cycling", "category": "cardio", "equipment": "gym"},
+    {"name": "Rowing machine", "category": "cardio", "equipment": "gym"},
+    {"name": "Jump rope", "category": "cardio", "equipment": "none"},
+    {"name": "Burpees", "category": "hiit", "equipment": "none"},
+    {"name": "Mountain climbers", "category": "hiit", "equipment": "none"},
+    {"name": "Jumping jacks", "category": "hiit", "equipment": "none"},
+    {"name": "Kettlebell swings", "category": "hiit", "equipment": "gym"},
+    {"name": "High knees", "category": "hiit", "equipment": "none"},
+]
+
+YOGA_POSES = [
+    {"name": "Mountain pose (Tadasana)", "style": "hatha", "level": "beginner"},
+    {
+        "name": "Cat-cow (Marjaryasana-Bitilasana)",
+        "style": "hatha",
+        "level": "beginner",
+    },
+    {"name": "Child's pose (Balasana)", "style": "restorative", "level": "beginner"},
+    {
+        "name": "Downward dog (Adho Mukha Svanasana)",
+        "style": "vinyasa",
+        "level": "beginner",
+    },
+    {"name": "Cobra (Bhujangasana)", "style": "hatha", "level": "beginner"},
+    {"name": "Bridge pose (Setu Bandhasana)", "style": "hatha", "level": "beginner"},
+    {
+        "name": "Legs up the wall (Viparita Karani)",
+        "style": "restorative",
+        "level": "beginner",
+    },
+    {"name": "Supported fish pose", "style": "restorative", "level": "beginner"},
+    {
+        "name": "Warrior I (Virabhadrasana I)",
+        "style": "vinyasa",
+        "level": "intermediate",
+    },
+    {"name": "Warrior II (Virabhadrasana II)", "style": "vinyasa", "level": "beginner"},
+    {"name": "Triangle pose (Trikonasana)", "style": "hatha", "level": "intermediate"},
+    {"name": "Chair pose (Utkatasana)", "style": "power", "level": "intermediate"},
+    {
+        "name": "Sun salutation A (Surya Namaskar A)",
+        "style": "vinyasa",
+        "level": "intermediate",
+    },
+    {"name": "Boat pose (Navasana)", "style": "power", "level": "intermediate"},
+    {"name": "Crow pose (Bakasana)", "style": "power", "level": "advanced"},
+    {"name": "Wheel pose (Urdhva Dhanurasana)", "style": "power", "level": "advanced"},
+    {
+        "name": "Pigeon pose (Eka Pada Rajakapotasana)",
+        "style": "restorative",
+        "level": "intermediate",
+    },
+    {
+        "name": "Seated forward fold (Paschimottanasana)",
+        "style": "hatha",
+        "level": "beginner",
+    },
+    {"name": "Corpse pose (Savasana)", "style": "restorative", "level": "beginner"},
+]
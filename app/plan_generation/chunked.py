@@ -0,0 +1,195 @@
+import os
+import re
+import json
+import asyncio
+from typing import List
+from dotenv import load_dotenv
+from pydantic import ValidationError
+from app import schemas
+from app.plan_generation.structured import CODE_FENCE, DayPlan, PlanOutputError
+from app.plan_generation.resilience import llm_guard
+from app.plan_generation.prompts import (
+    PLAN_DESCRIPTIONS,
+    activity_fragments,
+    format_prompt,
+    json_keys,
+    segment_prompt,
+)
+
+load_dotenv()
+PLAN_CHUNKED_MIN_DAYS = int(os.getenv("PLAN_CHUNKED_MIN_DAYS", "30"))
+PLAN_CHUNK_DAYS = int(os.getenv("PLAN_CHUNK_DAYS", "7"))
+PLAN_CHUNK_CONCURRENCY = int(os.getenv("PLAN_CHUNK_CONCURRENCY", "8"))
+PLAN_CHUNK_RETRIES = int(os.getenv("PLAN_CHUNK_RETRIES", "2"))
+
+DURATION_PATTERN = re.compile(r"(\d+)\s*(day|week|month)", re.IGNORECASE)
+DAYS_PER_UNIT = {"day": 1, "week": 7, "month": 30}
+
+
+class SegmentError(Exception):
+    pass
+
+
+def plan_duration_days(time_goal) -> int:
+    match = DURATION_PATTERN.search(time_goal or "")
+    if match is None:
+        return 30
+    # "0 weeks" would leave no day to spread the weight change over.
+    return max(1, int(match.group(1)) * DAYS_PER_UNIT[match.group(2).lower()])
+
+
+def should_chunk(request: schemas.PlanRequest) -> bool:
+    return plan_duration_days(request.timeGoal) >= PLAN_CHUNKED_MIN_DAYS
+
+
+def plan_segments(total_days: int) -> List[tuple]:
+    return [
+        (week, first_day, min(first_day + PLAN_CHUNK_DAYS - 1, total_days))
+        for week, first_day in enumerate(
+            range(1, total_days + 1, PLAN_CHUNK_DAYS), start=1
+        )
+    ]
+
+
+def plan_header(request: schemas.PlanRequest) -> dict:
+    return {
+        "planType": request.planType,
+        "duration": request.timeGoal,
+        "meals_per_day": request.mealPreference,
+        "diet_type": request.dietType,
+        "target_weight": f"{request.targetWeight} {request.targetWeightUnit}",
+        "diet_goal": request.dietGoals,
+    }
+
+
+def plan_includes(request: schemas.PlanRequest) -> tuple:
+    return "Yoga" in request.planType, "Workout" in request.planType
+
+
+def plan_sections(request: schemas.PlanRequest) -> List[str]:
+    with_yoga, with_workout = plan_includes(request)
+    sections = ["meal_plan"]
+    if with_workout:
+        sections.append("workout_plan")
+    if with_yoga:
+        sections.append("yoga_plan")
+    return sections
+
+
+def _activity_instructions(request: schemas.PlanRequest, sections: List[str]) -> str:
+    # Segments cover different sections, so the fragments are filled in per
+    # call instead of being part of segment_prompt.
+    return activity_fragments(sections, segment=True).format_map(request.model_dump())
+
+
+def build_segment_prompt(
+    request: schemas.PlanRequest, segment: tuple, sections: List[str] = None
+) -> list:
+    week, first_day, last_day = segment
+    sections = sections or plan_sections(request)
+    return format_prompt(
+        segment_prompt,
+        request,
+        plan_description=PLAN_DESCRIPTIONS.get(request.planType, "diet"),
+        activity_instructions=_activity_instructions(request, sections),
+        week=week,
+        first_day=first_day,
+        last_day=last_day,
+        segment_keys=json_keys(sections),
+    )
+
+
+def parse_segment(content: str, segment: tuple, with_meals: bool = True) -> dict:
+    week, first_day, last_day = segment
+    try:
+        data = json.loads(CODE_FENCE.sub("", content.strip()))
+    except json.JSONDecodeError as e:
+        raise SegmentError(f"Week {week} is not valid JSON: {e}")
+    if not isinstance(data, dict):
+        raise SegmentError(f"Week {week} is not a JSON object")
+    if not with_meals:
+        return data
+
+    meal_plan = data.get("meal_plan")
+    if isinstance(meal_plan, dict):
+        meal_plan = [{"day": day, **meals} for day, meals in meal_plan.items()]
+    if not isinstance(meal_plan, list) or not meal_plan:
+        raise SegmentError(f"Week {week} has no meal_plan")
+
+    # Number the days ourselves so merged segments never overlap.
+    try:
+        days = [
+            DayPlan.model_validate({**meals, "day": first_day + offset}).model_dump()
+            for offset, meals in enumerate(meal_plan[: last_day - first_day + 1])
+            if isinstance(meals, dict)
+        ]
+    except ValidationError as e:
+        raise SegmentError(f"Week {week} has a malformed day: {e.errors()[0]['msg']}")
+    if len(days) < last_day - first_day + 1:
+        raise SegmentError(f"Week {week} is missing days")
+    data["meal_plan"] = days
+    return data
+
+
+async def generate_segment(chat, request, segment, semaphore, sections=None) -> tuple:
+    sections = sections or plan_sections(request)
+    prompt = build_segment_prompt(request, segment, sections)
+    attempt = 0
+    while True:
+        async with semaphore:
+            result = await chat.ainvoke(prompt)
+        # Provider errors were already retried by the guard; only a reply
+        # that does not parse is worth asking for again.
+        try:
+            data = parse_segment(result.content, segment, "meal_plan" in sections)
+            return segment, data
+        except (SegmentError, PlanOutputError) as e:
+            attempt += 1
+            if attempt > PLAN_CHUNK_RETRIES:
+                raise
+            await asyncio.sleep(llm_guard.backoff(attempt, e))
+
+
+def merge_segments(request: schemas.PlanRequest, segments: List[tuple]) -> dict:
+    with_yoga, with_workout = plan_includes(request)
+    plan = plan_header(request)
+    plan["meal_plan"] = []
+    if with_workout:
+        plan["workout_plan"] = []
+    if with_yoga:
+        plan["yoga_plan"] = []
+
+    for (week, _, _), data in sorted(segments, key=lambda item: item[0][0]):
+        plan["meal_plan"].extend(data["meal_plan"])
+        if with_workout:
+            plan["workout_plan"].append(
+                {"week": week, "schedule": data.get("workout_plan")}
+            )
+        if with_yoga:
+            plan["yoga_plan"].append({"week": week, "schedule": data.get("yoga_plan")})
+    return plan
+
+
+async def iter_plan_segments(
+    chat, request: schemas.PlanRequest, segments=None, sections=None
+):
+    semaphore = asyncio.Semaphore(PLAN_CHUNK_CONCURRENCY)
+    if segments is None:
+        segments = plan_segments(plan_duration_days(request.timeGoal))
+    tasks = [
+        asyncio.create_task(
+            generate_segment(chat, request, segment, semaphore, sections)
+        )
+        for segment in segments
+    ]
+    try:
+        for done in asyncio.as_completed(tasks):
+            yield await done
+    finally:
+        for task in tasks:
+            task.cancel()
+
+
+async def generate_chunked_plan(chat, request: schemas.PlanRequest) -> str:
+    segments = [item async for item in iter_plan_segments(chat, request)]
+    return json.dumps(merge_segments(request, segments))
@@ -0,0 +1,62 @@
+import asyncio
+import logging
+from typing import Awaitable, Callable, List, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class JobQueue:
+    def __init__(
+        self,
+        handler: Callable[[str], Awaitable[None]],
+        workers: int,
+        maxsize: int,
+        recover: Optional[Callable[[bool], Awaitable[None]]] = None,
+        recover_interval: float = 300,
+    ):
+        self.handler = handler
+        self.workers = workers
+        self.recover = recover
+        self.recover_interval = recover_interval
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=maxsize)
+        self._tasks: List[asyncio.Task] = []
+
+    async def start(self):
+        self._tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+        if self.recover is not None:
+            self._tasks.append(asyncio.create_task(self._recover()))
+
+    async def stop(self):
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    def submit(self, job_id: str):
+        # Raises asyncio.QueueFull when the configured depth is reached.
+        self.queue.put_nowait(job_id)
+
+    def depth(self) -> int:
+        return self.queue.qsize()
+
+    async def _worker(self):
+        while True:
+            job_id = await self.queue.get()
+            try:
+                await self.handler(job_id)
+            except Exception:
+                logger.exception("Plan job %s failed", job_id)
+            finally:
+                self.queue.task_done()
+
+    async def _recover(self):
+        # The queue only lives in memory: pick up jobs left behind by a
+        # restart, then keep sweeping for jobs of workers that went away.
+        startup = True
+        while True:
+            try:
+                await self.recover(startup)
+            except Exception:
+                logger.exception("Recovering plan jobs failed")
+            startup = False
+            await asyncio.sleep(self.recover_interval)
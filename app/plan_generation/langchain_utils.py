@@ -1,113 +1,367 @@
 import os
+import json
+import math
+import uuid
+import asyncio
+import logging
+import openai
+from contextlib import aclosing
+from datetime import datetime, timedelta, timezone
 from app import schemas
 from app.auth import oauth
 from dotenv import load_dotenv
-from fastapi.responses import JSONResponse
-from sqlalchemy.orm import Session
+from fastapi.responses import JSONResponse, StreamingResponse
+from sqlalchemy import select, update
+from sqlalchemy.orm import selectinload
+from sqlalchemy.ext.asyncio import AsyncSession
 from pydantic import ValidationError
 from fastapi import status, HTTPException, APIRouter, Depends
-from langchain_core.prompts import ChatPromptTemplate
-from langchain_community.chat_models import ChatOpenAI
-from app.database import get_db
-from app.models import UserGeneratedPlan
-from typing import List
+from sqlalchemy.sql import func
+from app.database import get_db, SessionLocal
+from app.pagination import PageParams, paginate, page_of
+from app.models import UserGeneratedPlan, PlanJob
+from app.plan_generation.llm import build_chat_model, OPENAI_MODEL, OPENAI_TEMPERATURE
+from app.plan_generation.cache import plan_cache, plan_cache_key, PLAN_CACHE_ENABLED
+from app.plan_generation.jobs import JobQueue
+from app.plan_generation.nutrition import plan_targets, targets_as_lists
+from app.plan_generation.rules import (
+    PLAN_RULES_FALLBACK,
+    rule_plan_content,
+    uses_rule_engine,
+)
+from app.plan_generation.regenerate import (
+    affected_sections,
+    apply_updates,
+    changed_fields,
+    llm_updates,
+    needs_full_plan,
+    rule_updates,
+    target_segments,
+    updated_request,
+)
+from app.plan_generation.resilience import CircuitOpenError, llm_guard
+from app.plan_generation.singleflight import plan_flights
+from app.metrics import registry, stage
+from app.plan_generation.structured import PlanOutputError, PlanStreamParser
+from app.plan_generation.storage import (
+    new_generated_plan,
+    parse_day_range,
+    parse_plan,
+    plan_days_column,
+    plan_row,
+    plan_text,
+    select_days,
+)
+from app.plan_generation.streaming import MealPlanDayExtractor, sse_event
+from app.plan_generation.prompts import format_prompt, plan_prompts, prompt_text
+from app.plan_generation.tokens import (
+    estimate_prompt_tokens,
+    llm_usage,
+    max_tokens_for,
+)
+from app.plan_generation.chunked import (
+    PLAN_CHUNK_DAYS,
+    plan_duration_days,
+    plan_sections,
+    should_chunk,
+    generate_chunked_plan,
+    iter_plan_segments,
+    merge_segments,
+)
+from typing import List, Optional, Union
 from rich import traceback
 
 traceback.install()
 
 load_dotenv()
-OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
-chat = ChatOpenAI(model="gpt-4o-mini", temperature=0.7, openai_api_key=OPENAI_API_KEY)
+PLAN_JOB_WORKERS = int(os.getenv("PLAN_JOB_WORKERS", "4"))
+PLAN_JOB_QUEUE_SIZE = int(os.getenv("PLAN_JOB_QUEUE_SIZE", "100"))
+PLAN_JOB_STALE_SECONDS = float(os.getenv("PLAN_JOB_STALE_SECONDS", "600"))
+PLAN_LLM_TIMEOUT_SECONDS = float(os.getenv("PLAN_LLM_TIMEOUT_SECONDS", "120"))
+logger = logging.getLogger(__name__)
+chat = build_chat_model()
 router = APIRouter(tags=["Diet Plan"])
 
-diet_plan_template = ChatPromptTemplate.from_template(
-    "Create a personalized diet plan for a {gender} person whose ageGroup is {ageGroup} and who is {height} {heightUnit} tall and weighs {currentWeight} {weightUnit} and their target goal weight is {targetWeight} {targetWeightUnit}. "
-    "They have the following dietary preferences: Diet Type is {dietType}, with the following {dietRestrictions} dietary restrictions. "
-    "They prefer {mealPreference} meals per day. create meal day by day. (e.g if the user ask 1 month meal preference, create the plan for 30 days, if the user ask 2 months meal preference, create the plan for 60 days and if the user ask 3 months meal preference, create the plan for 90 days plan). Meals name has to be Breakfast, Lunch and Dinner. and if they ask more than 3 meals a day then the rest meals will be named as Snacks."
-    "Their time goal is to achieve the target weight is {timeGoal} and key goals for the diet plan is {dietGoals} . "
-    "Generate meal plans for each day separately over the specified time period of {timeGoal} (e.g., 1 month = 30 days, 2 months = 60 days and so on)."
-    "they may or may not have additional information regarding their {medicalConditions} which should be consider while creating the plan."
-    "Ensure the diet plan complements their fitness level, target weight, and keyGoals."
-    "The response should be in Structured JSON Format only and not in markdown or any other format. It should be in simple JSON Format and please do not give any other information."
-    "The JSON structure should strictly follow this format:"
-    "the keys JSON structure have will be only: 1. planType: 2. duration: 3. meals_per_day: 4. diet_type: 5. target_weight: 6. diet_goal: 7. meal_plan:  "
-)
 
+def plan_error(e: Exception) -> HTTPException:
+    if isinstance(e, CircuitOpenError):
+        return HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail=str(e),
+            headers={"Retry-After": str(math.ceil(e.retry_after))},
+        )
+    if isinstance(e, asyncio.TimeoutError):
+        return HTTPException(
+            status_code=status.HTTP_504_GATEWAY_TIMEOUT,
+            detail="Plan generation timed out, please retry",
+        )
+    if isinstance(e, PlanOutputError):
+        return HTTPException(
+            status_code=status.HTTP_502_BAD_GATEWAY,
+            detail=f"The plan model returned an invalid plan: {str(e)}",
+        )
+    if isinstance(e, openai.APIError):
+        return HTTPException(
+            status_code=status.HTTP_502_BAD_GATEWAY,
+            detail=f"The plan model failed: {str(e)}",
+        )
+    return HTTPException(
+        status_code=status.HTTP_404_NOT_FOUND,
+        detail=f"An error occurred: {str(e)}",
+    )
 
-diet_yoga_plan_template = ChatPromptTemplate.from_template(
-    "Create a personalized diet with yoga plan for a {gender} person whose ageGroup is {ageGroup} and who is {height} {heightUnit} tall and weighs {currentWeight} {weightUnit} and their target goal weight is {targetWeight} {targetWeightUnit}. "
-    "they may or may not have previous yoga experience: {yogaExperience} experience. "
-    "For yoga, focus on {yogaType}, which aligns with their their current activity level: {activityLevel} and also yoga weekly schedule must align with the timeGoal {timeGoal} of the plan (e.g., 1 month timeGoal = 4 weeks) and each week will consist of yoga plan"
-    "They have the following dietary preferences: Diet Type is {dietType}, with the following {dietRestrictions} dietary restrictions. "
-    "They prefer {mealPreference} meals per day. create meal day by day. (e.g if the user ask 1 month meal preference, create the plan for 30 days, if the user ask 2 months meal preference, create the plan for 60 days and if the user ask 3 months meal preference, create the plan for 90 days plan). Meals name has to be Breakfast, Lunch and Dinner. and if they ask more than 3 meals a day then the rest meals will be named as Snacks."
-    "Their time goal is to achieve the target weight is {timeGoal} and key goals for the diet plan is {dietGoals} . "
-    "Generate meal plans for each day separately over the specified time period of {timeGoal} (e.g., 1 month = 30 days, 2 months = 60 days and so on)."
-    "they may or may not have additional information regarding their {medicalConditions} which should be consider while creating the plan"
-    "Ensure the diet with yoga plan complements their fitness level, target weight and keyGoals."
-    "The response should be in Structured JSON Format only and not in markdown or any other format. It should be in simple JSON Format and please do not give any other information."
-    "The JSON structure should strictly follow this format:"
-    "the keys JSON structure have will be only: 1. planType: 2. duration: 3. meals_per_day: 4. diet_type: 5. target_weight: 6. diet_goal: 7. meal_plan: 8. yoga_plan: "
-)
 
-diet_workout_plan_template = ChatPromptTemplate.from_template(
-    "Create a personalized diet with workout plan for a {gender} person whose ageGroup is {ageGroup} and who is {height} {heightUnit} tall and weighs {currentWeight} {weightUnit} and their target goal weight is {targetWeight} {targetWeightUnit}. "
-    "For workout, focus on {workoutPreference}, and they are willing to do workout for {workoutDays} a week. their current activity level is {activityLevel} and also workout weekly schedule must align with the timeGoal {timeGoal} of the plan (e.g., 1 month timeGoal = 4 weeks) and each week will consist of daily workout exercises"
-    "They have the following dietary preferences: Diet Type is {dietType}, with the following {dietRestrictions} dietary restrictions. "
-    "They prefer {mealPreference} meals per day. create meal day by day. (e.g if the user ask 1 month meal preference, create the plan for 30 days, if the user ask 2 months meal preference, create the plan for 60 days and if the user ask 3 months meal preference, create the plan for 90 days plan). Meals name has to be Breakfast, Lunch and Dinner. and if they ask more than 3 meals a day then the rest meals will be named as Snacks."
-    "Their time goal is to achieve the target weight is {timeGoal} and key goals for the diet plan is {dietGoals} . "
-    "Generate meal plans for each day separately over the specified time period of {timeGoal} (e.g., 1 month = 30 days, 2 months = 60 days and so on)."
-    "they may or may not have additional information regarding their {medicalConditions} which should be consider while creating the plan"
-    "Ensure the diet with workout plan complements their fitness level, target weight and keyGoals."
-    "The response should be in Structured JSON Format only and not in markdown or any other format. It should be in simple JSON Format and please do not give any other information."
-    "The JSON structure should strictly follow this format:"
-    "the keys JSON structure have will be only: 1. planType: 2. duration: 3. meals_per_day: 4. diet_type: 5. target_weight: 6. diet_goal: 7. meal_plan: 8. workout_plan: "
-)
+def build_plan_prompt(request: schemas.PlanRequest) -> list:
+    return format_prompt(plan_prompts[request.planType], request)
+
+
+def plan_model(
+    request: schemas.PlanRequest, prompt_tokens: int, days=None, sections=None
+):
+    max_tokens = max_tokens_for(request, prompt_tokens, days, sections)
+    return chat.bind(max_tokens=max_tokens).with_config(
+        callbacks=[llm_usage],
+        metadata={"plan_type": request.planType, "max_tokens": max_tokens},
+    )
+
+
+def segment_model(request: schemas.PlanRequest, sections=None):
+    # Segment prompts are short, so only the completion side is budgeted.
+    return plan_model(request, 0, days=PLAN_CHUNK_DAYS, sections=sections)
+
+
+def plan_parser(request: schemas.PlanRequest) -> PlanStreamParser:
+    return PlanStreamParser(
+        plan_duration_days(request.timeGoal), plan_sections(request)
+    )
 
 
-diet_yoga_workout_plan_template = ChatPromptTemplate.from_template(
-    "Create a personalized diet with both yoga and workout plan for a {gender} person whose ageGroup is {ageGroup} and who is {height} {heightUnit} tall and weighs {currentWeight} {weightUnit} and their target goal weight is {targetWeight} {targetWeightUnit}. "
-    "they may or may not have previous yoga experience: {yogaExperience} experience. "
-    "For yoga, focus on {yogaType}, which aligns with their their current activity level: {activityLevel} and also yoga weekly schedule must align with the timeGoal {timeGoal} of the plan (e.g., 1 month timeGoal = 4 weeks) and each week will consist of yoga plan"
-    "For workout, focus on {workoutPreference}, and they are willing to do workout for {workoutDays} a week. their current activity level is {activityLevel} and also workout weekly schedule must align with the timeGoal {timeGoal} of the plan (e.g., 1 month timeGoal = 4 weeks) and each week will consist of daily workout exercises"
-    "They have the following dietary preferences: Diet Type is {dietType}, with the following {dietRestrictions} dietary restrictions. "
-    "They prefer {mealPreference} meals per day. create meal day by day. (e.g if the user ask 1 month meal preference, create the plan for 30 days, if the user ask 2 months meal preference, create the plan for 60 days and if the user ask 3 months meal preference, create the plan for 90 days plan). Meals name has to be Breakfast, Lunch and Dinner. and if they ask more than 3 meals a day then the rest meals will be named as Snacks."
-    "Their time goal is to achieve the target weight is {timeGoal} and key goals for the diet plan is {dietGoals} . "
-    "Generate meal plans for each day separately over the specified time period of {timeGoal} (e.g., 1 month = 30 days, 2 months = 60 days and so on)."
-    "they may or may not have additional information regarding their {medicalConditions} which should be consider while creating the plan"
-    "Ensure the diet with both yoga and workout plan complements their fitness level, target weight and keyGoals."
-    "The response should be in Structured JSON Format only and not in markdown or any other format. It should be in simple JSON Format and please do not give any other information."
-    "The JSON structure should strictly follow this format:"
-    "the keys JSON structure have will be only: 1. planType: 2. duration: 3. meals_per_day: 4. diet_type: 5. target_weight: 6. diet_goal: 7. meal_plan: 8. workout_plan: 9. Yoga_Plan "
+async def _stream_validated_plan(request: schemas.PlanRequest):
+    # Yields validated days as they arrive, then the whole plan. Parsing
+    # errors close the stream, so a diverging completion is cut off early.
+    prompt = build_plan_prompt(request)
+    model = plan_model(request, estimate_prompt_tokens(prompt))
+    parser = plan_parser(request)
+    async with aclosing(model.astream(prompt)) as chunks:
+        async for chunk in chunks:
+            for day in parser.feed(chunk.content):
+                yield "day", day
+            if parser.overflowed:
+                break
+    plan, missing = parser.finish()
+    if missing:
+        # Truncated output: only the missing tail goes back to the model.
+        sections = list(missing)
+        segments = target_segments(
+            request,
+            plan,
+            sections,
+            (min(missing.values()), plan_duration_days(request.timeGoal)),
+        )
+        updates = await llm_updates(
+            segment_model(request, sections), request, segments, sections
+        )
+        plan = apply_updates(plan, request, updates)
+        for day in sorted(updates.get("meal_plan", {})):
+            yield "day", updates["meal_plan"][day]
+    yield "plan", plan
+
+
+async def _llm_plan_content(request: schemas.PlanRequest) -> str:
+    if should_chunk(request):
+        return await generate_chunked_plan(segment_model(request), request)
+    async for kind, value in _stream_validated_plan(request):
+        if kind == "plan":
+            return json.dumps(value)
+
+
+async def generate_plan_content(request: schemas.PlanRequest) -> str:
+    with stage("plan.llm"):
+        return await asyncio.wait_for(
+            _llm_plan_content(request), timeout=PLAN_LLM_TIMEOUT_SECONDS or None
+        )
+
+
+def cache_key_for(request: schemas.PlanRequest) -> str:
+    prompt = plan_prompts[request.planType]
+    return plan_cache_key(
+        request,
+        template_text=prompt_text(prompt),
+        fields=prompt.input_variables,
+        model=OPENAI_MODEL,
+        temperature=OPENAI_TEMPERATURE,
+    )
+
+
+async def _cached_plan_content(request: schemas.PlanRequest) -> str:
+    if not PLAN_CACHE_ENABLED:
+        return await generate_plan_content(request)
+
+    key = cache_key_for(request)
+    with stage("plan.cache_lookup"):
+        content = await plan_cache.get(key)
+    if content is None:
+        content = await generate_plan_content(request)
+        with stage("plan.cache_store"):
+            await plan_cache.put(key, request.planType, content)
+    return content
+
+
+async def resolve_plan_content(request: schemas.PlanRequest) -> str:
+    if uses_rule_engine(request):
+        with stage("plan.rules"):
+            return rule_plan_content(request)
+    try:
+        return await _cached_plan_content(request)
+    except Exception:
+        if not PLAN_RULES_FALLBACK:
+            raise
+        # Fallback plans are not cached so the next request retries the LLM.
+        logger.exception("LLM plan generation failed, using the rule engine")
+        with stage("plan.rules"):
+            return rule_plan_content(request)
+
+
+async def _set_job_status(job_id: str, **values):
+    async with SessionLocal() as db:
+        await db.execute(
+            update(PlanJob)
+            .where(PlanJob.id == job_id)
+            .values(**values, updated_at=func.now())
+        )
+        await db.commit()
+
+
+async def create_plan(user_id: int, request: schemas.PlanRequest) -> tuple:
+    # Identical requests from the same user share one generation and one
+    # stored plan; returns (plan id, content).
+    return await plan_flights.run(
+        user_id, request, lambda: resolve_plan_content(request)
+    )
+
+
+async def run_plan_job(job_id: str):
+    # Claiming the job is a single statement, so a job that recovery submits
+    # again still runs once.
+    async with SessionLocal() as db:
+        result = await db.execute(
+            update(PlanJob)
+            .where(PlanJob.id == job_id, PlanJob.status == "queued")
+            .values(status="running", updated_at=func.now())
+            .returning(PlanJob.user_id, PlanJob.request)
+        )
+        job = result.first()
+        await db.commit()
+    if job is None:
+        return
+    try:
+        request = schemas.PlanRequest.model_validate_json(job.request)
+        plan_id, _ = await create_plan(job.user_id, request)
+        await _set_job_status(job_id, status="completed", generated_plan_id=plan_id)
+    except Exception as e:
+        await _set_job_status(
+            job_id, status="failed", error=f"An error occurred: {str(e)}"
+        )
+
+
+async def recover_plan_jobs(startup: bool):
+    # Running jobs that have not moved for PLAN_JOB_STALE_SECONDS lost their
+    # worker and are queued again. At startup every queued job is submitted;
+    # later sweeps only take the ones left waiting that long.
+    stale_before = datetime.now(timezone.utc) - timedelta(
+        seconds=PLAN_JOB_STALE_SECONDS
+    )
+    async with SessionLocal() as db:
+        result = await db.execute(
+            update(PlanJob)
+            .where(PlanJob.status == "running", PlanJob.updated_at < stale_before)
+            .values(status="queued", updated_at=func.now())
+            .returning(PlanJob.id)
+        )
+        job_ids = list(result.scalars())
+        queued = (
+            select(PlanJob.id)
+            .where(PlanJob.status == "queued")
+            .order_by(PlanJob.created_at)
+        )
+        if not startup:
+            queued = queued.where(PlanJob.updated_at < stale_before)
+        result = await db.execute(queued)
+        job_ids.extend(result.scalars())
+        await db.commit()
+
+    job_ids = list(dict.fromkeys(job_ids))
+    for submitted, job_id in enumerate(job_ids):
+        try:
+            plan_jobs.submit(job_id)
+        except asyncio.QueueFull:
+            logger.warning(
+                "Plan job queue is full, %s recovered jobs wait for the next sweep",
+                len(job_ids) - submitted,
+            )
+            break
+
+
+plan_jobs = JobQueue(
+    run_plan_job,
+    workers=PLAN_JOB_WORKERS,
+    maxsize=PLAN_JOB_QUEUE_SIZE,
+    recover=recover_plan_jobs,
+    recover_interval=PLAN_JOB_STALE_SECONDS / 2,
+)
+registry.collect_stats(
+    "plan_jobs", lambda: {"queue_depth": plan_jobs.depth()}, help="Plan job queue"
 )
 
 
+async def _enqueue_job(
+    db: AsyncSession, user_id: int, request: schemas.PlanRequest
+) -> str:
+    job = PlanJob(
+        id=uuid.uuid4().hex, user_id=user_id, request=request.model_dump_json()
+    )
+    db.add(job)
+    await db.commit()
+    try:
+        plan_jobs.submit(job.id)
+    except asyncio.QueueFull:
+        await db.delete(job)
+        await db.commit()
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Plan generation queue is full, please retry later",
+            headers={"Retry-After": "30"},
+        )
+    return job.id
+
+
 @router.post("/generate-plan/", status_code=status.HTTP_201_CREATED)
-def generate_plan(
+async def generate_plan(
     request: schemas.PlanRequest,
-    db: Session = Depends(get_db),
-    get_current_users: int = Depends(oauth.get_current_user),
+    background: bool = False,
+    db: AsyncSession = Depends(get_db),
+    get_current_users: schemas.UserOut = Depends(oauth.get_current_user),
 ):
-    try:
-        templates = {
-            "diet": diet_plan_template,
-            "dietYoga": diet_yoga_plan_template,
-            "dietWorkout": diet_workout_plan_template,
-            "dietYogaWorkout": diet_yoga_workout_plan_template,
-        }
-        selected_template = templates[request.planType]
-        plan_output = selected_template.format(**request.model_dump())
-        result = chat.invoke(plan_output)
-
-        generated_plan = UserGeneratedPlan(
-            user_id=get_current_users.id,
-            plan_type=request.planType,
-            generated_plan=result.content,
-            goal_time=request.timeGoal,
+    if request.planType not in plan_prompts:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Unknown plan type '{request.planType}'",
         )
-        db.add(generated_plan)
-        db.commit()
+
+    if background:
+        job_id = await _enqueue_job(db, get_current_users.id, request)
+        return JSONResponse(
+            content={"job_id": job_id, "status": "queued"},
+            status_code=status.HTTP_202_ACCEPTED,
+        )
+
+    try:
+        # Hand the pooled connection back while the model is working; the
+        # session reconnects lazily for the write below.
+        await db.close()
+        _, content = await create_plan(get_current_users.id, request)
         return JSONResponse(
-            content=result.content,
+            content=content,
             status_code=status.HTTP_200_OK,
         )
 
@@ -117,36 +371,356 @@ def generate_plan(
             detail=str(ve),
         )
     except Exception as e:
+        raise plan_error(e)
+
+
+async def _stream_llm_plan(request: schemas.PlanRequest):
+    # Yields ("day", day) as days arrive, then ("content", full plan).
+    key = cache_key_for(request) if PLAN_CACHE_ENABLED else None
+    content = await plan_cache.get(key) if key else None
+    if content is not None:
+        for day in MealPlanDayExtractor().feed(content):
+            yield "day", day
+    else:
+        if should_chunk(request):
+            segments = []
+            async for segment, data in iter_plan_segments(
+                segment_model(request), request
+            ):
+                segments.append((segment, data))
+                for day in data["meal_plan"]:
+                    yield "day", day
+            content = json.dumps(merge_segments(request, segments))
+        else:
+            async for kind, value in _stream_validated_plan(request):
+                if kind == "day":
+                    yield "day", value
+                else:
+                    content = json.dumps(value)
+        if key:
+            await plan_cache.put(key, request.planType, content)
+    yield "content", content
+
+
+async def _stream_plan(user_id: int, request: schemas.PlanRequest):
+    days = asyncio.Queue()
+
+    async def produce() -> str:
+        # Only runs when this request leads the flight; its days are sent as
+        # they are generated.
+        if not uses_rule_engine(request):
+            streamed = False
+            try:
+                async for kind, value in _stream_llm_plan(request):
+                    if kind == "day":
+                        streamed = True
+                        days.put_nowait(value)
+                    else:
+                        return value
+            except Exception:
+                # Days already sent cannot be swapped for a different plan.
+                if streamed or not PLAN_RULES_FALLBACK:
+                    raise
+                logger.exception("LLM plan streaming failed, using the rule engine")
+        return rule_plan_content(request)
+
+    # Identical requests share one generation and one stored plan, as
+    # create_plan does for the other endpoints.
+    flight = asyncio.ensure_future(plan_flights.run(user_id, request, produce))
+    flight.add_done_callback(lambda _: days.put_nowait(None))
+    try:
+        streamed = False
+        while (day := await days.get()) is not None:
+            streamed = True
+            yield sse_event("day", day)
+        plan_id, content = flight.result()
+        if not streamed:
+            for day in MealPlanDayExtractor().feed(content):
+                yield sse_event("day", day)
+        yield sse_event("complete", {"plan_id": plan_id, "generated_plan": content})
+    except Exception as e:
+        yield sse_event("error", {"detail": f"An error occurred: {str(e)}"})
+    finally:
+        # The flight itself is shielded and still stores the plan.
+        flight.cancel()
+
+
+@router.post("/generate-plan/stream", status_code=status.HTTP_200_OK)
+async def stream_plan(
+    request: schemas.PlanRequest,
+    get_current_users: schemas.UserOut = Depends(oauth.get_current_user),
+):
+    if request.planType not in plan_prompts:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Unknown plan type '{request.planType}'",
+        )
+
+    return StreamingResponse(
+        _stream_plan(get_current_users.id, request),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+@router.get("/generate-plan/{job_id}", status_code=status.HTTP_200_OK)
+async def get_plan_job(
+    job_id: str,
+    db: AsyncSession = Depends(get_db),
+    get_current_users: schemas.UserOut = Depends(oauth.get_current_user),
+):
+    result = await db.execute(
+        select(PlanJob)
+        .options(selectinload(PlanJob.generated_plan))
+        .filter(PlanJob.id == job_id, PlanJob.user_id == get_current_users.id)
+    )
+    job = result.scalars().first()
+    if job is None:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
-            detail=f"An error occurred: {str(e)}",
+            detail=f"Plan job '{job_id}' not found",
+        )
+
+    response = {"job_id": job.id, "status": job.status}
+    if job.status == "completed" and job.generated_plan is not None:
+        response["plan_id"] = job.generated_plan_id
+        response["generated_plan"] = plan_text(
+            job.generated_plan.generated_plan, job.generated_plan.plan
         )
+    if job.status == "failed":
+        response["error"] = job.error
+    return response
+
+
+@router.post("/nutrition-targets/", status_code=status.HTTP_200_OK)
+async def get_nutrition_targets(
+    request: schemas.PlanRequest,
+    get_current_users: schemas.UserOut = Depends(oauth.get_current_user),
+):
+    return targets_as_lists(plan_targets(request))
+
+
+@router.get("/admin/plan-cache/stats", status_code=status.HTTP_200_OK)
+async def get_plan_cache_stats(admin=Depends(oauth.admin_required)):
+    return plan_cache.stats()
+
+
+@router.get("/admin/plan-flights/stats", status_code=status.HTTP_200_OK)
+async def get_plan_flight_stats(admin=Depends(oauth.admin_required)):
+    return plan_flights.stats()
+
+
+@router.get("/admin/llm-client/stats", status_code=status.HTTP_200_OK)
+async def get_llm_client_stats(admin=Depends(oauth.admin_required)):
+    return llm_guard.stats()
+
+
+@router.get("/admin/llm-usage/stats", status_code=status.HTTP_200_OK)
+async def get_llm_usage_stats(admin=Depends(oauth.admin_required)):
+    return llm_usage.stats()
 
 
 @router.get(
-    "/user-generated-plans/", response_model=List[schemas.UserGeneratedPlanResponse]
+    "/user-generated-plans/",
+    response_model=Union[
+        List[schemas.UserGeneratedPlanResponse], schemas.UserGeneratedPlanPage
+    ],
 )
-def get_user_generated_plans(
-    db: Session = Depends(get_db),
-    get_current_users: int = Depends(oauth.get_current_user),
+async def get_user_generated_plans(
+    page: PageParams = Depends(),
+    db: AsyncSession = Depends(get_db),
+    get_current_users: schemas.UserOut = Depends(oauth.get_current_user),
 ):
     try:
-        plans = (
-            db.query(UserGeneratedPlan)
-            .filter(UserGeneratedPlan.user_id == get_current_users.id)
-            .all()
+        if page.paged:
+            # The plan body is left out of pages; fetch it per plan.
+            stmt = select(
+                UserGeneratedPlan.id,
+                UserGeneratedPlan.plan_type,
+                UserGeneratedPlan.goal_time,
+                UserGeneratedPlan.created_at,
+            )
+        else:
+            stmt = select(UserGeneratedPlan)
+        stmt = stmt.filter(UserGeneratedPlan.user_id == get_current_users.id)
+        result = await db.execute(
+            paginate(
+                stmt,
+                UserGeneratedPlan.created_at,
+                UserGeneratedPlan.id,
+                page,
+                descending=True,
+            )
         )
+        plans = result.all() if page.paged else result.scalars().all()
 
-        if not plans:
+        if not plans and page.cursor is None:
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND,
                 detail="No plans found for this user",
             )
 
-        return plans
+        return page_of(plans, page)
 
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail=f"An error occurred: {str(e)}",
         )
+
+
+@router.get(
+    "/user-generated-plans/{plan_id}",
+    response_model=schemas.UserGeneratedPlanResponse,
+)
+async def get_user_generated_plan(
+    plan_id: int,
+    days: Optional[str] = None,
+    db: AsyncSession = Depends(get_db),
+    get_current_users: schemas.UserOut = Depends(oauth.get_current_user),
+):
+    day_range = parse_day_range(days)
+    plan_column = UserGeneratedPlan.plan
+    if day_range is not None:
+        plan_column = plan_days_column(*day_range)
+    result = await db.execute(
+        select(
+            UserGeneratedPlan.id,
+            UserGeneratedPlan.plan_type,
+            UserGeneratedPlan.goal_time,
+            UserGeneratedPlan.created_at,
+            UserGeneratedPlan.generated_plan,
+            plan_column.label("plan"),
+        ).filter(
+            UserGeneratedPlan.id == plan_id,
+            UserGeneratedPlan.user_id == get_current_users.id,
+        )
+    )
+    row = result.first()
+    if row is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND, detail="Plan not found"
+        )
+
+    generated_plan, plan = row.generated_plan, row.plan
+    if day_range is not None and generated_plan is not None:
+        # Plans stored before JSONB storage are sliced here instead.
+        plan = parse_plan(generated_plan)
+        if plan is not None:
+            generated_plan, plan = None, select_days(plan, *day_range)
+
+    return {
+        "id": row.id,
+        "plan_type": row.plan_type,
+        "goal_time": row.goal_time,
+        "created_at": row.created_at,
+        "generated_plan": plan_text(generated_plan, plan),
+    }
+
+
+async def regenerate_parts(
+    request: schemas.PlanRequest, segments: list, sections: list
+) -> dict:
+    if uses_rule_engine(request):
+        return rule_updates(request, segments, sections)
+    try:
+        return await asyncio.wait_for(
+            llm_updates(segment_model(request, sections), request, segments, sections),
+            timeout=PLAN_LLM_TIMEOUT_SECONDS or None,
+        )
+    except Exception:
+        if not PLAN_RULES_FALLBACK:
+            raise
+        logger.exception("LLM plan regeneration failed, using the rule engine")
+        return rule_updates(request, segments, sections)
+
+
+@router.post(
+    "/user-generated-plans/{plan_id}/regenerate",
+    status_code=status.HTTP_201_CREATED,
+)
+async def regenerate_user_generated_plan(
+    plan_id: int,
+    body: schemas.PlanRegenerateRequest,
+    db: AsyncSession = Depends(get_db),
+    get_current_users: schemas.UserOut = Depends(oauth.get_current_user),
+):
+    day_range = parse_day_range(body.days)
+    result = await db.execute(
+        select(UserGeneratedPlan).filter(
+            UserGeneratedPlan.id == plan_id,
+            UserGeneratedPlan.user_id == get_current_users.id,
+        )
+    )
+    parent = result.scalars().first()
+    if parent is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND, detail="Plan not found"
+        )
+    if parent.request is None or parent.plan is None:
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail="This plan cannot be regenerated in part, generate a new plan",
+        )
+
+    try:
+        original = schemas.PlanRequest.model_validate(parent.request)
+        request = updated_request(parent.request, body.changes)
+    except ValidationError as ve:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(ve),
+        )
+    if request.planType not in plan_prompts:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Unknown plan type '{request.planType}'",
+        )
+
+    changed = changed_fields(original, request)
+    full = needs_full_plan(changed)
+    sections = plan_sections(request) if full else body.sections
+    sections = sections or affected_sections(request, changed)
+    if not sections:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Nothing to regenerate, change a field or pick a section",
+        )
+    unknown = set(sections) - set(plan_sections(request))
+    if unknown:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Plan has no {', '.join(sorted(unknown))}",
+        )
+    segments = (
+        [] if full else target_segments(request, parent.plan, sections, day_range)
+    )
+
+    try:
+        await db.close()
+        if full:
+            content = await resolve_plan_content(request)
+            generated_plan = new_generated_plan(
+                parent.user_id, request, content, parent
+            )
+        else:
+            # Only the selected days and weeks go back to the model; the
+            # rest of the parent plan is carried over unchanged.
+            updates = await regenerate_parts(request, segments, sections)
+            plan = apply_updates(parent.plan, request, updates)
+            generated_plan = plan_row(parent.user_id, request, plan, parent=parent)
+        db.add(generated_plan)
+        await db.commit()
+    except Exception as e:
+        raise plan_error(e)
+
+    return {
+        "id": generated_plan.id,
+        "parent_id": generated_plan.parent_id,
+        "version": generated_plan.version,
+        "sections": sections,
+        "days": [[first, last] for _, first, last in segments] or None,
+        "generated_plan": plan_text(generated_plan.generated_plan, generated_plan.plan),
+    }
@@ -0,0 +1,75 @@
+import os
+import json
+import asyncio
+from dotenv import load_dotenv
+from langchain_community.chat_models import ChatOpenAI
+from langchain_core.language_models.fake_chat_models import FakeListChatModel
+from langchain_core.messages import AIMessageChunk
+from langchain_core.outputs import ChatGenerationChunk
+from app.plan_generation.resilience import (
+    GuardedChatModel,
+    LLM_CALL_TIMEOUT_SECONDS,
+    llm_guard,
+)
+
+load_dotenv()
+OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
+OPENAI_MODEL = os.getenv("OPENAI_MODEL", "gpt-4o-mini")
+OPENAI_TEMPERATURE = float(os.getenv("OPENAI_TEMPERATURE", "0.7"))
+# "openai" talks to OPENAI_API_BASE (the real API unless overridden),
+# "fake" answers locally with a canned plan for development and load tests.
+LLM_PROVIDER = os.getenv("LLM_PROVIDER", "openai")
+FAKE_LLM_LATENCY = float(os.getenv("FAKE_LLM_LATENCY", "0"))
+FAKE_STREAM_CHUNK_CHARS = 64
+
+FAKE_PLAN_RESPONSE = json.dumps(
+    {
+        "planType": "diet",
+        "duration": "1 month",
+        "meals_per_day": 3,
+        "diet_type": "balanced",
+        "target_weight": 70,
+        "diet_goal": "weight loss",
+        "meal_plan": [
+            {
+                "day": day,
+                "Breakfast": "Oatmeal with berries",
+                "Lunch": "Grilled chicken salad",
+                "Dinner": "Lentil soup with vegetables",
+            }
+            for day in range(1, 31)
+        ],
+    }
+)
+
+
+class FakeChatModel(FakeListChatModel):
+    # The base model sleeps before every streamed character; wait once, as
+    # the time to first token, and stream the reply in larger chunks.
+
+    async def _astream(self, messages, stop=None, run_manager=None, **kwargs):
+        if self.sleep is not None:
+            await asyncio.sleep(self.sleep)
+        response = self.responses[self.i]
+        self.i = (self.i + 1) % len(self.responses)
+        for start in range(0, len(response), FAKE_STREAM_CHUNK_CHARS):
+            chunk = response[start : start + FAKE_STREAM_CHUNK_CHARS]
+            yield ChatGenerationChunk(message=AIMessageChunk(content=chunk))
+
+
+def build_chat_model():
+    if LLM_PROVIDER == "fake":
+        model = FakeChatModel(
+            responses=[FAKE_PLAN_RESPONSE], sleep=FAKE_LLM_LATENCY or None
+        )
+    else:
+        # Retries and deadlines are handled by the guard so they are
+        # counted and shared with the circuit breaker.
+        model = ChatOpenAI(
+            model=OPENAI_MODEL,
+            temperature=OPENAI_TEMPERATURE,
+            openai_api_key=OPENAI_API_KEY,
+            request_timeout=LLM_CALL_TIMEOUT_SECONDS or None,
+            max_retries=0,
+        )
+    return GuardedChatModel(model, llm_guard)
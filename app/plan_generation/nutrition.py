@@ -0,0 +1,186 @@
+import os
+import re
+import numpy as np
+from dotenv import load_dotenv
+from app import schemas
+from app.plan_generation.chunked import plan_duration_days
+
+load_dotenv()
+PLAN_CALORIE_TOLERANCE = float(os.getenv("PLAN_CALORIE_TOLERANCE", "0.15"))
+
+KG_PER_UNIT = {"kg": 1.0, "kgs": 1.0, "lb": 0.45359237, "lbs": 0.45359237}
+CM_PER_UNIT = {"cm": 1.0, "m": 100.0, "in": 2.54, "inch": 2.54, "ft": 30.48}
+
+# Checked in order, so "extra active" is not read as plain "active".
+ACTIVITY_FACTORS = {
+    "sedentary": 1.2,
+    "light": 1.375,
+    "moderate": 1.55,
+    "extra": 1.9,
+    "extreme": 1.9,
+    "very": 1.725,
+    "active": 1.725,
+}
+DEFAULT_ACTIVITY_FACTOR = 1.375
+DEFAULT_AGE = 30
+KCAL_PER_KG = 7700
+KCAL_PER_GRAM = {"protein": 4, "carbs": 4, "fat": 9}
+MAX_DAILY_DEFICIT = 1000
+MAX_DAILY_SURPLUS = 500
+MIN_CALORIES = {"male": 1500, "female": 1200}
+PROTEIN_G_PER_KG = {"loss": 1.6, "maintain": 1.2, "gain": 1.8}
+FAT_SHARE = 0.3
+AGE_NUMBERS = re.compile(r"\d+")
+KCAL_PATTERN = re.compile(r"(\d+(?:\.\d+)?)\s*k?cal(?:ories)?\b", re.IGNORECASE)
+
+
+def to_kg(value: float, unit: str) -> float:
+    return value * KG_PER_UNIT.get((unit or "").strip().lower(), 1.0)
+
+
+def to_cm(value: float, unit: str) -> float:
+    return value * CM_PER_UNIT.get((unit or "").strip().lower(), 1.0)
+
+
+def age_from_group(age_group) -> float:
+    numbers = [int(n) for n in AGE_NUMBERS.findall(age_group or "")]
+    if not numbers:
+        return DEFAULT_AGE
+    return sum(numbers[:2]) / len(numbers[:2])
+
+
+def activity_factor(activity_level) -> float:
+    level = (activity_level or "").lower()
+    for keyword, factor in ACTIVITY_FACTORS.items():
+        if keyword in level:
+            return factor
+    return DEFAULT_ACTIVITY_FACTOR
+
+
+def _sex_offset(gender) -> float:
+    gender = (gender or "").strip().lower()
+    if gender.startswith("f"):
+        return -161
+    if gender.startswith("m"):
+        return 5
+    return -78
+
+
+def bmr(weight_kg, height_cm, age, gender):
+    # Mifflin-St Jeor; works on scalars and arrays alike.
+    return 10 * weight_kg + 6.25 * height_cm - 5 * age + _sex_offset(gender)
+
+
+def daily_energy_delta(request: schemas.PlanRequest, days: int) -> float:
+    change_kg = to_kg(request.targetWeight, request.targetWeightUnit) - to_kg(
+        request.currentWeight, request.weightUnit
+    )
+    delta = change_kg * KCAL_PER_KG / days
+    return max(-MAX_DAILY_DEFICIT, min(MAX_DAILY_SURPLUS, delta))
+
+
+def _goal(delta: float) -> str:
+    if delta < -50:
+        return "loss"
+    if delta > 50:
+        return "gain"
+    return "maintain"
+
+
+def plan_targets(request: schemas.PlanRequest, days: int = None) -> dict:
+    days = days or plan_duration_days(request.timeGoal)
+    delta = daily_energy_delta(request, days)
+
+    # Expected weight on each day if the targets are followed, so BMR and
+    # protein track the shrinking (or growing) body over the horizon.
+    start_kg = to_kg(request.currentWeight, request.weightUnit)
+    weight = start_kg + delta / KCAL_PER_KG * np.arange(days)
+    height = to_cm(request.height, request.heightUnit)
+    tdee = bmr(weight, height, age_from_group(request.ageGroup), request.gender)
+    tdee = tdee * activity_factor(request.activityLevel)
+
+    minimum = MIN_CALORIES.get((request.gender or "").strip().lower(), 1200)
+    calories = np.maximum(tdee + delta, minimum)
+    protein = weight * PROTEIN_G_PER_KG[_goal(delta)]
+    fat = calories * FAT_SHARE / KCAL_PER_GRAM["fat"]
+    carbs = (
+        np.maximum(
+            calories - protein * KCAL_PER_GRAM["protein"] - fat * KCAL_PER_GRAM["fat"],
+            0,
+        )
+        / KCAL_PER_GRAM["carbs"]
+    )
+    return {
+        "day": np.arange(1, days + 1),
+        "weight_kg": weight,
+        "calories": calories,
+        "protein_g": protein,
+        "carbs_g": carbs,
+        "fat_g": fat,
+    }
+
+
+def targets_as_lists(targets: dict) -> dict:
+    return {
+        name: values.round(1).tolist() if values.dtype.kind == "f" else values.tolist()
+        for name, values in targets.items()
+    }
+
+
+def _meal_calories(meal) -> float:
+    if isinstance(meal, dict):
+        value = meal.get("calories", meal.get("kcal"))
+        if isinstance(value, (int, float)):
+            return float(value)
+        meal = " ".join(str(value) for value in meal.values())
+    match = KCAL_PATTERN.search(str(meal))
+    return float(match.group(1)) if match else np.nan
+
+
+def meal_plan_calories(meal_plan: list, days: int) -> np.ndarray:
+    # Flatten every meal to (day index, kcal) once, then total each day with
+    # bincount instead of summing day by day.
+    items = [
+        (day["day"] - 1, _meal_calories(meal))
+        for day in meal_plan
+        if isinstance(day, dict) and isinstance(day.get("day"), int)
+        for name, meal in day.items()
+        if name != "day"
+    ]
+    totals = np.full(days, np.nan)
+    if not items:
+        return totals
+    index, calories = np.array(items).T
+    index = index.astype(int)
+    known = ~np.isnan(calories) & (index >= 0) & (index < days)
+    counted = np.bincount(index[known], minlength=days) > 0
+    summed = np.bincount(index[known], weights=calories[known], minlength=days)
+    totals[counted] = summed[counted]
+    return totals
+
+
+def check_meal_plan(
+    request: schemas.PlanRequest,
+    meal_plan: list,
+    tolerance: float = PLAN_CALORIE_TOLERANCE,
+) -> dict:
+    days = plan_duration_days(request.timeGoal)
+    targets = plan_targets(request, days)["calories"]
+    totals = meal_plan_calories(meal_plan, days)
+    drift = totals / targets - 1
+    checked = ~np.isnan(drift)
+    flagged = np.flatnonzero(checked & (np.abs(np.nan_to_num(drift)) > tolerance))
+    return {
+        "tolerance": tolerance,
+        "days_checked": int(checked.sum()),
+        "mean_drift": round(float(drift[checked].mean()), 4) if checked.any() else None,
+        "flagged_days": [
+            {
+                "day": int(i + 1),
+                "calories": round(float(totals[i])),
+                "target": round(float(targets[i])),
+                "drift": round(float(drift[i]), 4),
+            }
+            for i in flagged
+        ],
+    }
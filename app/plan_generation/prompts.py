@@ -0,0 +1,118 @@
+from langchain_core.prompts import ChatPromptTemplate
+
+# Prompts are split into a static system message followed by the request
+# details, so every plan call starts with the same tokens and the provider
+# can serve that prefix from its prompt cache.
+SHARED_INSTRUCTIONS = (
+    "You create personalized diet plans, optionally with weekly yoga and workout schedules. "
+    "Meals name has to be Breakfast, Lunch and Dinner. and if they ask more than 3 meals a day then the rest meals will be named as Snacks. "
+    "Create meals day by day, with one meal_plan entry per day that includes its day number under the key day. "
+    "Yoga and workout schedules are weekly, and each week will consist of the daily yoga or workout exercises. "
+    "Ensure the plan complements their fitness level, target weight and keyGoals, and consider any medical conditions they mention. "
+    "The response should be in Structured JSON Format only and not in markdown or any other format. It should be in simple JSON Format and please do not give any other information. "
+)
+HEADER_KEYS = [
+    "planType",
+    "duration",
+    "meals_per_day",
+    "diet_type",
+    "target_weight",
+    "diet_goal",
+]
+
+PROFILE = "Create a personalized {plan_description} plan for a {gender} person whose ageGroup is {ageGroup} and who is {height} {heightUnit} tall and weighs {currentWeight} {weightUnit} and their target goal weight is {targetWeight} {targetWeightUnit}. "
+YOGA = (
+    "they may or may not have previous yoga experience: {yogaExperience} experience. "
+    "For yoga, focus on {yogaType}, which aligns with their current activity level: {activityLevel}. "
+)
+WORKOUT = (
+    "For workout, focus on {workoutPreference}, and they are willing to do workout for {workoutDays} a week. "
+    "their current activity level is {activityLevel}. "
+)
+# Added when a weekly segment is generated on its own.
+YOGA_SEGMENT = "Include the yoga schedule for this week only. "
+WORKOUT_SEGMENT = "Include the daily workout exercises for this week only. "
+DIET = (
+    "They have the following dietary preferences: Diet Type is {dietType}, with the following {dietRestrictions} dietary restrictions. "
+    "They prefer {mealPreference} meals per day. "
+)
+GOALS = (
+    "Their time goal is to achieve the target weight is {timeGoal} and key goals for the diet plan is {dietGoals}. "
+    "Generate meal plans for each day separately over the whole {timeGoal} (e.g., 1 month = 30 days, 2 months = 60 days, 3 months = 90 days) "
+    "and weekly schedules for every week of it (e.g., 1 month timeGoal = 4 weeks). "
+)
+MEDICAL = "they may or may not have additional information regarding their {medicalConditions} which should be consider while creating the plan. "
+
+PLAN_DESCRIPTIONS = {
+    "diet": "diet",
+    "dietYoga": "diet with yoga",
+    "dietWorkout": "diet with workout",
+    "dietYogaWorkout": "diet with both yoga and workout",
+}
+PLAN_SECTIONS = {
+    "diet": ["meal_plan"],
+    "dietYoga": ["meal_plan", "yoga_plan"],
+    "dietWorkout": ["meal_plan", "workout_plan"],
+    "dietYogaWorkout": ["meal_plan", "workout_plan", "yoga_plan"],
+}
+
+
+def json_keys(keys) -> str:
+    numbered = " ".join(f"{i}. {key}:" for i, key in enumerate(keys, start=1))
+    return f"the keys JSON structure have will be only: {numbered}"
+
+
+def activity_fragments(sections, segment: bool = False) -> str:
+    fragments = ""
+    if "yoga_plan" in sections:
+        fragments += YOGA + (YOGA_SEGMENT if segment else "")
+    if "workout_plan" in sections:
+        fragments += WORKOUT + (WORKOUT_SEGMENT if segment else "")
+    return fragments
+
+
+def _plan_prompt(plan_type: str) -> ChatPromptTemplate:
+    sections = PLAN_SECTIONS[plan_type]
+    human = PROFILE + activity_fragments(sections) + DIET + GOALS + MEDICAL
+    return ChatPromptTemplate.from_messages(
+        [
+            ("system", SHARED_INSTRUCTIONS + json_keys(HEADER_KEYS + sections)),
+            # The description is fixed per plan type, so fill it in once here.
+            (
+                "human",
+                human.replace("{plan_description}", PLAN_DESCRIPTIONS[plan_type]),
+            ),
+        ]
+    )
+
+
+plan_prompts = {plan_type: _plan_prompt(plan_type) for plan_type in PLAN_SECTIONS}
+
+segment_prompt = ChatPromptTemplate.from_messages(
+    [
+        ("system", SHARED_INSTRUCTIONS + "{segment_keys}"),
+        (
+            "human",
+            PROFILE.replace("Create a", "Create part of a")
+            + "{activity_instructions}"
+            + DIET
+            + "The whole plan lasts {timeGoal} and key goals for the diet plan is {dietGoals}. "
+            + MEDICAL
+            + "Only create week {week} of the plan, covering day {first_day} to day {last_day}.",
+        ),
+    ]
+)
+
+
+def prompt_text(prompt: ChatPromptTemplate) -> str:
+    return "".join(message.prompt.template for message in prompt.messages)
+
+
+def format_prompt(prompt: ChatPromptTemplate, request, **values) -> list:
+    # Only the fields the template uses are read from the request.
+    fields = {
+        name: getattr(request, name)
+        for name in prompt.input_variables
+        if name not in values
+    }
+    return prompt.format_messages(**fields, **values)
@@ -0,0 +1,173 @@
+from typing import List, Optional
+from fastapi import HTTPException, status
+from app import schemas
+from app.plan_generation.chunked import (
+    iter_plan_segments,
+    plan_duration_days,
+    plan_header,
+    plan_sections,
+    plan_segments,
+)
+from app.plan_generation.rules import build_rule_plan
+
+# Request fields each section is written from; a change to any of them makes
+# that section stale.
+SECTION_FIELDS = {
+    "meal_plan": {
+        "gender",
+        "ageGroup",
+        "currentWeight",
+        "weightUnit",
+        "height",
+        "heightUnit",
+        "targetWeight",
+        "targetWeightUnit",
+        "activityLevel",
+        "dietType",
+        "dietRestrictions",
+        "dietRestrictionsDetails",
+        "mealPreference",
+        "dietGoals",
+        "medicalConditions",
+        "medicalDetails",
+    },
+    "workout_plan": {
+        "activityLevel",
+        "workoutPreference",
+        "workoutType",
+        "workoutDetails",
+        "workoutDays",
+    },
+    "yoga_plan": {"activityLevel", "yogaType", "yogaExperience", "experienceDetails"},
+}
+# These change the shape of the whole plan, so nothing can be reused.
+FULL_PLAN_FIELDS = {"planType", "timeGoal", "engine"}
+WEEKLY_SECTIONS = ("workout_plan", "yoga_plan")
+
+
+def updated_request(stored: dict, changes: dict) -> schemas.PlanRequest:
+    unknown = set(changes) - set(schemas.PlanRequest.model_fields)
+    if unknown:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Unknown plan fields: {', '.join(sorted(unknown))}",
+        )
+    return schemas.PlanRequest.model_validate({**stored, **changes})
+
+
+def changed_fields(original: schemas.PlanRequest, request: schemas.PlanRequest) -> set:
+    before, after = original.model_dump(), request.model_dump()
+    return {name for name, value in after.items() if before.get(name) != value}
+
+
+def needs_full_plan(changed: set) -> bool:
+    return bool(changed & FULL_PLAN_FIELDS)
+
+
+def affected_sections(request: schemas.PlanRequest, changed: set) -> List[str]:
+    return [
+        section
+        for section in plan_sections(request)
+        if changed & SECTION_FIELDS[section]
+    ]
+
+
+def _week_structured(plan: dict, section: str) -> bool:
+    weeks = plan.get(section)
+    return isinstance(weeks, list) and all(
+        isinstance(week, dict) and isinstance(week.get("week"), int) for week in weeks
+    )
+
+
+def target_segments(
+    request: schemas.PlanRequest,
+    plan: dict,
+    sections: List[str],
+    day_range: Optional[tuple],
+) -> List[tuple]:
+    total_days = plan_duration_days(request.timeGoal)
+    # Weekly sections from one-shot plans have no week numbers to merge on,
+    # so they are rebuilt for the whole plan.
+    if any(
+        section in plan and not _week_structured(plan, section)
+        for section in sections
+        if section in WEEKLY_SECTIONS
+    ):
+        day_range = None
+    first, last = day_range or (1, total_days)
+    if first > total_days:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"The plan only has {total_days} days",
+        )
+    return [
+        (week, max(first_day, first), min(last_day, last))
+        for week, first_day, last_day in plan_segments(total_days)
+        if first_day <= last and last_day >= first
+    ]
+
+
+async def llm_updates(
+    chat, request: schemas.PlanRequest, segments: List[tuple], sections: List[str]
+) -> dict:
+    updates = {section: {} for section in sections}
+    async for (week, _, _), data in iter_plan_segments(
+        chat, request, segments, sections
+    ):
+        if "meal_plan" in sections:
+            for meals in data["meal_plan"]:
+                updates["meal_plan"][meals["day"]] = meals
+        for section in WEEKLY_SECTIONS:
+            if section in sections:
+                updates[section][week] = data.get(section)
+    return updates
+
+
+def rule_updates(
+    request: schemas.PlanRequest, segments: List[tuple], sections: List[str]
+) -> dict:
+    plan = build_rule_plan(request)
+    days = {day for _, first, last in segments for day in range(first, last + 1)}
+    weeks = {week for week, _, _ in segments}
+    updates = {section: {} for section in sections}
+    if "meal_plan" in sections:
+        updates["meal_plan"] = {
+            meals["day"]: meals for meals in plan["meal_plan"] if meals["day"] in days
+        }
+    for section in WEEKLY_SECTIONS:
+        if section in sections:
+            updates[section] = {
+                week["week"]: week["schedule"]
+                for week in plan.get(section, [])
+                if week["week"] in weeks
+            }
+    return updates
+
+
+def apply_updates(plan: dict, request: schemas.PlanRequest, updates: dict) -> dict:
+    merged = {**plan, **plan_header(request)}
+    # Recomputed for the merged plan when the new version is stored.
+    merged.pop("nutrition_check", None)
+
+    if "meal_plan" in updates:
+        days = updates["meal_plan"]
+        kept = [
+            meals
+            for meals in plan.get("meal_plan") or []
+            if isinstance(meals, dict) and meals.get("day") not in days
+        ]
+        merged["meal_plan"] = sorted(
+            kept + list(days.values()), key=lambda meals: meals.get("day") or 0
+        )
+    for section in WEEKLY_SECTIONS:
+        if section not in updates:
+            continue
+        weeks = updates[section]
+        kept = []
+        if _week_structured(plan, section):
+            kept = [week for week in plan[section] if week["week"] not in weeks]
+        merged[section] = sorted(
+            kept + [{"week": week, "schedule": value} for week, value in weeks.items()],
+            key=lambda week: week["week"],
+        )
+    return merged
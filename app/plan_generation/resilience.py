@@ -0,0 +1,316 @@
+import os
+import time
+import random
+import asyncio
+import logging
+from collections import deque
+from contextlib import asynccontextmanager
+from dotenv import load_dotenv
+import openai
+from app.metrics import registry
+
+load_dotenv()
+LLM_CALL_TIMEOUT_SECONDS = float(os.getenv("LLM_CALL_TIMEOUT_SECONDS", "60"))
+LLM_MAX_RETRIES = int(os.getenv("LLM_MAX_RETRIES", "3"))
+LLM_BACKOFF_BASE_SECONDS = float(os.getenv("LLM_BACKOFF_BASE_SECONDS", "0.5"))
+LLM_BACKOFF_MAX_SECONDS = float(os.getenv("LLM_BACKOFF_MAX_SECONDS", "8"))
+LLM_MAX_CONCURRENCY = int(os.getenv("LLM_MAX_CONCURRENCY", "16"))
+LLM_BREAKER_WINDOW_SECONDS = float(os.getenv("LLM_BREAKER_WINDOW_SECONDS", "60"))
+LLM_BREAKER_MIN_CALLS = int(os.getenv("LLM_BREAKER_MIN_CALLS", "10"))
+LLM_BREAKER_ERROR_RATE = float(os.getenv("LLM_BREAKER_ERROR_RATE", "0.5"))
+LLM_BREAKER_COOLDOWN_SECONDS = float(os.getenv("LLM_BREAKER_COOLDOWN_SECONDS", "30"))
+
+RETRYABLE_ERRORS = (
+    asyncio.TimeoutError,
+    openai.APITimeoutError,
+    openai.APIConnectionError,
+    openai.RateLimitError,
+    openai.InternalServerError,
+)
+logger = logging.getLogger(__name__)
+
+
+class CircuitOpenError(Exception):
+    def __init__(self, retry_after: float):
+        super().__init__("The plan model is unavailable, please retry later")
+        self.retry_after = retry_after
+
+
+class CircuitBreaker:
+    # Opens when the error rate over the last window_seconds crosses
+    # error_rate, then lets a single probe call through after cooldown.
+
+    def __init__(
+        self,
+        window_seconds: float,
+        min_calls: int,
+        error_rate: float,
+        cooldown_seconds: float,
+    ):
+        self.window_seconds = window_seconds
+        self.min_calls = min_calls
+        self.error_rate = error_rate
+        self.cooldown_seconds = cooldown_seconds
+        self.state = "closed"
+        self.opened = 0
+        self._outcomes = deque()
+        self._opened_at = 0.0
+        self._probe_started = None
+
+    def before_call(self):
+        if self.state == "closed":
+            return
+        now = time.monotonic()
+        remaining = self._opened_at + self.cooldown_seconds - now
+        if self.state == "open" and remaining <= 0:
+            self.state = "half_open"
+        # A probe that never reported back (e.g. cancelled) is replaced
+        # after another cooldown.
+        if self.state == "half_open" and (
+            self._probe_started is None
+            or now - self._probe_started > self.cooldown_seconds
+        ):
+            self._probe_started = now
+            return
+        raise CircuitOpenError(max(remaining, 1.0))
+
+    def record(self, ok: bool):
+        now = time.monotonic()
+        if self.state == "half_open":
+            self._probe_started = None
+            if ok:
+                self.state = "closed"
+                self._outcomes.clear()
+            else:
+                self._open(now)
+            return
+
+        self._outcomes.append((now, ok))
+        while self._outcomes and self._outcomes[0][0] < now - self.window_seconds:
+            self._outcomes.popleft()
+        failures = sum(1 for _, succeeded in self._outcomes if not succeeded)
+        if (
+            self.state == "closed"
+            and len(self._outcomes) >= self.min_calls
+            and failures / len(self._outcomes) >= self.error_rate
+        ):
+            self._open(now)
+
+    def _open(self, now: float):
+        self.state = "open"
+        self.opened += 1
+        self._opened_at = now
+        logger.warning("LLM circuit breaker opened")
+
+
+class LLMGuard:
+    # Shared by every model handle so limits and the breaker are
+    # process-wide.
+
+    def __init__(
+        self,
+        timeout_seconds: float,
+        max_retries: int,
+        backoff_base: float,
+        backoff_max: float,
+        max_concurrency: int,
+        breaker: CircuitBreaker,
+    ):
+        self.timeout_seconds = timeout_seconds
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.breaker = breaker
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+        self.counters = {
+            "calls": 0,
+            "successes": 0,
+            "failures": 0,
+            "retries": 0,
+            "timeouts": 0,
+            "rejected": 0,
+            "in_flight": 0,
+            "waiting": 0,
+            "wait_seconds": 0.0,
+        }
+
+    def backoff(self, attempt: int, error: Exception) -> float:
+        # Full jitter, but never sooner than the provider's Retry-After.
+        delay = random.uniform(0, min(self.backoff_max, self.backoff_base * 2**attempt))
+        response = getattr(error, "response", None)
+        retry_after = (
+            response.headers.get("retry-after") if response is not None else None
+        )
+        try:
+            return max(delay, min(float(retry_after), self.backoff_max))
+        except (TypeError, ValueError):
+            return delay
+
+    @asynccontextmanager
+    async def slot(self):
+        try:
+            self.breaker.before_call()
+        except CircuitOpenError:
+            self.counters["rejected"] += 1
+            raise
+        self.counters["waiting"] += 1
+        started = time.perf_counter()
+        try:
+            await self._semaphore.acquire()
+        finally:
+            self.counters["waiting"] -= 1
+            self.counters["wait_seconds"] += time.perf_counter() - started
+        self.counters["calls"] += 1
+        self.counters["in_flight"] += 1
+        try:
+            yield
+        finally:
+            self.counters["in_flight"] -= 1
+            self._semaphore.release()
+
+    def succeeded(self):
+        self.counters["successes"] += 1
+        self.breaker.record(True)
+
+    def failed(self, error: BaseException) -> bool:
+        # Returns whether the error is worth retrying. Only those count
+        # against the breaker; a rejected request still proves the provider
+        # is answering.
+        self.counters["failures"] += 1
+        if isinstance(error, (asyncio.TimeoutError, openai.APITimeoutError)):
+            self.counters["timeouts"] += 1
+        retryable = isinstance(error, RETRYABLE_ERRORS)
+        self.breaker.record(not retryable)
+        return retryable
+
+    def stats(self) -> dict:
+        return {
+            **self.counters,
+            "wait_seconds": round(self.counters["wait_seconds"], 3),
+            "breaker_state": self.breaker.state,
+            "breaker_opened": self.breaker.opened,
+        }
+
+
+class GuardedChatModel:
+    # Wraps a chat model (or a bound/configured one) with per-call deadlines,
+    # retries and the shared guard; bind and with_config keep the wrapping.
+
+    def __init__(self, model, guard: LLMGuard):
+        self.model = model
+        self.guard = guard
+
+    def bind(self, **kwargs) -> "GuardedChatModel":
+        return GuardedChatModel(self.model.bind(**kwargs), self.guard)
+
+    def with_config(self, **kwargs) -> "GuardedChatModel":
+        return GuardedChatModel(self.model.with_config(**kwargs), self.guard)
+
+    async def ainvoke(self, input, **kwargs):
+        attempt = 0
+        while True:
+            try:
+                async with self.guard.slot():
+                    result = await asyncio.wait_for(
+                        self.model.ainvoke(input, **kwargs),
+                        timeout=self.guard.timeout_seconds or None,
+                    )
+                self.guard.succeeded()
+                return result
+            except CircuitOpenError:
+                raise
+            except Exception as e:
+                if not self.guard.failed(e) or attempt >= self.guard.max_retries:
+                    raise
+                delay = self.guard.backoff(attempt, e)
+                attempt += 1
+                self.guard.counters["retries"] += 1
+                logger.warning(
+                    "LLM call failed (%s), retry %s in %.2fs", e, attempt, delay
+                )
+                await asyncio.sleep(delay)
+
+    async def _stream_before_deadline(self, input, **kwargs):
+        # The deadline covers the whole stream, but is only enforced while
+        # waiting on the model, never while the caller handles a chunk.
+        loop = asyncio.get_running_loop()
+        timeout = self.guard.timeout_seconds
+        deadline = loop.time() + timeout if timeout else None
+        chunks = self.model.astream(input, **kwargs).__aiter__()
+        try:
+            while True:
+                remaining = max(deadline - loop.time(), 0) if deadline else None
+                try:
+                    chunk = await asyncio.wait_for(chunks.__anext__(), remaining)
+                except StopAsyncIteration:
+                    return
+                yield chunk
+        finally:
+            await chunks.aclose()
+
+    async def astream(self, input, **kwargs):
+        attempt = 0
+        while True:
+            started = False
+            try:
+                async with self.guard.slot():
+                    async for chunk in self._stream_before_deadline(input, **kwargs):
+                        started = True
+                        yield chunk
+                self.guard.succeeded()
+                return
+            except CircuitOpenError:
+                raise
+            except Exception as e:
+                # Chunks already handed out cannot be taken back.
+                if (
+                    not self.guard.failed(e)
+                    or started
+                    or attempt >= self.guard.max_retries
+                ):
+                    raise
+                delay = self.guard.backoff(attempt, e)
+                attempt += 1
+                self.guard.counters["retries"] += 1
+                logger.warning(
+                    "LLM stream failed (%s), retry %s in %.2fs", e, attempt, delay
+                )
+                await asyncio.sleep(delay)
+
+
+llm_guard = LLMGuard(
+    timeout_seconds=LLM_CALL_TIMEOUT_SECONDS,
+    max_retries=LLM_MAX_RETRIES,
+    backoff_base=LLM_BACKOFF_BASE_SECONDS,
+    backoff_max=LLM_BACKOFF_MAX_SECONDS,
+    max_concurrency=LLM_MAX_CONCURRENCY,
+    breaker=CircuitBreaker(
+        window_seconds=LLM_BREAKER_WINDOW_SECONDS,
+        min_calls=LLM_BREAKER_MIN_CALLS,
+        error_rate=LLM_BREAKER_ERROR_RATE,
+        cooldown_seconds=LLM_BREAKER_COOLDOWN_SECONDS,
+    ),
+)
+registry.collect_stats(
+    "llm_guard",
+    llm_guard.stats,
+    counters=(
+        "calls",
+        "successes",
+        "failures",
+        "retries",
+        "timeouts",
+        "rejected",
+        "wait_seconds",
+        "breaker_opened",
+    ),
+    help="LLM client",
+)
+registry.collect_stats(
+    "llm_breaker",
+    lambda: {
+        "open": int(llm_guard.breaker.state == "open"),
+        "half_open": int(llm_guard.breaker.state == "half_open"),
+    },
+    help="LLM circuit breaker state",
+)
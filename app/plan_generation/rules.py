@@ -0,0 +1,312 @@
+import os
+import re
+import json
+import math
+import random
+import hashlib
+from typing import List
+from dotenv import load_dotenv
+from app import schemas
+from app.plan_generation.catalog import MEALS, EXERCISES, YOGA_POSES
+from app.plan_generation.chunked import plan_duration_days, plan_header, plan_includes
+from app.plan_generation.nutrition import plan_targets
+from app.plan_generation.structured import parse_number
+
+load_dotenv()
+# "llm" or "rules"; a request can override it with its engine field.
+PLAN_ENGINE = os.getenv("PLAN_ENGINE", "llm")
+PLAN_RULES_FALLBACK = os.getenv("PLAN_RULES_FALLBACK", "true").lower() == "true"
+
+DIET_LEVELS = {"vegan": 0, "vegetarian": 1, "pescatarian": 2, "omnivore": 3}
+DIET_KEYWORDS = [
+    ("non-veg", "omnivore"),
+    ("non veg", "omnivore"),
+    ("vegan", "vegan"),
+    ("plant", "vegan"),
+    ("pesc", "pescatarian"),
+    ("veg", "vegetarian"),
+    ("eggetarian", "vegetarian"),
+]
+ALLERGEN_KEYWORDS = {
+    "gluten": ["gluten", "wheat", "celiac", "coeliac"],
+    "dairy": ["dairy", "lactose", "milk"],
+    "nuts": ["nut", "peanut", "walnut", "hazelnut", "almond"],
+    "egg": ["egg"],
+    "soy": ["soy", "soya", "soybean"],
+    "fish": ["fish"],
+    "shellfish": ["shellfish", "shrimp", "prawn"],
+}
+# Whole words only, so "nutrition" or "coconut" do not exclude nuts and
+# "shellfish" does not exclude fish.
+ALLERGEN_PATTERNS = {
+    allergen: re.compile(r"\b(?:%s)s?\b" % "|".join(keywords))
+    for allergen, keywords in ALLERGEN_KEYWORDS.items()
+}
+CONDITION_TAGS = {
+    "low_gi": ["diabet", "blood sugar", "insulin", "pcos", "pcod"],
+    "low_sodium": ["hypertension", "blood pressure", "kidney"],
+    "heart_healthy": ["heart", "cholesterol", "cardio"],
+}
+LOW_CARB_KEYWORDS = ["keto", "low carb", "low-carb"]
+
+SLOT_SHARES = {"breakfast": 0.25, "lunch": 0.35, "dinner": 0.3, "snack": 0.1}
+SLOT_LAYOUTS = {
+    1: [("Lunch", "lunch")],
+    2: [("Breakfast", "breakfast"), ("Dinner", "dinner")],
+    3: [("Breakfast", "breakfast"), ("Lunch", "lunch"), ("Dinner", "dinner")],
+}
+MAX_MEALS_PER_DAY = 6
+PORTION_STEP = 0.25
+MIN_PORTION = 0.5
+MAX_PORTION = 2.5
+
+EXPERIENCE_LEVELS = {"beginner": 0, "intermediate": 1, "advanced": 2}
+WORKOUT_CATEGORIES = {
+    "strength": ["strength", "weight", "muscle", "resistance"],
+    "cardio": ["cardio", "run", "walk", "cycl", "endurance"],
+    "hiit": ["hiit", "interval", "circuit"],
+}
+YOGA_STYLES = {
+    "restorative": ["restorative", "yin", "relax", "stress"],
+    "power": ["power", "ashtanga"],
+    "vinyasa": ["vinyasa", "flow"],
+    "hatha": ["hatha", "beginner", "flexib"],
+}
+
+
+def uses_rule_engine(request: schemas.PlanRequest) -> bool:
+    return (request.engine or PLAN_ENGINE) == "rules"
+
+
+def _text(*values) -> str:
+    return " ".join((value or "").lower() for value in values)
+
+
+def first_number(value, default: int, low: int, high: int) -> int:
+    number = parse_number(value)
+    return max(low, min(high, default if number is None else number))
+
+
+def diet_level(diet_type) -> int:
+    diet_type = _text(diet_type)
+    for keyword, diet in DIET_KEYWORDS:
+        if keyword in diet_type:
+            return DIET_LEVELS[diet]
+    return DIET_LEVELS["omnivore"]
+
+
+def excluded_allergens(request: schemas.PlanRequest) -> set:
+    text = _text(
+        request.dietRestrictions,
+        request.dietRestrictionsDetails,
+        request.medicalConditions,
+        request.medicalDetails,
+    )
+    return {
+        allergen
+        for allergen, pattern in ALLERGEN_PATTERNS.items()
+        if pattern.search(text)
+    }
+
+
+def preferred_tags(request: schemas.PlanRequest) -> set:
+    text = _text(request.medicalConditions, request.medicalDetails)
+    tags = {
+        tag
+        for tag, keywords in CONDITION_TAGS.items()
+        if any(keyword in text for keyword in keywords)
+    }
+    if any(keyword in _text(request.dietType) for keyword in LOW_CARB_KEYWORDS):
+        tags.add("low_carb")
+    return tags
+
+
+def meal_candidates(slot: str, level: int, allergens: set, tags: set) -> List[dict]:
+    allowed = [
+        meal
+        for meal in MEALS
+        if meal["slot"] == slot
+        and DIET_LEVELS[meal["diet"]] <= level
+        and not allergens.intersection(meal["contains"])
+    ]
+    # Condition tags narrow the choice only while enough variety is left.
+    preferred = [meal for meal in allowed if tags.issubset(meal["tags"])]
+    return preferred if len(preferred) >= 3 else allowed
+
+
+def meal_slots(meals_per_day: int) -> List[tuple]:
+    if meals_per_day in SLOT_LAYOUTS:
+        return SLOT_LAYOUTS[meals_per_day]
+    snacks = meals_per_day - 3
+    names = ["Snacks"] if snacks == 1 else [f"Snacks {i}" for i in range(1, snacks + 1)]
+    return SLOT_LAYOUTS[3] + [(name, "snack") for name in names]
+
+
+def portion(meal: dict, calories: float) -> float:
+    servings = round(calories / meal["calories"] / PORTION_STEP) * PORTION_STEP
+    return max(MIN_PORTION, min(MAX_PORTION, servings))
+
+
+def describe_meal(meal: dict, servings: float) -> str:
+    label = "serving" if servings == 1 else "servings"
+    calories = int(round(meal["calories"] * servings))
+    return f"{meal['name']} ({servings:g} {label}, ~{calories} kcal)"
+
+
+def build_meal_plan(
+    request: schemas.PlanRequest, days: int, calories, rng: random.Random
+) -> List[dict]:
+    level = diet_level(request.dietType)
+    allergens = excluded_allergens(request)
+    tags = preferred_tags(request)
+    slots = meal_slots(first_number(request.mealPreference, 3, 1, MAX_MEALS_PER_DAY))
+    total_share = sum(SLOT_SHARES[slot] for _, slot in slots)
+
+    rotations = {}
+    for _, slot in slots:
+        if slot not in rotations:
+            candidates = meal_candidates(slot, level, allergens, tags)
+            rotations[slot] = rng.sample(candidates, len(candidates))
+
+    meal_plan = []
+    for day in range(1, days + 1):
+        entry = {"day": day}
+        for position, (name, slot) in enumerate(slots):
+            rotation = rotations[slot]
+            if not rotation:
+                entry[name] = "No catalog meal matches these restrictions"
+                continue
+            meal = rotation[(day - 1 + position) % len(rotation)]
+            target = calories[day - 1] * SLOT_SHARES[slot] / total_share
+            entry[name] = describe_meal(meal, portion(meal, target))
+        meal_plan.append(entry)
+    return meal_plan
+
+
+def _experience(*values) -> int:
+    text = _text(*values)
+    for level, rank in sorted(EXPERIENCE_LEVELS.items(), key=lambda item: -item[1]):
+        if level in text:
+            return rank
+    return 0
+
+
+def _workout_categories(request: schemas.PlanRequest) -> List[str]:
+    text = _text(request.workoutPreference, request.workoutType)
+    categories = [
+        category
+        for category, keywords in WORKOUT_CATEGORIES.items()
+        if any(keyword in text for keyword in keywords)
+    ]
+    return categories or ["strength", "cardio"]
+
+
+def build_workout_plan(
+    request: schemas.PlanRequest, weeks: int, rng: random.Random
+) -> List[dict]:
+    text = _text(request.workoutPreference, request.workoutType, request.workoutDetails)
+    equipment = {"none"} if "home" in text or "bodyweight" in text else {"none", "gym"}
+    categories = _workout_categories(request)
+    days_per_week = first_number(request.workoutDays, 3, 1, 7)
+    base_sets = 2 + _experience(request.activityLevel, request.workoutDetails)
+
+    pools = {}
+    for category in categories:
+        names = [
+            exercise["name"]
+            for exercise in EXERCISES
+            if exercise["category"] == category and exercise["equipment"] in equipment
+        ]
+        pools[category] = rng.sample(names, len(names))
+
+    plan = []
+    for week in range(1, weeks + 1):
+        # Add a set every four weeks and a few minutes of cardio each week.
+        sets = min(base_sets + (week - 1) // 4, 5)
+        minutes = min(20 + 5 * (week - 1), 45)
+        schedule = []
+        for session in range(days_per_week):
+            category = categories[session % len(categories)]
+            pool = pools[category]
+            offset = (week + session) * 2
+            exercises = [
+                pool[(offset + i) % len(pool)] for i in range(min(4, len(pool)))
+            ]
+            if category == "cardio":
+                items = [
+                    {"name": name, "duration": f"{minutes} min"}
+                    for name in exercises[:2]
+                ]
+            else:
+                reps = "8-10" if category == "strength" else "30 sec"
+                items = [
+                    {"name": name, "sets": sets, "reps": reps} for name in exercises
+                ]
+            schedule.append(
+                {"day": session + 1, "focus": category.title(), "exercises": items}
+            )
+        plan.append({"week": week, "schedule": schedule})
+    return plan
+
+
+def _yoga_style(request: schemas.PlanRequest) -> str:
+    text = _text(request.yogaType)
+    for style, keywords in YOGA_STYLES.items():
+        if any(keyword in text for keyword in keywords):
+            return style
+    return "hatha"
+
+
+def build_yoga_plan(
+    request: schemas.PlanRequest, weeks: int, rng: random.Random
+) -> List[dict]:
+    style = _yoga_style(request)
+    level = _experience(request.yogaExperience, request.experienceDetails)
+    suitable = [
+        pose["name"] for pose in YOGA_POSES if EXPERIENCE_LEVELS[pose["level"]] <= level
+    ]
+    focus = [pose["name"] for pose in YOGA_POSES if pose["style"] == style]
+    poses = rng.sample(suitable, len(suitable))
+    focus = [name for name in poses if name in focus] or poses
+
+    plan = []
+    for week in range(1, weeks + 1):
+        minutes = min(20 + 5 * (week - 1) // 2, 45 + 15 * level)
+        schedule = []
+        for session in range(3):
+            offset = (week * 3 + session) * 2
+            sequence = [focus[(offset + i) % len(focus)] for i in range(3)]
+            sequence += [poses[(offset + i) % len(poses)] for i in range(2)]
+            schedule.append(
+                {
+                    "day": session * 2 + 1,
+                    "style": style.title(),
+                    "duration": f"{minutes} min",
+                    "poses": list(dict.fromkeys(sequence)),
+                }
+            )
+        plan.append({"week": week, "schedule": schedule})
+    return plan
+
+
+def build_rule_plan(request: schemas.PlanRequest) -> dict:
+    # Seeded from the request so the same inputs always give the same plan.
+    seed = hashlib.sha256(request.model_dump_json().encode()).hexdigest()
+    rng = random.Random(seed)
+    days = plan_duration_days(request.timeGoal)
+    weeks = math.ceil(days / 7)
+    calories = plan_targets(request, days)["calories"]
+    with_yoga, with_workout = plan_includes(request)
+
+    plan = plan_header(request)
+    plan["daily_calories"] = int(round(calories.mean()))
+    plan["meal_plan"] = build_meal_plan(request, days, calories, rng)
+    if with_workout:
+        plan["workout_plan"] = build_workout_plan(request, weeks, rng)
+    if with_yoga:
+        plan["yoga_plan"] = build_yoga_plan(request, weeks, rng)
+    return plan
+
+
+def rule_plan_content(request: schemas.PlanRequest) -> str:
+    return json.dumps(build_rule_plan(request))
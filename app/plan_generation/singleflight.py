@@ -0,0 +1,193 @@
+import os
+import json
+import time
+import asyncio
+import hashlib
+from datetime import datetime, timedelta, timezone
+from typing import Awaitable, Callable, Optional
+from dotenv import load_dotenv
+from sqlalchemy import and_, or_, select, update, delete
+from sqlalchemy.sql import func
+from sqlalchemy.dialects.postgresql import insert
+from app import schemas
+from app.database import SessionLocal
+from app.metrics import registry, stage, stage_seconds
+from app.models import PlanFlight, UserGeneratedPlan
+from app.plan_generation.storage import new_generated_plan, plan_text
+
+load_dotenv()
+# A finished plan is handed to identical requests that arrive within this
+# window, which covers client retries after a proxy timeout.
+PLAN_DEDUPE_WINDOW_SECONDS = float(os.getenv("PLAN_DEDUPE_WINDOW_SECONDS", "30"))
+PLAN_FLIGHT_POLL_SECONDS = float(os.getenv("PLAN_FLIGHT_POLL_SECONDS", "0.5"))
+PLAN_FLIGHT_STALE_SECONDS = float(os.getenv("PLAN_FLIGHT_STALE_SECONDS", "180"))
+
+
+def flight_key(user_id: int, request: schemas.PlanRequest) -> str:
+    data = {
+        name: " ".join(value.lower().split()) if isinstance(value, str) else value
+        for name, value in request.model_dump().items()
+    }
+    canonical = json.dumps(
+        {"user_id": user_id, "request": data},
+        sort_keys=True,
+        separators=(",", ":"),
+    )
+    return hashlib.sha256(canonical.encode()).hexdigest()
+
+
+class PlanFlights:
+    # Identical requests in this process await the same task; other workers
+    # find the claimed row and wait for it to finish.
+
+    def __init__(
+        self, window_seconds: float, poll_seconds: float, stale_seconds: float
+    ):
+        self.window_seconds = window_seconds
+        self.poll_seconds = poll_seconds
+        self.stale_seconds = stale_seconds
+        self._local = {}
+        self.counters = {"leaders": 0, "local_joins": 0, "remote_joins": 0}
+
+    async def run(
+        self,
+        user_id: int,
+        request: schemas.PlanRequest,
+        produce: Callable[[], Awaitable[str]],
+    ) -> tuple:
+        key = flight_key(user_id, request)
+        task = self._local.get(key)
+        if task is None:
+            task = asyncio.create_task(self._run(key, user_id, request, produce))
+            self._local[key] = task
+            task.add_done_callback(lambda done: self._forget(key, done))
+        else:
+            self.counters["local_joins"] += 1
+        # Shielded so a caller that disconnects does not cancel the others.
+        return await asyncio.shield(task)
+
+    def stats(self) -> dict:
+        return {**self.counters, "in_flight": len(self._local)}
+
+    def _forget(self, key: str, task: asyncio.Task):
+        if self._local.get(key) is task:
+            del self._local[key]
+        if not task.cancelled():
+            task.exception()
+
+    def _ago(self, seconds: float):
+        return datetime.now(timezone.utc) - timedelta(seconds=seconds)
+
+    async def _run(self, key, user_id, request, produce) -> tuple:
+        deadline = time.monotonic() + self.stale_seconds
+        joined = False
+        while True:
+            claimed, plan_id = await self._claim(key, user_id)
+            if claimed:
+                break
+            if not joined:
+                joined = True
+                waited = time.perf_counter()
+                self.counters["remote_joins"] += 1
+            content = await self._load(plan_id) if plan_id is not None else None
+            if content is not None:
+                stage_seconds.observe(time.perf_counter() - waited, "plan.flight_wait")
+                return plan_id, content
+            if time.monotonic() > deadline:
+                raise TimeoutError("Timed out waiting for an identical plan request")
+            await asyncio.sleep(self.poll_seconds)
+
+        self.counters["leaders"] += 1
+        try:
+            content = await produce()
+        except BaseException:
+            await self._release(key)
+            raise
+        with stage("plan.store"):
+            return await self._store(key, user_id, request, content)
+
+    async def _claim(self, key: str, user_id: int) -> tuple:
+        stmt = insert(PlanFlight).values(key=key, user_id=user_id, status="running")
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[PlanFlight.key],
+            set_={"status": "running", "plan_id": None, "updated_at": func.now()},
+            # Take over failed and stale flights, and finished ones whose
+            # result is too old to hand out.
+            where=or_(
+                PlanFlight.status == "failed",
+                and_(
+                    PlanFlight.status == "running",
+                    PlanFlight.updated_at < self._ago(self.stale_seconds),
+                ),
+                and_(
+                    PlanFlight.status == "done",
+                    or_(
+                        PlanFlight.plan_id.is_(None),
+                        PlanFlight.updated_at < self._ago(self.window_seconds),
+                    ),
+                ),
+            ),
+        ).returning(PlanFlight.key)
+        async with SessionLocal() as db:
+            claimed = (await db.execute(stmt)).scalar() is not None
+            plan_id = None
+            if not claimed:
+                result = await db.execute(
+                    select(PlanFlight.plan_id).where(
+                        PlanFlight.key == key, PlanFlight.status == "done"
+                    )
+                )
+                plan_id = result.scalar()
+            await db.commit()
+            return claimed, plan_id
+
+    async def _release(self, key: str):
+        async with SessionLocal() as db:
+            await db.execute(
+                update(PlanFlight)
+                .where(PlanFlight.key == key)
+                .values(status="failed", updated_at=func.now())
+            )
+            await db.commit()
+
+    async def _store(self, key, user_id, request, content: str) -> tuple:
+        async with SessionLocal() as db:
+            generated_plan = new_generated_plan(user_id, request, content)
+            db.add(generated_plan)
+            await db.flush()
+            await db.execute(
+                update(PlanFlight)
+                .where(PlanFlight.key == key)
+                .values(status="done", plan_id=generated_plan.id, updated_at=func.now())
+            )
+            await db.execute(
+                delete(PlanFlight)
+                .where(
+                    PlanFlight.updated_at
+                    < self._ago(max(self.window_seconds, self.stale_seconds) * 2)
+                )
+                .execution_options(synchronize_session=False)
+            )
+            await db.commit()
+            return generated_plan.id, content
+
+    async def _load(self, plan_id: int) -> Optional[str]:
+        async with SessionLocal() as db:
+            result = await db.execute(
+                select(UserGeneratedPlan.generated_plan, UserGeneratedPlan.plan).where(
+                    UserGeneratedPlan.id == plan_id
+                )
+            )
+            row = result.first()
+        return plan_text(row.generated_plan, row.plan) if row is not None else None
+
+
+plan_flights = PlanFlights(
+    PLAN_DEDUPE_WINDOW_SECONDS, PLAN_FLIGHT_POLL_SECONDS, PLAN_FLIGHT_STALE_SECONDS
+)
+registry.collect_stats(
+    "plan_flights",
+    plan_flights.stats,
+    counters=("leaders", "local_joins", "remote_joins"),
+    help="Plan generation single-flight",
+)
@@ -0,0 +1,124 @@
+import re
+import json
+from typing import Optional
+from fastapi import HTTPException, status
+from sqlalchemy import String, literal
+from sqlalchemy.sql import func
+from sqlalchemy.dialects.postgresql import ARRAY, JSONB
+from app import schemas
+from app.models import UserGeneratedPlan
+from app.plan_generation.structured import CODE_FENCE
+from app.plan_generation.nutrition import check_meal_plan
+
+DAY_RANGE = re.compile(r"^(\d+)(?:-(\d+))?$")
+
+
+def parse_plan(content: str) -> Optional[dict]:
+    try:
+        data = json.loads(CODE_FENCE.sub("", content.strip()))
+    except json.JSONDecodeError:
+        return None
+    if not isinstance(data, dict):
+        return None
+
+    # Give every day a numeric "day" so ranges can be selected in SQL.
+    meal_plan = data.get("meal_plan")
+    if isinstance(meal_plan, dict):
+        meal_plan = list(meal_plan.values())
+    if isinstance(meal_plan, list):
+        data["meal_plan"] = [
+            {
+                **meals,
+                "day": meals["day"] if isinstance(meals.get("day"), int) else day,
+            }
+            for day, meals in enumerate(meal_plan, start=1)
+            if isinstance(meals, dict)
+        ]
+    return data
+
+
+def new_generated_plan(
+    user_id: int,
+    request: schemas.PlanRequest,
+    content: str,
+    parent: Optional[UserGeneratedPlan] = None,
+) -> UserGeneratedPlan:
+    return plan_row(user_id, request, parse_plan(content), content, parent)
+
+
+def plan_row(
+    user_id: int,
+    request: schemas.PlanRequest,
+    plan: Optional[dict],
+    content: Optional[str] = None,
+    parent: Optional[UserGeneratedPlan] = None,
+) -> UserGeneratedPlan:
+    if plan is not None and isinstance(plan.get("meal_plan"), list):
+        check = check_meal_plan(request, plan["meal_plan"])
+        if check["days_checked"]:
+            plan["nutrition_check"] = check
+    return UserGeneratedPlan(
+        user_id=user_id,
+        plan_type=request.planType,
+        plan=plan,
+        # The raw text is only kept when the model did not return JSON.
+        generated_plan=content if plan is None else None,
+        request=request.model_dump(),
+        parent_id=parent.id if parent is not None else None,
+        version=parent.version + 1 if parent is not None else 1,
+        goal_time=request.timeGoal,
+    )
+
+
+def plan_text(generated_plan: Optional[str], plan: Optional[dict]) -> str:
+    if generated_plan is not None:
+        return generated_plan
+    return json.dumps(plan)
+
+
+def parse_day_range(days: Optional[str]) -> Optional[tuple]:
+    if days is None:
+        return None
+    match = DAY_RANGE.match(days.strip())
+    if match is None:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="days must look like 1-7",
+        )
+    first = int(match.group(1))
+    last = int(match.group(2) or first)
+    if first < 1 or last < first:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="days must be an ascending range starting at 1",
+        )
+    return first, last
+
+
+def plan_days_column(first: int, last: int):
+    # Filter meal_plan inside Postgres so only the requested days leave the
+    # database.
+    selected = func.jsonb_path_query_array(
+        UserGeneratedPlan.plan["meal_plan"],
+        "$[*] ? (@.day >= $first && @.day <= $last)",
+        literal({"first": first, "last": last}, JSONB),
+    )
+    return func.jsonb_set(
+        UserGeneratedPlan.plan,
+        literal(["meal_plan"], ARRAY(String)),
+        func.coalesce(selected, literal([], JSONB)),
+        type_=JSONB,
+    )
+
+
+def select_days(plan: Optional[dict], first: int, last: int) -> Optional[dict]:
+    if plan is None or not isinstance(plan.get("meal_plan"), list):
+        return plan
+    return {
+        **plan,
+        "meal_plan": [
+            meals
+            for meals in plan["meal_plan"]
+            if isinstance(meals.get("day"), int) and first <= meals["day"] <= last
+        ],
+    }
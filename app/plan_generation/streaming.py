@@ -0,0 +1,87 @@
+import re
+import json
+from typing import List, Optional
+
+MEAL_PLAN_START = re.compile(r'"meal_plan"\s*:\s*([\[{])')
+
+
+def sse_event(event: str, data) -> str:
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+
+class MealPlanDayExtractor:
+    # Pulls complete day entries out of a partially received plan so they can
+    # be forwarded before the model has finished. Handles `meal_plan` given
+    # either as a list of day objects or as an object keyed by day.
+
+    def __init__(self):
+        self.buffer = ""
+        self.done = False
+        self._pos = 0
+        self._container: Optional[str] = None
+        self._depth = 0
+        self._in_string = False
+        self._escape = False
+        self._start: Optional[int] = None
+        self._key_start: Optional[int] = None
+        self._key: Optional[str] = None
+
+    def feed(self, text: str) -> List[dict]:
+        self.buffer += text
+        if self.done:
+            return []
+        if self._container is None:
+            match = MEAL_PLAN_START.search(self.buffer)
+            if match is None:
+                return []
+            self._container = match.group(1)
+            self._pos = match.end()
+        return self._scan()
+
+    def _scan(self) -> List[dict]:
+        days = []
+        buffer = self.buffer
+        for i in range(self._pos, len(buffer)):
+            char = buffer[i]
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif char == "\\":
+                    self._escape = True
+                elif char == '"':
+                    self._in_string = False
+                    if self._depth == 0 and self._key_start is not None:
+                        self._key = buffer[self._key_start : i]
+                        self._key_start = None
+                continue
+            if char == '"':
+                self._in_string = True
+                if self._depth == 0 and self._container == "{":
+                    self._key_start = i + 1
+            elif char in "{[":
+                if self._depth == 0:
+                    self._start = i
+                self._depth += 1
+            elif char in "}]":
+                if self._depth == 0:
+                    self.done = True
+                    self._pos = i + 1
+                    return days
+                self._depth -= 1
+                if self._depth == 0:
+                    day = self._decode(buffer[self._start : i + 1])
+                    if day is not None:
+                        days.append(day)
+        self._pos = len(buffer)
+        return days
+
+    def _decode(self, text: str) -> Optional[dict]:
+        try:
+            value = json.loads(text)
+        except json.JSONDecodeError:
+            return None
+        if not isinstance(value, dict):
+            return None
+        if self._container == "{" and self._key is not None:
+            return {"day": self._key, **value}
+        return value
@@ -0,0 +1,229 @@
+import re
+import json
+from typing import Any, List, Optional, Union
+from pydantic import BaseModel, ConfigDict, Field, ValidationError, model_validator
+from app.plan_generation.streaming import MealPlanDayExtractor
+
+CODE_FENCE = re.compile(r"^```(?:json)?\s*|\s*```$")
+FIRST_NUMBER = re.compile(r"\d+")
+WEEKLY_SECTIONS = ("workout_plan", "yoga_plan")
+
+
+class PlanOutputError(Exception):
+    pass
+
+
+def parse_number(value) -> Optional[int]:
+    if isinstance(value, int):
+        return value
+    match = FIRST_NUMBER.search(str(value or ""))
+    return int(match.group()) if match else None
+
+
+class DayPlan(BaseModel):
+    # Meals are free-form keys (Breakfast, Lunch, Snacks 1, ...).
+    model_config = ConfigDict(extra="allow")
+
+    day: int = Field(ge=1)
+
+    @model_validator(mode="before")
+    @classmethod
+    def _day_number(cls, data):
+        if isinstance(data, dict) and not isinstance(data.get("day"), int):
+            data = {**data, "day": parse_number(data.get("day"))}
+        return data
+
+    @model_validator(mode="after")
+    def _has_meals(self):
+        meals = self.model_extra or {}
+        if not meals or not all(
+            isinstance(meal, (str, dict, list)) and meal for meal in meals.values()
+        ):
+            raise ValueError(f"day {self.day} has no meals")
+        return self
+
+
+class WeekPlan(BaseModel):
+    week: int = Field(ge=1)
+    schedule: Union[list, dict, str]
+
+
+def _weeks(value) -> Any:
+    # Models return weekly sections as lists, lists of {"week": ...} or
+    # objects keyed by "Week 1"; bring them all to [{"week", "schedule"}].
+    if isinstance(value, dict):
+        value = [
+            {"week": parse_number(key) or index, "schedule": schedule}
+            for index, (key, schedule) in enumerate(value.items(), start=1)
+        ]
+    if not isinstance(value, list):
+        return value
+    weeks = []
+    for index, item in enumerate(value, start=1):
+        if isinstance(item, dict) and "week" in item:
+            rest = {key: val for key, val in item.items() if key != "week"}
+            schedule = rest["schedule"] if set(rest) == {"schedule"} else rest
+            weeks.append(
+                {"week": parse_number(item["week"]) or index, "schedule": schedule}
+            )
+        else:
+            weeks.append({"week": index, "schedule": item})
+    return weeks
+
+
+class GeneratedPlan(BaseModel):
+    model_config = ConfigDict(extra="allow")
+
+    # Header fields (planType, duration, ...) pass through as extras.
+    meal_plan: List[DayPlan] = Field(min_length=1)
+    workout_plan: Optional[List[WeekPlan]] = None
+    yoga_plan: Optional[List[WeekPlan]] = None
+
+    @model_validator(mode="before")
+    @classmethod
+    def _normalize(cls, data):
+        if not isinstance(data, dict):
+            return data
+        data = dict(data)
+        # Some models capitalise section names (e.g. "Yoga_Plan").
+        for key in list(data):
+            if key.lower() in ("meal_plan", *WEEKLY_SECTIONS) and key != key.lower():
+                data[key.lower()] = data.pop(key)
+        if isinstance(data.get("meal_plan"), dict):
+            data["meal_plan"] = [
+                {**meals, "day": day} if isinstance(meals, dict) else meals
+                for day, meals in data["meal_plan"].items()
+            ]
+        for section in WEEKLY_SECTIONS:
+            if section in data:
+                data[section] = _weeks(data[section])
+        return data
+
+
+def repair_json(text: str) -> str:
+    # Cuts a truncated document back to the last complete value and closes
+    # whatever was still open.
+    stack = []
+    in_string = escape = False
+    safe, safe_stack = 0, []
+    for i, char in enumerate(text):
+        if in_string:
+            if escape:
+                escape = False
+            elif char == "\\":
+                escape = True
+            elif char == '"':
+                in_string = False
+            continue
+        if char == '"':
+            in_string = True
+        elif char in "{[":
+            stack.append("}" if char == "{" else "]")
+        elif char in "}]" and stack:
+            stack.pop()
+            safe, safe_stack = i + 1, list(stack)
+    if not stack and not in_string:
+        return text
+    return text[:safe].rstrip().rstrip(",") + "".join(reversed(safe_stack))
+
+
+def load_plan_json(content: str) -> dict:
+    text = CODE_FENCE.sub("", content.strip())
+    try:
+        data = json.loads(text)
+    except json.JSONDecodeError:
+        try:
+            data = json.loads(repair_json(text))
+        except json.JSONDecodeError as e:
+            raise PlanOutputError(f"Plan is not valid JSON: {e}")
+    if not isinstance(data, dict):
+        raise PlanOutputError("Plan is not a JSON object")
+    return data
+
+
+def validate_day(day: dict, expected: int) -> dict:
+    if not isinstance(day.get("day"), int) and parse_number(day.get("day")) is None:
+        # Unnumbered days are numbered in order.
+        day = {**day, "day": expected}
+    try:
+        entry = DayPlan.model_validate(day)
+    except ValidationError as e:
+        raise PlanOutputError(f"Day {expected} is malformed: {e.errors()[0]['msg']}")
+    if entry.day != expected:
+        raise PlanOutputError(f"Expected day {expected}, got day {entry.day}")
+    return entry.model_dump()
+
+
+class PlanStreamParser:
+    # Validates a plan while it streams in: each meal_plan day is checked as
+    # soon as it is complete, so a diverging generation can be abandoned
+    # without paying for the rest of the completion.
+
+    def __init__(self, expected_days: int, sections: List[str]):
+        self.expected_days = expected_days
+        self.sections = sections
+        self.days: List[dict] = []
+        self.overflowed = False
+        self._extractor = MealPlanDayExtractor()
+        self._started = False
+
+    @property
+    def content(self) -> str:
+        return self._extractor.buffer
+
+    def feed(self, text: str) -> List[dict]:
+        days = self._extractor.feed(text)
+        if not self._started:
+            self._check_start()
+        accepted = []
+        for day in days:
+            if self.overflowed:
+                break
+            if len(self.days) >= self.expected_days:
+                # More days than the plan lasts; the rest is not needed.
+                self.overflowed = True
+                break
+            entry = validate_day(day, len(self.days) + 1)
+            self.days.append(entry)
+            accepted.append(entry)
+        return accepted
+
+    def _check_start(self):
+        text = self.content.lstrip()
+        brace = text.find("{")
+        if brace == -1 and len(text) < 16:
+            return
+        if brace == -1 or CODE_FENCE.sub("", text[:brace]).strip():
+            raise PlanOutputError("Plan does not start with a JSON object")
+        self._started = True
+
+    def finish(self) -> tuple:
+        # Returns the validated plan and, for each section that was cut
+        # short, the first day it still has to be completed from.
+        data = load_plan_json(self.content)
+        if self.days:
+            data["meal_plan"] = self.days
+        try:
+            plan = GeneratedPlan.model_validate(data)
+        except ValidationError as e:
+            raise PlanOutputError(f"Plan does not match the plan schema: {e}")
+        plan = plan.model_dump(exclude_none=True)
+        plan["meal_plan"] = plan["meal_plan"][: self.expected_days]
+        for section in WEEKLY_SECTIONS:
+            if section in plan and section not in self.sections:
+                del plan[section]
+        return plan, self.missing(plan)
+
+    def missing(self, plan: dict) -> dict:
+        missing = {}
+        if len(plan["meal_plan"]) < self.expected_days:
+            missing["meal_plan"] = len(plan["meal_plan"]) + 1
+        weeks = -(-self.expected_days // 7)
+        for section in WEEKLY_SECTIONS:
+            if section not in self.sections:
+                continue
+            have = {week["week"] for week in plan.get(section, [])}
+            absent = [week for week in range(1, weeks + 1) if week not in have]
+            if absent:
+                missing[section] = (absent[0] - 1) * 7 + 1
+        return missing
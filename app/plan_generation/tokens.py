@@ -0,0 +1,171 @@
+import os
+import math
+import time
+import logging
+from typing import List
+from dotenv import load_dotenv
+from langchain_core.callbacks import AsyncCallbackHandler
+from app import schemas
+from app.plan_generation.chunked import plan_duration_days, plan_sections
+from app.plan_generation.rules import first_number
+from app.metrics import (
+    llm_call_errors,
+    llm_call_seconds,
+    llm_completion_tokens,
+    llm_tokens,
+)
+
+load_dotenv()
+PLAN_MAX_COMPLETION_TOKENS = int(os.getenv("PLAN_MAX_COMPLETION_TOKENS", "16384"))
+PLAN_CONTEXT_TOKENS = int(os.getenv("PLAN_CONTEXT_TOKENS", "128000"))
+PLAN_MAX_TOKENS_MARGIN = float(os.getenv("PLAN_MAX_TOKENS_MARGIN", "1.25"))
+
+# Rough English/JSON average; close enough to size max_tokens without
+# shipping a tokenizer.
+CHARS_PER_TOKEN = 4
+TOKENS_PER_MESSAGE = 4
+HEADER_TOKENS = 120
+TOKENS_PER_DAY = 12
+TOKENS_PER_MEAL = 28
+TOKENS_PER_WEEK = 320
+MIN_COMPLETION_TOKENS = 512
+logger = logging.getLogger(__name__)
+
+
+def estimate_tokens(text: str) -> int:
+    return math.ceil(len(text) / CHARS_PER_TOKEN)
+
+
+def estimate_prompt_tokens(messages) -> int:
+    if isinstance(messages, str):
+        return estimate_tokens(messages)
+    return sum(
+        estimate_tokens(str(message.content)) + TOKENS_PER_MESSAGE
+        for message in messages
+    )
+
+
+def completion_budget(
+    request: schemas.PlanRequest, days: int = None, sections: List[str] = None
+) -> int:
+    days = days or plan_duration_days(request.timeGoal)
+    sections = sections or plan_sections(request)
+    meals = first_number(request.mealPreference, 3, 1, 6)
+    tokens = HEADER_TOKENS
+    if "meal_plan" in sections:
+        tokens += days * (TOKENS_PER_DAY + meals * TOKENS_PER_MEAL)
+    weekly = [section for section in sections if section != "meal_plan"]
+    tokens += math.ceil(days / 7) * TOKENS_PER_WEEK * len(weekly)
+    tokens = int(tokens * PLAN_MAX_TOKENS_MARGIN)
+    return max(MIN_COMPLETION_TOKENS, min(PLAN_MAX_COMPLETION_TOKENS, tokens))
+
+
+def max_tokens_for(
+    request: schemas.PlanRequest,
+    prompt_tokens: int,
+    days: int = None,
+    sections: List[str] = None,
+) -> int:
+    budget = completion_budget(request, days, sections)
+    return max(1, min(budget, PLAN_CONTEXT_TOKENS - prompt_tokens))
+
+
+class LLMUsage(AsyncCallbackHandler):
+    # Records prompt and completion tokens and latency of every model call,
+    # grouped by the plan_type passed in the run metadata.
+
+    def __init__(self):
+        self._runs = {}
+        self._stats = {}
+
+    def _entry(self, plan_type: str) -> dict:
+        return self._stats.setdefault(
+            plan_type,
+            {
+                "calls": 0,
+                "errors": 0,
+                "prompt_tokens": 0,
+                "cached_prompt_tokens": 0,
+                "completion_tokens": 0,
+                "estimated_prompt_tokens": 0,
+                "max_tokens": 0,
+                "latency_seconds": 0.0,
+                "max_latency_seconds": 0.0,
+            },
+        )
+
+    async def on_chat_model_start(
+        self, serialized, messages, *, run_id, metadata=None, **kwargs
+    ):
+        metadata = metadata or {}
+        self._runs[run_id] = (
+            metadata.get("plan_type", "unknown"),
+            metadata.get("max_tokens", 0),
+            estimate_prompt_tokens(messages[0]),
+            time.perf_counter(),
+        )
+
+    async def on_llm_end(self, response, *, run_id, **kwargs):
+        run = self._runs.pop(run_id, None)
+        if run is None:
+            return
+        plan_type, max_tokens, estimated, started = run
+        latency = time.perf_counter() - started
+        usage = (response.llm_output or {}).get("token_usage") or {}
+        text = "".join(
+            generation.text
+            for generations in response.generations
+            for generation in generations
+        )
+        # Streaming and local models report no usage, so fall back to the
+        # estimate for them.
+        prompt_tokens = usage.get("prompt_tokens") or estimated
+        completion_tokens = usage.get("completion_tokens") or estimate_tokens(text)
+        cached = (usage.get("prompt_tokens_details") or {}).get("cached_tokens") or 0
+
+        entry = self._entry(plan_type)
+        entry["calls"] += 1
+        entry["prompt_tokens"] += prompt_tokens
+        entry["cached_prompt_tokens"] += cached
+        entry["completion_tokens"] += completion_tokens
+        entry["estimated_prompt_tokens"] += estimated
+        entry["max_tokens"] += max_tokens
+        entry["latency_seconds"] += latency
+        entry["max_latency_seconds"] = max(entry["max_latency_seconds"], latency)
+        llm_call_seconds.observe(latency, plan_type)
+        llm_completion_tokens.observe(completion_tokens, plan_type)
+        llm_tokens.inc(plan_type, "prompt", amount=prompt_tokens)
+        llm_tokens.inc(plan_type, "cached_prompt", amount=cached)
+        llm_tokens.inc(plan_type, "completion", amount=completion_tokens)
+        logger.info(
+            "LLM call plan_type=%s prompt_tokens=%s cached=%s completion_tokens=%s "
+            "max_tokens=%s latency=%.2fs",
+            plan_type,
+            prompt_tokens,
+            cached,
+            completion_tokens,
+            max_tokens,
+            latency,
+        )
+
+    async def on_llm_error(self, error, *, run_id, **kwargs):
+        run = self._runs.pop(run_id, None)
+        if run is not None:
+            self._entry(run[0])["errors"] += 1
+            llm_call_errors.inc(run[0])
+
+    def stats(self) -> dict:
+        stats = {}
+        for plan_type, entry in self._stats.items():
+            calls = entry["calls"] or 1
+            stats[plan_type] = {
+                **entry,
+                "latency_seconds": round(entry["latency_seconds"], 3),
+                "max_latency_seconds": round(entry["max_latency_seconds"], 3),
+                "mean_latency_seconds": round(entry["latency_seconds"] / calls, 3),
+                "mean_completion_tokens": round(entry["completion_tokens"] / calls),
+            }
+        return stats
+
+
+llm_usage = LLMUsage()
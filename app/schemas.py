@@ -1,6 +1,6 @@
 from pydantic import BaseModel, EmailStr
 from datetime import datetime
-from typing import Optional
+from typing import Any, Dict, List, Literal, Optional
 
 
 class CreateUser(BaseModel):
@@ -18,6 +18,14 @@ class UpdateUser(BaseModel):
     role: Optional[str] = None
 
 
+class BulkUpdateUser(UpdateUser):
+    id: int
+
+
+class BulkDeleteUser(BaseModel):
+    id: int
+
+
 class UserOut(BaseModel):
     id: int
     name: str
@@ -30,6 +38,11 @@ class UserOut(BaseModel):
         from_attributes = True
 
 
+class UserPage(BaseModel):
+    items: List[UserOut]
+    next_cursor: Optional[str] = None
+
+
 class UserResponseWithPassword(BaseModel):
     user: UserOut
     password: Optional[str] = None
@@ -38,6 +51,10 @@ class UserResponseWithPassword(BaseModel):
         orm_mode = True
 
 
+class RefreshTokenRequest(BaseModel):
+    refresh_token: str
+
+
 class PlanRequest(BaseModel):
     gender: str
     ageGroup: str
@@ -64,6 +81,13 @@ class PlanRequest(BaseModel):
     workoutDays: Optional[str] = None
     medicalConditions: Optional[str] = None
     medicalDetails: Optional[str] = None
+    engine: Optional[Literal["llm", "rules"]] = None
+
+
+class PlanRegenerateRequest(BaseModel):
+    changes: Dict[str, Any] = {}
+    sections: Optional[List[Literal["meal_plan", "workout_plan", "yoga_plan"]]] = None
+    days: Optional[str] = None
 
 
 class UserGeneratedPlanResponse(BaseModel):
@@ -77,6 +101,21 @@ class UserGeneratedPlanResponse(BaseModel):
         orm_mode = True
 
 
+class UserGeneratedPlanSummary(BaseModel):
+    id: int
+    plan_type: str
+    goal_time: Optional[str]
+    created_at: datetime
+
+    class Config:
+        from_attributes = True
+
+
+class UserGeneratedPlanPage(BaseModel):
+    items: List[UserGeneratedPlanSummary]
+    next_cursor: Optional[str] = None
+
+
 class FormRequest(BaseModel):
     gender: str
     ageGroup: str
@@ -103,3 +142,49 @@ class FormRequest(BaseModel):
     workoutDays: Optional[str] = None
     medicalConditions: Optional[str] = None
     medicalDetails: Optional[str] = None
+
+
+class PlanSelection(BaseModel):
+    plan_type: Optional[str] = None
+    goal_time: str
+    created_at: datetime
+
+
+class ActivityProfile(BaseModel):
+    plan_type: Optional[str] = None
+    yoga_experience: Optional[str] = None
+    yoga_type: Optional[str] = None
+    workout_preference: Optional[str] = None
+    workout_days: Optional[str] = None
+    activity_level: Optional[str] = None
+    created_at: datetime
+
+
+class MealProfile(BaseModel):
+    plan_type: Optional[str] = None
+    diet_type: str
+    meal_preference: str
+    diet_restrictions: str
+    key_goals: str
+    medical_restrictions: Optional[str] = None
+    created_at: datetime
+
+
+class GeneratedPlanVersion(UserGeneratedPlanSummary):
+    version: int
+
+
+class UserProfile(UserOut):
+    gender: Optional[str] = None
+    age_group: Optional[str] = None
+    weight: Optional[float] = None
+    weight_unit: Optional[str] = None
+    target_weight: Optional[float] = None
+    target_weight_unit: Optional[str] = None
+    height: Optional[float] = None
+    target_height_unit: Optional[str] = None
+    created_at: datetime
+    plans: List[PlanSelection] = []
+    activities: List[ActivityProfile] = []
+    meals: List[MealProfile] = []
+    generated_plans: List[GeneratedPlanVersion] = []
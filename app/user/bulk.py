@@ -0,0 +1,319 @@
+import os
+import io
+import csv
+import json
+from typing import Iterator, List, Optional
+from dotenv import load_dotenv
+from pydantic import ValidationError
+from sqlalchemy import bindparam, delete, select, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.dialects.postgresql import insert
+from fastapi import status, HTTPException, APIRouter, Depends, Request
+from fastapi.responses import StreamingResponse
+from app import models, schemas
+from app.database import SessionLocal
+from app.auth.oauth import admin_required, user_cache
+from app.auth.tokens import revoke_user_tokens
+from app.auth.utils import bulk_password_hasher, BULK_BCRYPT_ROUNDS
+from app.user.user import generate_password
+
+load_dotenv()
+USER_BULK_BATCH_SIZE = int(os.getenv("USER_BULK_BATCH_SIZE", "1000"))
+USER_BULK_MAX_ROWS = int(os.getenv("USER_BULK_MAX_ROWS", "100000"))
+
+router = APIRouter(tags=["User"])
+users = models.User.__table__
+
+
+def _rows(body: bytes, content_type: str) -> Iterator[Optional[dict]]:
+    # NDJSON by default; CSV when sent as text/csv with a header row.
+    text = body.decode("utf-8-sig")
+    if content_type.startswith("text/csv"):
+        for row in csv.DictReader(io.StringIO(text)):
+            yield {
+                key.strip(): value
+                for key, value in row.items()
+                if key is not None and value not in (None, "")
+            }
+        return
+    for line in text.splitlines():
+        if not line.strip():
+            continue
+        try:
+            yield json.loads(line)
+        except ValueError:
+            yield None
+
+
+def _batches(rows: Iterator[Optional[dict]], model) -> Iterator[list]:
+    # Each entry is (row number, validated row or None, error or None).
+    batch = []
+    for number, row in enumerate(rows, start=1):
+        if number > USER_BULK_MAX_ROWS:
+            batch.append((number, None, f"Only {USER_BULK_MAX_ROWS} rows are allowed"))
+            break
+        if row is None:
+            batch.append((number, None, "Row is not valid JSON"))
+        else:
+            try:
+                batch.append((number, model.model_validate(row), None))
+            except ValidationError as e:
+                error = e.errors()[0]
+                field = ".".join(str(part) for part in error["loc"])
+                batch.append((number, None, f"{field}: {error['msg']}"))
+        if len(batch) >= USER_BULK_BATCH_SIZE:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def _line(number: int, result: str, **fields) -> str:
+    return json.dumps({"row": number, "status": result, **fields}) + "\n"
+
+
+async def _create_batch(batch: list) -> List[str]:
+    valid = [(number, user) for number, user, _ in batch if user is not None]
+    passwords = [generate_password() for _ in valid]
+    hashes = await bulk_password_hasher.hash_many(passwords, BULK_BCRYPT_ROUNDS)
+    created = {}
+    if valid:
+        # Rows that clash with an existing email or username (or an earlier
+        # row of the batch) are skipped instead of failing the batch.
+        stmt = (
+            insert(models.User)
+            .values(
+                [
+                    {**user.model_dump(), "password": hashed}
+                    for (_, user), hashed in zip(valid, hashes)
+                ]
+            )
+            .on_conflict_do_nothing()
+            .returning(models.User.id, models.User.email, models.User.username)
+        )
+        async with SessionLocal() as db:
+            result = await db.execute(stmt)
+            created = {(row.email, row.username): row.id for row in result}
+            await db.commit()
+
+    lines = []
+    passwords = dict(zip((number for number, _ in valid), passwords))
+    for number, user, error in batch:
+        if user is None:
+            lines.append(_line(number, "invalid", detail=error))
+            continue
+        user_id = created.pop((user.email, user.username), None)
+        if user_id is None:
+            lines.append(
+                _line(
+                    number,
+                    "conflict",
+                    detail="A user with this email or username already exists",
+                )
+            )
+        else:
+            user_out = {"id": user_id, **user.model_dump()}
+            lines.append(
+                _line(number, "created", user=user_out, password=passwords[number])
+            )
+    return lines
+
+
+def _update_stmt(fields: tuple):
+    # Bind names must differ from the column names they set.
+    return (
+        update(users)
+        .where(users.c.id == bindparam("user_id"))
+        .values({field: bindparam(f"new_{field}") for field in fields})
+    )
+
+
+def _update_params(user_id: int, values: dict) -> dict:
+    return {"user_id": user_id, **{f"new_{key}": val for key, val in values.items()}}
+
+
+def _password_changes(changes: list, failed: set) -> List[int]:
+    # A new password ends the user's sessions.
+    return [
+        user_id
+        for number, user_id, values in changes
+        if "password" in values and number not in failed
+    ]
+
+
+async def _update_batch(batch: list, admin: schemas.UserOut) -> List[str]:
+    valid = [(number, user) for number, user, _ in batch if user is not None]
+    results = {number: ("invalid", error) for number, user, error in batch if error}
+    async with SessionLocal() as db:
+        result = await db.execute(
+            select(models.User.id, models.User.role).where(
+                models.User.id.in_({user.id for _, user in valid})
+            )
+        )
+        roles = dict(result.all())
+
+        allowed = []
+        for number, user in valid:
+            if user.id not in roles:
+                results[number] = (
+                    "not_found",
+                    f"User with the id '{user.id}' not found",
+                )
+            elif roles[user.id] == "admin" and user.id != admin.id:
+                results[number] = ("forbidden", "Admins cannot edit other admins")
+            else:
+                allowed.append((number, user))
+
+        with_password = [user.password for _, user in allowed if user.password]
+        hashes = iter(
+            await bulk_password_hasher.hash_many(with_password, BULK_BCRYPT_ROUNDS)
+        )
+        changes = []
+        for number, user in allowed:
+            values = user.model_dump(exclude={"id"}, exclude_none=True)
+            values.pop("password", None)
+            if user.password:
+                values["password"] = next(hashes)
+            changes.append((number, user.id, values))
+
+        # Rows that set the same columns share one executemany.
+        groups = {}
+        for number, user_id, values in changes:
+            if values:
+                groups.setdefault(tuple(sorted(values)), []).append((user_id, values))
+        conn = await db.connection()
+        failed = set()
+        try:
+            for fields, rows in groups.items():
+                await conn.execute(
+                    _update_stmt(fields),
+                    [_update_params(user_id, values) for user_id, values in rows],
+                )
+            await revoke_user_tokens(db, *_password_changes(changes, failed))
+            await db.commit()
+        except IntegrityError:
+            # A duplicate email or username: redo the batch row by row so
+            # only the offending rows fail.
+            await db.rollback()
+            conn = await db.connection()
+            failed = set()
+            for number, user_id, values in changes:
+                if not values:
+                    continue
+                try:
+                    async with db.begin_nested():
+                        await conn.execute(
+                            _update_stmt(tuple(sorted(values))),
+                            _update_params(user_id, values),
+                        )
+                except IntegrityError:
+                    failed.add(number)
+            await revoke_user_tokens(db, *_password_changes(changes, failed))
+            await db.commit()
+
+    for number, user_id, values in changes:
+        if number in failed:
+            results[number] = (
+                "conflict",
+                "A user with this email or username already exists",
+            )
+        else:
+            user_cache.invalidate(user_id)
+            results[number] = ("updated", None)
+    return [
+        (
+            _line(number, result)
+            if detail is None
+            else _line(number, result, detail=detail)
+        )
+        for number, (result, detail) in sorted(results.items())
+    ]
+
+
+async def _delete_batch(batch: list) -> List[str]:
+    valid = [(number, user) for number, user, _ in batch if user is not None]
+    results = {number: ("invalid", error) for number, user, error in batch if error}
+    async with SessionLocal() as db:
+        result = await db.execute(
+            select(models.User.id, models.User.role).where(
+                models.User.id.in_({user.id for _, user in valid})
+            )
+        )
+        roles = dict(result.all())
+        ids = {
+            user.id
+            for _, user in valid
+            if user.id in roles and roles[user.id] != "admin"
+        }
+        deleted = set()
+        if ids:
+            result = await db.execute(
+                delete(models.User)
+                .where(models.User.id.in_(ids))
+                .returning(models.User.id)
+                .execution_options(synchronize_session=False)
+            )
+            deleted = set(result.scalars().all())
+            await db.commit()
+
+    for number, user in valid:
+        if user.id in deleted:
+            deleted.discard(user.id)
+            user_cache.invalidate(user.id)
+            results[number] = ("deleted", None)
+        elif roles.get(user.id) == "admin":
+            results[number] = ("forbidden", "Admins cannot delete other admins")
+        else:
+            results[number] = ("not_found", f"User with the id '{user.id}' not found")
+    return [
+        (
+            _line(number, result)
+            if detail is None
+            else _line(number, result, detail=detail)
+        )
+        for number, (result, detail) in sorted(results.items())
+    ]
+
+
+async def _bulk_response(request: Request, model, apply) -> StreamingResponse:
+    content_type = request.headers.get("content-type", "")
+    if not content_type.startswith(
+        ("application/x-ndjson", "application/jsonl", "text/csv")
+    ):
+        raise HTTPException(
+            status_code=status.HTTP_415_UNSUPPORTED_MEDIA_TYPE,
+            detail="Send rows as application/x-ndjson or text/csv",
+        )
+    # The upload is read before responding: the response is streamed while
+    # the batches run, and the request body cannot be read at the same time.
+    body = await request.body()
+
+    async def results():
+        for batch in _batches(_rows(body, content_type), model):
+            for line in await apply(batch):
+                yield line
+
+    return StreamingResponse(results(), media_type="application/x-ndjson")
+
+
+@router.post("/users/bulk", status_code=status.HTTP_200_OK)
+async def bulk_create_users(
+    request: Request, admin: schemas.UserOut = Depends(admin_required)
+):
+    return await _bulk_response(request, schemas.CreateUser, _create_batch)
+
+
+@router.patch("/users/bulk", status_code=status.HTTP_200_OK)
+async def bulk_update_users(
+    request: Request, admin: schemas.UserOut = Depends(admin_required)
+):
+    return await _bulk_response(
+        request, schemas.BulkUpdateUser, lambda batch: _update_batch(batch, admin)
+    )
+
+
+@router.post("/users/bulk/delete", status_code=status.HTTP_200_OK)
+async def bulk_delete_users(
+    request: Request, admin: schemas.UserOut = Depends(admin_required)
+):
+    return await _bulk_response(request, schemas.BulkDeleteUser, _delete_batch)
@@ -0,0 +1,39 @@
+from sqlalchemy import select
+from sqlalchemy.orm import defer, joinedload, load_only, selectinload
+from app.models import Activity, Meal, User, UserActivity, UserGeneratedPlan, UserPlan
+
+# Named eager-loading strategies for the User aggregate. Collections are
+# loaded with one SELECT ... IN each and their plan types joined in, so a
+# strategy costs the same number of statements however many rows it loads.
+ACCOUNT = (defer(User.password),)
+ONBOARDING = ACCOUNT + (
+    selectinload(User.plan).joinedload(UserPlan.plan_type),
+    selectinload(User.activity)
+    .joinedload(UserActivity.activity)
+    .joinedload(Activity.plan_type),
+    selectinload(User.meal).joinedload(Meal.plan_type),
+)
+PROFILE = ONBOARDING + (
+    # Summaries only; the plan bodies are the heavy columns.
+    selectinload(User.generated_plans).options(
+        load_only(
+            UserGeneratedPlan.id,
+            UserGeneratedPlan.plan_type,
+            UserGeneratedPlan.version,
+            UserGeneratedPlan.goal_time,
+            UserGeneratedPlan.created_at,
+        )
+    ),
+)
+
+USER_LOADING_STRATEGIES = {
+    "account": ACCOUNT,
+    "onboarding": ONBOARDING,
+    "profile": PROFILE,
+}
+# Statements each strategy issues for one user.
+STRATEGY_STATEMENTS = {"account": 1, "onboarding": 4, "profile": 5}
+
+
+def user_query(strategy: str):
+    return select(User).options(*USER_LOADING_STRATEGIES[strategy])
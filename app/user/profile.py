@@ -0,0 +1,110 @@
+from app import schemas
+from app.database import get_db
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.auth.oauth import admin_required, get_current_user
+from app.user.loading import user_query
+from app.models import User
+from fastapi import status, HTTPException, Depends, APIRouter
+
+router = APIRouter(tags=["User"])
+
+
+def _plan_name(plan_type) -> str:
+    return plan_type.plan_name if plan_type is not None else None
+
+
+def profile_of(user: User) -> dict:
+    return {
+        **schemas.UserOut.model_validate(user).model_dump(),
+        "gender": user.gender,
+        "age_group": user.age_group,
+        "weight": user.weight,
+        "weight_unit": user.weight_unit,
+        "target_weight": user.target_weight,
+        "target_weight_unit": user.target_weight_unit,
+        "height": user.height,
+        "target_height_unit": user.target_height_unit,
+        "created_at": user.created_at,
+        "plans": [
+            {
+                "plan_type": _plan_name(plan.plan_type),
+                "goal_time": plan.goal_time,
+                "created_at": plan.created_at,
+            }
+            for plan in sorted(user.plan, key=lambda plan: plan.created_at)
+        ],
+        "activities": [
+            {
+                "plan_type": _plan_name(entry.activity.plan_type),
+                "yoga_experience": entry.activity.yoga_experience,
+                "yoga_type": entry.activity.yoga_type,
+                "workout_preference": entry.activity.workout_preference,
+                "workout_days": entry.activity.workout_days,
+                "activity_level": entry.activity.activity_level,
+                "created_at": entry.created_at,
+            }
+            for entry in sorted(user.activity, key=lambda entry: entry.created_at)
+        ],
+        "meals": [
+            {
+                "plan_type": _plan_name(meal.plan_type),
+                "diet_type": meal.diet_type,
+                "meal_preference": meal.meal_preference,
+                "diet_restrictions": meal.diet_restrictions,
+                "key_goals": meal.key_goals,
+                "medical_restrictions": meal.medical_restrictions,
+                "created_at": meal.created_at,
+            }
+            for meal in user.meal
+        ],
+        "generated_plans": [
+            {
+                "id": plan.id,
+                "plan_type": plan.plan_type,
+                "version": plan.version,
+                "goal_time": plan.goal_time,
+                "created_at": plan.created_at,
+            }
+            for plan in sorted(
+                user.generated_plans,
+                key=lambda plan: (plan.created_at, plan.id),
+                reverse=True,
+            )
+        ],
+    }
+
+
+async def load_profile(db: AsyncSession, user_id: int) -> dict:
+    result = await db.execute(user_query("profile").where(User.id == user_id))
+    user = result.scalars().first()
+    if user is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"User with the id '{user_id}' not found",
+        )
+    return profile_of(user)
+
+
+@router.get(
+    "/users/me/profile",
+    response_model=schemas.UserProfile,
+    status_code=status.HTTP_200_OK,
+)
+async def get_my_profile(
+    db: AsyncSession = Depends(get_db),
+    current_user: schemas.UserOut = Depends(get_current_user),
+):
+    return await load_profile(db, current_user.id)
+
+
+@router.get(
+    "/users/{id}/profile",
+    response_model=schemas.UserProfile,
+    status_code=status.HTTP_200_OK,
+)
+async def get_user_profile(
+    id: int,
+    db: AsyncSession = Depends(get_db),
+    admin: schemas.UserOut = Depends(admin_required),
+):
+    return await load_profile(db, id)
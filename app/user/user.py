@@ -1,34 +1,50 @@
 import string
 import secrets
-from typing import List
-from app.models import User
+from typing import List, Union
 from app import models, schemas
 from app.database import get_db
-from sqlalchemy.orm import Session
-from app.auth.utils import hash_password
-from app.auth.oauth import admin_required
+from app.pagination import PageParams, paginate, page_of
+from sqlalchemy import select, delete
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.auth.utils import password_hasher
+from app.auth.oauth import admin_required, user_cache
+from app.auth.tokens import revoke_user_tokens
 from fastapi import Response, status, HTTPException, Depends, APIRouter
 
 router = APIRouter(tags=["User"])
 
 
+def generate_password() -> str:
+    alphabet = string.ascii_letters + string.digits
+    return "".join(secrets.choice(alphabet) for _ in range(8))
+
+
 @router.get(
-    "/users", response_model=List[schemas.UserOut], status_code=status.HTTP_200_OK
+    "/users",
+    response_model=Union[List[schemas.UserOut], schemas.UserPage],
+    status_code=status.HTTP_200_OK,
 )
-def get_users(
-    db: Session = Depends(get_db),
-    admin: User = Depends(admin_required),
+async def get_users(
+    page: PageParams = Depends(),
+    db: AsyncSession = Depends(get_db),
+    admin: schemas.UserOut = Depends(admin_required),
 ):
-    users = db.query(models.User).all()
-    if users is None:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND, detail="Users not found"
-        )
     if not admin:
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN, detail="Only admin can get users"
         )
-    return users
+    stmt = select(
+        models.User.id,
+        models.User.name,
+        models.User.email,
+        models.User.username,
+        models.User.role,
+        models.User.created_at,
+    )
+    result = await db.execute(
+        paginate(stmt, models.User.created_at, models.User.id, page)
+    )
+    return page_of(result.all(), page)
 
 
 @router.post(
@@ -36,30 +52,30 @@ def get_users(
     status_code=status.HTTP_201_CREATED,
     response_model=schemas.UserResponseWithPassword,
 )
-def create_user(
+async def create_user(
     user: schemas.CreateUser,
-    db: Session = Depends(get_db),
-    admin: User = Depends(admin_required),
+    db: AsyncSession = Depends(get_db),
+    admin: schemas.UserOut = Depends(admin_required),
 ):
-    alphabet = string.ascii_letters + string.digits
-    generated_password = "".join(secrets.choice(alphabet) for _ in range(8))
-    hashed_password = hash_password(generated_password)
+    generated_password = generate_password()
+    hashed_password = await password_hasher.hash(generated_password)
     user_data = user.model_dump(exclude={"password"})
     new_user = models.User(**user_data, password=hashed_password)
     db.add(new_user)
-    db.commit()
-    db.refresh(new_user)
+    await db.commit()
+    await db.refresh(new_user)
 
     return {"user": new_user, "password": generated_password}
 
 
 @router.delete("/user/{id}", status_code=status.HTTP_204_NO_CONTENT)
-def delete_user(
+async def delete_user(
     id: int,
-    db: Session = Depends(get_db),
-    admin: User = Depends(admin_required),
+    db: AsyncSession = Depends(get_db),
+    admin: schemas.UserOut = Depends(admin_required),
 ):
-    user_to_delete = db.query(models.User).filter(models.User.id == id).first()
+    result = await db.execute(select(models.User).filter(models.User.id == id))
+    user_to_delete = result.scalars().first()
     if user_to_delete is None:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -76,8 +92,13 @@ def delete_user(
             detail="Admins cannot delete other admins",
         )
 
-    db.query(models.User).filter(models.User.id == id).delete(synchronize_session=False)
-    db.commit()
+    await db.execute(
+        delete(models.User)
+        .where(models.User.id == id)
+        .execution_options(synchronize_session=False)
+    )
+    await db.commit()
+    user_cache.invalidate(id)
     return Response(
         f"User with id {id} has been deleted successfully",
         status_code=status.HTTP_204_NO_CONTENT,
@@ -89,13 +110,14 @@ def delete_user(
     status_code=status.HTTP_200_OK,
     response_model=schemas.UserResponseWithPassword,
 )
-def update_user(
+async def update_user(
     id: int,
     user: schemas.UpdateUser,
-    db: Session = Depends(get_db),
-    admin: User = Depends(admin_required),
+    db: AsyncSession = Depends(get_db),
+    admin: schemas.UserOut = Depends(admin_required),
 ):
-    existing_user = db.query(models.User).filter(models.User.id == id).first()
+    result = await db.execute(select(models.User).filter(models.User.id == id))
+    existing_user = result.scalars().first()
 
     if existing_user is None:
         raise HTTPException(
@@ -125,10 +147,12 @@ def update_user(
 
     password_to_return = None
     if user.password:
-        existing_user.password = hash_password(user.password)
+        existing_user.password = await password_hasher.hash(user.password)
         password_to_return = user.password
+        await revoke_user_tokens(db, existing_user.id)
 
-    db.commit()
-    db.refresh(existing_user)
+    await db.commit()
+    await db.refresh(existing_user)
+    user_cache.invalidate(id)
 
     return {"user": existing_user, "password": password_to_return}
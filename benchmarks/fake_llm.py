@@ -0,0 +1,144 @@
+import re
+import json
+import time
+import asyncio
+import argparse
+import uvicorn
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+from app.plan_generation.chunked import plan_duration_days
+from app.plan_generation.rules import first_number
+
+# An OpenAI-compatible chat completions endpoint that answers plan prompts
+# with a well-formed plan of the requested size, after a configurable time
+# to first token and at a configurable token rate.
+CHARS_PER_TOKEN = 4
+CHUNK_TOKENS = 16
+SEGMENT = re.compile(r"covering day (\d+) to day (\d+)")
+TIME_GOAL = re.compile(r"target weight is (.+?) and key goals")
+MEALS = re.compile(r"They prefer (.+?) meals per day")
+SECTIONS = ("meal_plan", "workout_plan", "yoga_plan")
+
+settings = {"latency": 0.5, "tokens_per_second": 1000.0}
+app = FastAPI()
+
+
+def _meals(count: int) -> list:
+    names = ["Breakfast", "Lunch", "Dinner"]
+    return names[:count] + [f"Snacks {i}" for i in range(1, count - 2)]
+
+
+def plan_for(messages: list) -> dict:
+    system = " ".join(m["content"] for m in messages if m["role"] == "system")
+    human = " ".join(m["content"] for m in messages if m["role"] != "system")
+    keys = system.rsplit("the keys JSON structure have will be only:", 1)[-1]
+    sections = [section for section in SECTIONS if section in keys]
+    segment = SEGMENT.search(human)
+    if segment:
+        first_day, last_day = int(segment.group(1)), int(segment.group(2))
+        plan = {}
+    else:
+        time_goal = TIME_GOAL.search(human)
+        first_day = 1
+        last_day = plan_duration_days(time_goal.group(1) if time_goal else None)
+        plan = {
+            "planType": "diet",
+            "duration": time_goal.group(1) if time_goal else "1 month",
+            "meals_per_day": 3,
+            "diet_type": "balanced",
+            "target_weight": 70,
+            "diet_goal": "weight loss",
+        }
+    meals = MEALS.search(human)
+    meal_names = _meals(first_number(meals.group(1) if meals else None, 3, 1, 6))
+    if "meal_plan" in sections:
+        plan["meal_plan"] = [
+            {"day": day, **{name: f"{name} for day {day}" for name in meal_names}}
+            for day in range(first_day, last_day + 1)
+        ]
+    weeks = range((first_day - 1) // 7 + 1, (last_day - 1) // 7 + 2)
+    for section in ("workout_plan", "yoga_plan"):
+        if section in sections:
+            plan[section] = [
+                {
+                    "week": week,
+                    "schedule": [f"{section} session {i}" for i in (1, 2, 3)],
+                }
+                for week in weeks
+            ]
+    return plan
+
+
+def _usage(body: dict, content: str) -> dict:
+    prompt = sum(len(str(m["content"])) for m in body["messages"]) // CHARS_PER_TOKEN
+    completion = len(content) // CHARS_PER_TOKEN
+    return {
+        "prompt_tokens": prompt,
+        "completion_tokens": completion,
+        "total_tokens": prompt + completion,
+    }
+
+
+def _chunk(delta: dict, finish_reason=None) -> str:
+    chunk = {
+        "id": "chatcmpl-bench",
+        "object": "chat.completion.chunk",
+        "created": int(time.time()),
+        "model": "fake",
+        "choices": [{"index": 0, "delta": delta, "finish_reason": finish_reason}],
+    }
+    return f"data: {json.dumps(chunk)}\n\n"
+
+
+async def _stream(content: str):
+    await asyncio.sleep(settings["latency"])
+    size = CHUNK_TOKENS * CHARS_PER_TOKEN
+    for i in range(0, len(content), size):
+        yield _chunk({"content": content[i : i + size]})
+        await asyncio.sleep(CHUNK_TOKENS / settings["tokens_per_second"])
+    yield _chunk({}, "stop")
+    yield "data: [DONE]\n\n"
+
+
+@app.post("/v1/chat/completions")
+async def chat_completions(request: Request):
+    body = await request.json()
+    content = json.dumps(plan_for(body["messages"]))
+    if body.get("stream"):
+        return StreamingResponse(_stream(content), media_type="text/event-stream")
+
+    tokens = len(content) / CHARS_PER_TOKEN
+    await asyncio.sleep(settings["latency"] + tokens / settings["tokens_per_second"])
+    return JSONResponse(
+        {
+            "id": "chatcmpl-bench",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": "fake",
+            "choices": [
+                {
+                    "index": 0,
+                    "message": {"role": "assistant", "content": content},
+                    "finish_reason": "stop",
+                }
+            ],
+            "usage": _usage(body, content),
+        }
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Fake OpenAI-compatible server")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8900)
+    parser.add_argument("--latency", type=float, default=settings["latency"])
+    parser.add_argument(
+        "--tokens-per-second", type=float, default=settings["tokens_per_second"]
+    )
+    args = parser.parse_args()
+    settings.update(latency=args.latency, tokens_per_second=args.tokens_per_second)
+    uvicorn.run(app, host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
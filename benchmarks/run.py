@@ -0,0 +1,447 @@
+import os
+import sys
+import math
+import json
+import time
+import random
+import asyncio
+import argparse
+import subprocess
+from pathlib import Path
+from contextlib import contextmanager
+import httpx
+from benchmarks.scenarios import SCENARIOS, onboarding_form, plan_request
+
+ROOT = Path(__file__).resolve().parent.parent
+RESULTS_DIR = ROOT / "benchmarks" / "results"
+BASELINES_DIR = ROOT / "benchmarks" / "baselines"
+STARTUP_TIMEOUT_SECONDS = 60
+
+
+def percentile(values: list, q: float) -> float:
+    # Nearest-rank percentile of already sorted values.
+    if not values:
+        return 0.0
+    rank = max(1, math.ceil(q / 100 * len(values)))
+    return values[min(rank, len(values)) - 1]
+
+
+def git_commit() -> str:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            cwd=ROOT,
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def _wait_for(url: str, process: subprocess.Popen):
+    deadline = time.monotonic() + STARTUP_TIMEOUT_SECONDS
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"{' '.join(process.args)} exited on startup")
+        try:
+            httpx.get(url, timeout=1)
+            return
+        except httpx.HTTPError:
+            time.sleep(0.2)
+    raise RuntimeError(f"{url} did not come up in {STARTUP_TIMEOUT_SECONDS}s")
+
+
+@contextmanager
+def local_stack(args):
+    # Starts the fake LLM server and the app as child processes.
+    llm_url = f"http://127.0.0.1:{args.llm_port}"
+    app_url = f"http://127.0.0.1:{args.port}"
+    database_url = args.database_url or f"sqlite+aiosqlite:///{args.sqlite_path}"
+    if database_url.startswith("sqlite") and os.path.exists(args.sqlite_path):
+        os.remove(args.sqlite_path)
+    env = {
+        **os.environ,
+        "DATABASE_URL": database_url,
+        "LLM_PROVIDER": "openai",
+        "OPENAI_API_BASE": f"{llm_url}/v1",
+        "OPENAI_API_KEY": "benchmark",
+        "SECRET_KEY": os.getenv("SECRET_KEY", "benchmark-secret"),
+        "ALGORITHM": os.getenv("ALGORITHM", "HS256"),
+        "DB_ECHO": "false",
+    }
+    processes = []
+    try:
+        llm = subprocess.Popen(
+            [
+                sys.executable,
+                "-m",
+                "benchmarks.fake_llm",
+                "--port",
+                str(args.llm_port),
+                "--latency",
+                str(args.llm_latency),
+                "--tokens-per-second",
+                str(args.llm_tokens_per_second),
+            ],
+            cwd=ROOT,
+            env=env,
+        )
+        processes.append(llm)
+        _wait_for(f"{llm_url}/docs", llm)
+        server = subprocess.Popen(
+            [
+                sys.executable,
+                "-m",
+                "benchmarks.serve",
+                "--port",
+                str(args.port),
+                "--workers",
+                str(args.workers),
+            ],
+            cwd=ROOT,
+            env=env,
+        )
+        processes.append(server)
+        _wait_for(f"{app_url}/health", server)
+        yield app_url
+    finally:
+        for process in reversed(processes):
+            process.terminate()
+            try:
+                process.wait(timeout=10)
+            except subprocess.TimeoutExpired:
+                process.kill()
+
+
+class Recorder:
+    def __init__(self):
+        self.samples = {}
+        self.errors = {}
+
+    @contextmanager
+    def timed(self, operation: str):
+        started = time.perf_counter()
+        try:
+            yield
+        except (httpx.HTTPError, AssertionError) as e:
+            self.errors.setdefault(operation, []).append(str(e)[:200])
+        else:
+            self.samples.setdefault(operation, []).append(time.perf_counter() - started)
+
+    def summary(self, duration: float) -> dict:
+        operations = {}
+        for operation in sorted(set(self.samples) | set(self.errors)):
+            latencies = sorted(self.samples.get(operation, []))
+            errors = self.errors.get(operation, [])
+            operations[operation] = {
+                "requests": len(latencies) + len(errors),
+                "errors": len(errors),
+                "throughput": round(len(latencies) / duration, 2),
+                "p50_ms": round(percentile(latencies, 50) * 1000, 1),
+                "p95_ms": round(percentile(latencies, 95) * 1000, 1),
+                "p99_ms": round(percentile(latencies, 99) * 1000, 1),
+                "max_ms": round((latencies[-1] if latencies else 0) * 1000, 1),
+                "sample_errors": sorted(set(errors))[:3],
+            }
+        everything = sorted(v for values in self.samples.values() for v in values)
+        total_errors = sum(len(errors) for errors in self.errors.values())
+        operations["all"] = {
+            "requests": len(everything) + total_errors,
+            "errors": total_errors,
+            "throughput": round(len(everything) / duration, 2),
+            "p50_ms": round(percentile(everything, 50) * 1000, 1),
+            "p95_ms": round(percentile(everything, 95) * 1000, 1),
+            "p99_ms": round(percentile(everything, 99) * 1000, 1),
+            "max_ms": round((everything[-1] if everything else 0) * 1000, 1),
+        }
+        return operations
+
+
+def _check(response: httpx.Response, *expected: int):
+    assert response.status_code in expected, (
+        f"{response.request.method} {response.request.url.path} -> "
+        f"{response.status_code} {response.text[:120]}"
+    )
+
+
+async def _login(client: httpx.AsyncClient, username: str, password: str) -> str:
+    response = await client.post(
+        "/login/", data={"username": username, "password": password}
+    )
+    _check(response, 200)
+    return response.json()["access_token"]
+
+
+async def provision_users(client, admin_token: str, count: int, run_id: str) -> list:
+    rows = "".join(
+        json.dumps(
+            {
+                "name": f"Bench User {i}",
+                "email": f"bench-{run_id}-{i}@example.com",
+                "username": f"bench-{run_id}-{i}",
+                "role": "user",
+            }
+        )
+        + "\n"
+        for i in range(count)
+    )
+    response = await client.post(
+        "/users/bulk",
+        content=rows,
+        headers={
+            "Authorization": f"Bearer {admin_token}",
+            "Content-Type": "application/x-ndjson",
+        },
+        timeout=None,
+    )
+    _check(response, 200)
+    users = []
+    for line in response.text.splitlines():
+        result = json.loads(line)
+        assert result["status"] == "created", result
+        users.append(
+            {
+                "id": result["user"]["id"],
+                "username": result["user"]["username"],
+                "password": result["password"],
+            }
+        )
+    return users
+
+
+async def remove_users(client, admin_token: str, users: list):
+    response = await client.post(
+        "/users/bulk/delete",
+        content="".join(json.dumps({"id": user["id"]}) + "\n" for user in users),
+        headers={
+            "Authorization": f"Bearer {admin_token}",
+            "Content-Type": "application/x-ndjson",
+        },
+        timeout=None,
+    )
+    _check(response, 200)
+
+
+async def run_operation(operation, client, user, admin_token, rng, args):
+    headers = {"Authorization": f"Bearer {user.get('token')}"}
+    if operation == "login":
+        user["token"] = await _login(client, user["username"], user["password"])
+    elif operation == "onboarding":
+        response = await client.post(
+            "/onboarding", json=onboarding_form(rng), headers=headers
+        )
+        _check(response, 201)
+    elif operation == "generate_plan":
+        response = await client.post(
+            "/generate-plan/",
+            json=plan_request(rng, args.plan_variants),
+            headers=headers,
+            timeout=None,
+        )
+        _check(response, 200, 201)
+    elif operation == "list_plans":
+        response = await client.get(
+            "/user-generated-plans/", params={"limit": 20}, headers=headers
+        )
+        # Users who have not generated a plan yet get a 404.
+        _check(response, 200, 404)
+    elif operation == "admin_users":
+        response = await client.get(
+            "/users",
+            params={"limit": 50},
+            headers={"Authorization": f"Bearer {admin_token}"},
+        )
+        _check(response, 200)
+
+
+async def virtual_user(worker, client, users, admin_token, weights, recorder, args):
+    rng = random.Random(args.seed * 1000 + worker)
+    operations, cumulative = list(weights), list(weights.values())
+    deadline = time.monotonic() + args.duration
+    while time.monotonic() < deadline:
+        operation = rng.choices(operations, weights=cumulative)[0]
+        user = users[rng.randrange(len(users))]
+        with recorder.timed(operation):
+            await run_operation(operation, client, user, admin_token, rng, args)
+
+
+def stage_means(metrics_text: str) -> dict:
+    # Mean seconds per stage from the app's /metrics histograms.
+    sums, counts = {}, {}
+    for line in metrics_text.splitlines():
+        if line.startswith("stage_duration_seconds_sum"):
+            name, value = line.split('stage="', 1)[1].split('"} ')
+            sums[name] = float(value)
+        elif line.startswith("stage_duration_seconds_count"):
+            name, value = line.split('stage="', 1)[1].split('"} ')
+            counts[name] = float(value)
+    return {
+        name: round(sums[name] / counts[name] * 1000, 2)
+        for name in sorted(sums)
+        if counts.get(name)
+    }
+
+
+async def benchmark(base_url: str, args) -> dict:
+    weights = SCENARIOS[args.scenario]
+    limits = httpx.Limits(max_connections=args.concurrency + 4)
+    async with httpx.AsyncClient(
+        base_url=base_url, limits=limits, timeout=args.timeout
+    ) as client:
+        admin_token = await _login(client, args.admin_username, args.admin_password)
+        run_id = f"{int(time.time())}{random.Random().randrange(1000):03d}"
+        users = await provision_users(client, admin_token, args.users, run_id)
+        tokens = await asyncio.gather(
+            *(_login(client, user["username"], user["password"]) for user in users)
+        )
+        for user, token in zip(users, tokens):
+            user["token"] = token
+
+        recorder = Recorder()
+        started = time.perf_counter()
+        await asyncio.gather(
+            *(
+                virtual_user(
+                    worker, client, users, admin_token, weights, recorder, args
+                )
+                for worker in range(args.concurrency)
+            )
+        )
+        duration = time.perf_counter() - started
+
+        metrics = await client.get("/metrics")
+        stages = stage_means(metrics.text) if metrics.status_code == 200 else {}
+        if not args.keep_users:
+            await remove_users(client, admin_token, users)
+
+    return {
+        "commit": git_commit(),
+        "scenario": args.scenario,
+        "created_at": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "config": {
+            "concurrency": args.concurrency,
+            "duration": args.duration,
+            "users": args.users,
+            "plan_variants": args.plan_variants,
+            "llm_latency": args.llm_latency,
+            "llm_tokens_per_second": args.llm_tokens_per_second,
+            "database": "target" if args.target else (args.database_url or "sqlite"),
+            "seed": args.seed,
+        },
+        "duration_seconds": round(duration, 2),
+        "operations": recorder.summary(duration),
+        "stage_mean_ms": stages,
+    }
+
+
+def compare(result: dict, baseline: dict, max_regression: float) -> list:
+    regressions = []
+    for operation, current in result["operations"].items():
+        previous = baseline["operations"].get(operation)
+        if previous is None:
+            continue
+        for key in ("p50_ms", "p95_ms", "p99_ms"):
+            if previous[key] and current[key] > previous[key] * (1 + max_regression):
+                regressions.append(
+                    f"{operation} {key}: {previous[key]} -> {current[key]}"
+                )
+        if previous["throughput"] and current["throughput"] < previous["throughput"] * (
+            1 - max_regression
+        ):
+            regressions.append(
+                f"{operation} throughput: {previous['throughput']} -> "
+                f"{current['throughput']}"
+            )
+    return regressions
+
+
+def print_report(result: dict):
+    print(
+        f"\nscenario={result['scenario']} commit={result['commit']} "
+        f"duration={result['duration_seconds']}s"
+    )
+    header = f"{'operation':<16}{'reqs':>8}{'errs':>6}{'rps':>9}"
+    header += f"{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'max ms':>10}"
+    print(header)
+    for operation, stats in result["operations"].items():
+        print(
+            f"{operation:<16}{stats['requests']:>8}{stats['errors']:>6}"
+            f"{stats['throughput']:>9}{stats['p50_ms']:>10}{stats['p95_ms']:>10}"
+            f"{stats['p99_ms']:>10}{stats['max_ms']:>10}"
+        )
+        for error in stats.get("sample_errors", []):
+            print(f"    ! {error}")
+    if result["stage_mean_ms"]:
+        print("\nmean stage latency (ms, whole server lifetime)")
+        for stage, mean in result["stage_mean_ms"].items():
+            print(f"  {stage:<24}{mean:>10}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load benchmark for the API")
+    parser.add_argument("--scenario", choices=sorted(SCENARIOS), default="mixed")
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--duration", type=float, default=30)
+    parser.add_argument("--users", type=int, default=50)
+    parser.add_argument("--plan-variants", type=int, default=20)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--timeout", type=float, default=300)
+    parser.add_argument(
+        "--target", help="Benchmark a running deployment instead of a local one"
+    )
+    parser.add_argument(
+        "--database-url", help="Database for the local app; SQLite if omitted"
+    )
+    parser.add_argument("--sqlite-path", default=str(RESULTS_DIR / "bench.db"))
+    parser.add_argument("--port", type=int, default=8800)
+    parser.add_argument("--workers", type=int, default=1)
+    parser.add_argument("--llm-port", type=int, default=8900)
+    parser.add_argument("--llm-latency", type=float, default=0.5)
+    parser.add_argument("--llm-tokens-per-second", type=float, default=2000)
+    parser.add_argument("--admin-username", default="admin")
+    parser.add_argument("--admin-password", default="admin123")
+    parser.add_argument("--keep-users", action="store_true")
+    parser.add_argument(
+        "--save-baseline",
+        action="store_true",
+        help="Store this run as the baseline for the scenario",
+    )
+    parser.add_argument(
+        "--max-regression",
+        type=float,
+        default=0.2,
+        help="Allowed slowdown against the baseline, as a fraction",
+    )
+    args = parser.parse_args()
+
+    RESULTS_DIR.mkdir(parents=True, exist_ok=True)
+    if args.target:
+        result = asyncio.run(benchmark(args.target.rstrip("/"), args))
+    else:
+        with local_stack(args) as base_url:
+            result = asyncio.run(benchmark(base_url, args))
+
+    print_report(result)
+    path = RESULTS_DIR / f"{result['commit']}-{args.scenario}.json"
+    path.write_text(json.dumps(result, indent=2))
+    print(f"\nresult written to {path.relative_to(ROOT)}")
+
+    baseline_path = BASELINES_DIR / f"{args.scenario}.json"
+    if args.save_baseline:
+        BASELINES_DIR.mkdir(parents=True, exist_ok=True)
+        baseline_path.write_text(json.dumps(result, indent=2))
+        print(f"baseline written to {baseline_path.relative_to(ROOT)}")
+    elif baseline_path.exists():
+        baseline = json.loads(baseline_path.read_text())
+        regressions = compare(result, baseline, args.max_regression)
+        print(f"\ncompared with baseline from commit {baseline['commit']}")
+        for regression in regressions:
+            print(f"  REGRESSION {regression}")
+        if regressions:
+            sys.exit(1)
+        print("  no regressions")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,60 @@
+import random
+
+# Relative weights of the operations each virtual user picks from.
+SCENARIOS = {
+    "mixed": {
+        "login": 10,
+        "onboarding": 10,
+        "generate_plan": 15,
+        "list_plans": 45,
+        "admin_users": 20,
+    },
+    "login": {"login": 1},
+    "onboarding": {"onboarding": 1},
+    "generate": {"generate_plan": 1},
+    "read": {"list_plans": 3, "admin_users": 1},
+}
+
+PLAN_TYPES = ["diet", "dietYoga", "dietWorkout", "dietYogaWorkout"]
+DIET_TYPES = ["veg", "vegan", "keto", "balanced", "paleo"]
+TIME_GOALS = ["1 week", "2 weeks", "1 month"]
+
+
+def plan_request(rng: random.Random, variants: int) -> dict:
+    # Drawing from a fixed number of variants controls the plan cache hit
+    # ratio: fewer variants, more hits.
+    variant = random.Random(rng.randrange(variants))
+    return {
+        "gender": variant.choice(["male", "female"]),
+        "ageGroup": variant.choice(["18-24", "25-34", "35-44", "45-54"]),
+        "currentWeight": variant.randrange(55, 110),
+        "height": variant.randrange(150, 195),
+        "targetWeight": variant.randrange(50, 90),
+        "timeGoal": variant.choice(TIME_GOALS),
+        "planType": variant.choice(PLAN_TYPES),
+        "dietType": variant.choice(DIET_TYPES),
+        "mealPreference": str(variant.randrange(3, 6)),
+        "activityLevel": "moderate",
+        "yogaType": "hatha",
+        "yogaExperience": "beginner",
+        "workoutPreference": "strength",
+        "workoutDays": "3 days",
+        "dietGoals": "weight loss",
+    }
+
+
+def onboarding_form(rng: random.Random) -> dict:
+    return {
+        "gender": rng.choice(["male", "female"]),
+        "ageGroup": rng.choice(["18-24", "25-34", "35-44"]),
+        "currentWeight": rng.randrange(55, 110),
+        "height": rng.randrange(150, 195),
+        "targetWeight": rng.randrange(50, 90),
+        "timeGoal": rng.choice(TIME_GOALS),
+        "planType": rng.choice(PLAN_TYPES),
+        "activityLevel": "moderate",
+        "dietType": rng.choice(DIET_TYPES),
+        "dietRestrictions": "none",
+        "mealPreference": "3",
+        "dietGoals": "weight loss",
+    }
@@ -0,0 +1,41 @@
+import os
+import argparse
+import uvicorn
+
+# Boots app.main:app for a benchmark run. DATABASE_URL and the LLM settings
+# come from the environment set by benchmarks.run.
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve the app for benchmarks")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8800)
+    parser.add_argument("--workers", type=int, default=1)
+    args = parser.parse_args()
+
+    if os.getenv("DATABASE_URL", "").startswith("sqlite"):
+        from benchmarks import sqlite
+
+        sqlite.install()
+        from app.models import Base
+
+        sqlite.use_sqlite_defaults(Base.metadata)
+        args.workers = 1
+
+    # A single worker runs in this process (and keeps the SQLite patches);
+    # more workers re-import the app by name.
+    target = "app.main:app"
+    if args.workers == 1:
+        from app.main import app as target
+
+    uvicorn.run(
+        target,
+        host=args.host,
+        port=args.port,
+        workers=args.workers,
+        log_level="warning",
+    )
+
+
+if __name__ == "__main__":
+    main()
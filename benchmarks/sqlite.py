@@ -0,0 +1,28 @@
+from sqlalchemy import text
+from sqlalchemy.schema import DefaultClause
+from sqlalchemy.dialects.postgresql.base import PGCompiler
+from sqlalchemy.dialects.sqlite.base import (
+    SQLiteCompiler,
+    SQLiteDialect,
+    SQLiteTypeCompiler,
+)
+
+# The app targets Postgres. These map the few Postgres-only constructs it
+# uses (JSONB, RETURNING, now() defaults) onto SQLite >= 3.35 so a quick
+# benchmark can run without a database server. Numbers from SQLite are only
+# comparable with other SQLite runs.
+
+
+def install():
+    SQLiteTypeCompiler.visit_JSONB = SQLiteTypeCompiler.visit_JSON
+    SQLiteCompiler.returning_clause = PGCompiler.returning_clause
+    SQLiteDialect.implicit_returning = True
+    SQLiteDialect.full_returning = True
+
+
+def use_sqlite_defaults(metadata):
+    for table in metadata.tables.values():
+        for column in table.columns:
+            default = getattr(column.server_default, "arg", "")
+            if "now()" in str(default):
+                column.server_default = DefaultClause(text("(CURRENT_TIMESTAMP)"))
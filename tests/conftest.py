@@ -0,0 +1,23 @@
+import pytest
+from app import schemas
+
+
+@pytest.fixture
+def plan_request():
+    def build(**changes) -> schemas.PlanRequest:
+        return schemas.PlanRequest(
+            **{
+                "gender": "female",
+                "ageGroup": "25-34",
+                "currentWeight": 80,
+                "height": 170,
+                "targetWeight": 70,
+                "timeGoal": "1 month",
+                "planType": "diet",
+                "dietType": "balanced",
+                "mealPreference": "3",
+                **changes,
+            }
+        )
+
+    return build
@@ -0,0 +1,31 @@
+import json
+import pytest
+from app.plan_generation.chunked import plan_duration_days
+from app.plan_generation.nutrition import activity_factor, plan_targets
+from app.plan_generation.rules import rule_plan_content
+
+
+@pytest.mark.parametrize(
+    "level, factor",
+    [
+        ("Sedentary", 1.2),
+        ("Lightly active", 1.375),
+        ("Moderately active", 1.55),
+        ("Active", 1.725),
+        ("Very active", 1.725),
+        ("Extra active", 1.9),
+        ("Extremely active", 1.9),
+        (None, 1.375),
+    ],
+)
+def test_activity_factor(level, factor):
+    assert activity_factor(level) == factor
+
+
+@pytest.mark.parametrize("time_goal", ["0 days", "0 weeks", "0 months"])
+def test_zero_time_goal_is_one_day(plan_request, time_goal):
+    assert plan_duration_days(time_goal) == 1
+    targets = plan_targets(plan_request(timeGoal=time_goal))
+    assert len(targets["calories"]) == 1
+    plan = json.loads(rule_plan_content(plan_request(timeGoal=time_goal)))
+    assert len(plan["meal_plan"]) == 1
@@ -0,0 +1,129 @@
+import os
+import asyncio
+import tempfile
+import pytest
+
+# Runs against DATABASE_URL when it is set, otherwise against SQLite with
+# the shims from benchmarks.sqlite.
+os.environ.setdefault(
+    "DATABASE_URL",
+    f"sqlite+aiosqlite:///{os.path.join(tempfile.mkdtemp(), 'profile.db')}",
+)
+os.environ.setdefault("SECRET_KEY", "test-secret")
+os.environ.setdefault("ALGORITHM", "HS256")
+os.environ.setdefault("OPENAI_API_KEY", "sk-test")
+SQLITE = os.environ["DATABASE_URL"].startswith("sqlite")
+if SQLITE:
+    pytest.importorskip("aiosqlite")
+httpx = pytest.importorskip("httpx")
+
+from benchmarks import sqlite
+from app.main import app
+from app.schemas import UserOut
+from app.auth.oauth import create_access_token, user_cache
+from app.database import Base, SessionLocal, count_statements, engine, init_db
+from app.user.loading import STRATEGY_STATEMENTS, user_query
+from app.models import (
+    Activity,
+    Meal,
+    PlanType,
+    User,
+    UserActivity,
+    UserGeneratedPlan,
+    UserPlan,
+)
+
+if SQLITE:
+    sqlite.install()
+    sqlite.use_sqlite_defaults(Base.metadata)
+
+_users = iter(range(1, 1_000_000))
+
+
+async def create_user(rows: int) -> User:
+    number = next(_users)
+    async with SessionLocal() as db:
+        plan_type = PlanType(plan_name=f"profile-test-{os.getpid()}-{number}")
+        user = User(
+            name=f"profile {number}",
+            username=f"profile-{os.getpid()}-{number}",
+            email=f"profile-{os.getpid()}-{number}@example.com",
+            role="user",
+        )
+        db.add_all([plan_type, user])
+        await db.flush()
+        for i in range(rows):
+            activity = Activity(plan_id=plan_type.id, activity_level="moderate")
+            db.add(activity)
+            await db.flush()
+            db.add_all(
+                [
+                    UserPlan(
+                        user_id=user.id, plan_type_id=plan_type.id, goal_time="1 week"
+                    ),
+                    UserActivity(user_id=user.id, activity_id=activity.id),
+                    Meal(
+                        user_id=user.id,
+                        plan_id=plan_type.id,
+                        diet_type="veg",
+                        meal_preference="3",
+                        diet_restrictions="none",
+                        key_goals="weight loss",
+                    ),
+                    UserGeneratedPlan(
+                        user_id=user.id, plan_type="diet", plan={"day": i}
+                    ),
+                ]
+            )
+        await db.commit()
+        return user
+
+
+def run(scenario):
+    async def main():
+        await init_db()
+        try:
+            return await scenario()
+        finally:
+            await engine.dispose()
+
+    return asyncio.run(main())
+
+
+@pytest.mark.parametrize("rows", [1, 3])
+@pytest.mark.parametrize("strategy", sorted(STRATEGY_STATEMENTS))
+def test_strategy_statement_count(strategy, rows):
+    async def scenario():
+        user = await create_user(rows)
+        async with SessionLocal() as db:
+            with count_statements() as statements:
+                result = await db.execute(
+                    user_query(strategy).where(User.id == user.id)
+                )
+                assert result.scalars().first() is not None
+        return statements[0]
+
+    assert run(scenario) == STRATEGY_STATEMENTS[strategy]
+
+
+@pytest.mark.parametrize("rows", [1, 3])
+def test_my_profile_statement_count(rows):
+    async def scenario():
+        user = await create_user(rows)
+        # Authenticate from the user cache so only the profile is counted.
+        user_cache.set(UserOut.model_validate(user))
+        token = create_access_token({"user_id": user.id})
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(
+            transport=transport, base_url="https://test"
+        ) as client:
+            with count_statements() as statements:
+                response = await client.get(
+                    "/users/me/profile",
+                    headers={"Authorization": f"Bearer {token}"},
+                )
+        assert response.status_code == 200
+        assert len(response.json()["generated_plans"]) == rows
+        return statements[0]
+
+    assert run(scenario) == STRATEGY_STATEMENTS["profile"]
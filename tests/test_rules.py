@@ -0,0 +1,21 @@
+import pytest
+from app.plan_generation.rules import excluded_allergens
+
+
+@pytest.mark.parametrize(
+    "details, allergens",
+    [
+        ("Allergic to nuts", {"nuts"}),
+        ("peanut allergy", {"nuts"}),
+        ("No fish", {"fish"}),
+        ("Shellfish allergy", {"shellfish"}),
+        ("Eggs and milk", {"egg", "dairy"}),
+        ("Watching my nutrition", set()),
+        ("I cook with coconut oil", set()),
+        ("Loves butternut squash", set()),
+        ("Eggplant is fine", set()),
+    ],
+)
+def test_excluded_allergens(plan_request, details, allergens):
+    request = plan_request(dietRestrictionsDetails=details)
+    assert excluded_allergens(request) == allergens